@@ -4,11 +4,14 @@ Các endpoint xác thực: login, register, logout
 """
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
-from werkzeug.security import check_password_hash
 import bcrypt
 import jwt
 from functools import wraps
 
+from services.principal_cache import token_cache, principal_cache, check_principal
+from services.password_verifier import password_verifier, PasswordVerifierUnavailable
+from utils.latency import auth_latency
+
 # Create blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -42,18 +45,21 @@ def token_required(f):
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(
-                token,
-                current_app.config['JWT_SECRET_KEY'],
-                algorithms=['HS256']
-            )
+            # LRU token đã verify: cùng 1 token gọi lại không decode / kiểm tra chữ ký lại
+            data = token_cache.decode(token, current_app.config['JWT_SECRET_KEY'])
             current_user_id = data['user_id']
-            current_user_role = data['role']
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
+        except (jwt.InvalidTokenError, KeyError):
             return jsonify({'message': 'Invalid token'}), 401
         
+        # Role / trạng thái hiện tại của user (cache TTL ngắn), không tin role cũ trong token
+        principal = principal_cache.get(current_user_id)
+        reason = check_principal(data, principal)
+        if reason:
+            return jsonify({'message': reason}), 401
+        current_user_role = principal['role']
+        
         return f(current_user_id, current_user_role, *args, **kwargs)
     
     return decorated
@@ -72,6 +78,12 @@ def admin_required(f):
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
+    """Login endpoint - đo latency toàn bộ request (GET /api/auth/metrics)"""
+    with auth_latency.span("login"):
+        return _login()
+
+
+def _login():
     """
     Login endpoint
     Expected JSON: {
@@ -113,14 +125,14 @@ def login():
             db.session.commit()
             return jsonify({'message': 'Invalid username or password'}), 401
         
-        # Verify password - support both bcrypt and werkzeug hashes
-        password_valid = False
-        if user.password_hash.startswith('$2'):
-            # Bcrypt format
-            password_valid = bcrypt.checkpw(data['password'].encode('utf-8'), user.password_hash.encode('utf-8'))
-        else:
-            # Werkzeug format (pbkdf2)
-            password_valid = check_password_hash(user.password_hash, data['password'])
+        # Verify password (bcrypt hoặc werkzeug) trong pool riêng, không hash trên request thread
+        try:
+            password_valid = password_verifier.verify(data['password'], user.password_hash)
+        except PasswordVerifierUnavailable as e:
+            response = jsonify({'message': 'Login is busy, please try again', 'error': str(e)})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
         
         if not password_valid:
             # Record failed login attempt
@@ -158,6 +170,7 @@ def login():
                 'user_id': user.id,
                 'username': user.username,
                 'role': user.role,
+                'ver': user.token_version or 0,
                 'exp': expiration_time
             },
             current_app.config['JWT_SECRET_KEY'],
@@ -259,6 +272,29 @@ def register(current_user_id, current_user_role):
         return jsonify({'message': 'Registration failed', 'error': str(e)}), 500
 
 
+@auth_bp.route('/metrics', methods=['GET'])
+@token_required
+@admin_required
+def get_auth_metrics(current_user_id, current_user_role):
+    """
+    Metrics đăng nhập (Admin only): latency login / verify mật khẩu (p50/p95/p99),
+    trạng thái pool verify (đang xử lý, hàng đợi, tỉ lệ bận, số lần từ chối 503), cache xác thực
+    
+    Query params:
+        reset: "true" để xóa số liệu latency sau khi đọc
+    """
+    metrics = {
+        'latency': auth_latency.snapshot(),
+        'password_pool': password_verifier.get_stats(),
+        'auth_cache': {'tokens': token_cache.get_stats(), 'principals': principal_cache.get_stats()}
+    }
+    
+    if request.args.get('reset', 'false').lower() == 'true':
+        auth_latency.reset()
+    
+    return jsonify({'message': 'Auth metrics retrieved', 'metrics': metrics}), 200
+
+
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(current_user_id, current_user_role):
@@ -336,6 +372,7 @@ def delete_user(current_user_id, current_user_role, user_id):
         
         db.session.delete(user)
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         return jsonify({'message': f'User {user.username} deleted successfully'}), 200
     
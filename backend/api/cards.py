@@ -2,13 +2,20 @@
 Cards API - Endpoints for parking card management
 Xử lý tất cả API endpoints liên quan đến thẻ xe
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
+import base64
 import logging
 from typing import Dict, Any
 from datetime import datetime, timezone
+from time import perf_counter_ns
 
 from services.card_service import CardService
 from utils.validation import ValidationHelper
+from utils.latency import scan_latency, file_io_latency
+from services.scan_debounce_service import scan_debouncer
+from services.unknown_card_store import unknown_card_store
+from services.allowlist_bloom_service import allowlist_bloom
+from services.event_bus import event_bus, CardEntered, CardExited, UnknownCardSeen
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +41,7 @@ def save_log_to_database(card_id: str, action: str, details: Dict[str, Any] = No
         logger.info(f"🔄 Saving log to database: {card_id} - {action}")
         
         # Get CardLogModel from cache
-        UserModel, CardModel, CardLogModel, ParkingSlotModel, ParkingConfigModel = get_sqlalchemy_models()
+        _, CardModel, CardLogModel, _, _, _ = get_sqlalchemy_models()
         logger.info(f"✓ Models loaded for log")
         
         # Create log data
@@ -97,7 +104,7 @@ def save_card_to_database(card_id: str, card_name: str, status: int, entry_time:
         logger.info(f"🔄 Entering save_card_to_database: {card_id}")
         
         # Get CardModel from cache
-        UserModel, CardModel, CardLogModel, ParkingSlotModel, ParkingConfigModel = get_sqlalchemy_models()
+        _, CardModel, CardLogModel, _, _, _ = get_sqlalchemy_models()
         logger.info(f"✓ Models loaded")
         
         # Convert created_at string to datetime if needed
@@ -485,7 +492,7 @@ def delete_card(card_id: str):
                 from models.models_cache import get_sqlalchemy_models
                 
                 logger.info(f"🔄 Deleting card {clean_id} from database...")
-                UserModel, CardModel, CardLogModel, ParkingSlotModel, ParkingConfigModel = get_sqlalchemy_models()
+                _, CardModel, CardLogModel, _, _, _ = get_sqlalchemy_models()
                 
                 # Query the card to delete
                 logger.info(f"🔍 Querying card {clean_id} from database...")
@@ -878,6 +885,19 @@ def get_card_logs():
         type: integer
         default: 0
         description: Pagination offset
+      - name: since
+        in: query
+        type: string
+        description: Only logs at or after this ISO timestamp
+      - name: until
+        in: query
+        type: string
+        description: Only logs before this ISO timestamp
+      - name: order
+        in: query
+        type: string
+        default: desc
+        description: Sort order by timestamp (desc, asc)
     responses:
       200:
         description: Logs retrieved successfully
@@ -898,6 +918,14 @@ def get_card_logs():
         action_str = request.args.get('action')
         limit = int(request.args.get('limit', 50))
         offset = int(request.args.get('offset', 0))
+        order = request.args.get('order', 'desc').lower()
+        if order not in ['asc', 'desc']:
+            raise ValueError(f"order must be 'asc' or 'desc', got: {order}")
+        
+        # Time range filter (ISO timestamps)
+        from services.log_query_service import parse_log_time
+        since = parse_log_time(request.args.get('since'))
+        until = parse_log_time(request.args.get('until'))
         
         # Convert action string to LogAction enum if provided
         action_enum = None
@@ -922,7 +950,10 @@ def get_card_logs():
             card_id=card_id,
             action=action_enum,
             limit=limit,
-            offset=offset
+            offset=offset,
+            since=since,
+            until=until,
+            order=order
         )
         
         return jsonify({
@@ -1090,6 +1121,167 @@ def list_backups():
             "message": f"Lỗi server: {str(e)}"
         }), 500
 
+# Mã kết quả quẹt thẻ cho /api/cards/scan/lite (1 ký tự lý do)
+SCAN_REASON_OK = "0"             # Hợp lệ, mở barrier
+SCAN_REASON_BAD_REQUEST = "M"    # Thiếu card_id / body không hợp lệ
+SCAN_REASON_INVALID_FORMAT = "F" # UID sai định dạng
+SCAN_REASON_ALREADY_INSIDE = "P" # Quẹt IN khi xe đã trong bãi
+SCAN_REASON_NOT_INSIDE = "A"     # Quẹt OUT khi xe đang ngoài bãi
+SCAN_REASON_UNKNOWN_CARD = "U"   # Thẻ chưa đăng ký
+SCAN_REASON_ERROR = "E"          # Lỗi server / lỗi cập nhật trạng thái
+
+
+def process_card_scan(card_id: str, direction: str = '', timestamp: str = '', reader: str = '') -> Dict[str, Any]:
+    """
+    Xử lý 1 lượt quẹt thẻ: validate, cập nhật trạng thái, ghi log JSON + database
+    
+    Dùng chung cho /api/cards/scan (JSON), /api/cards/scan/lite (plain text) và
+    TCP/UDP ingest. Lượt quẹt lặp lại (cùng uid, direction, reader) trong cửa sổ
+    SCAN_DEBOUNCE_SECONDS trả về kết quả đã cache, không chạm storage.
+    
+    Args:
+        card_id: UID thẻ đọc từ reader
+        direction: "IN", "OUT" hoặc rỗng (toggle)
+        timestamp: Timestamp từ thiết bị (có thể rỗng)
+        reader: Định danh reader gửi lượt quẹt (ví dụ IP thiết bị)
+        
+    Returns:
+        Dict với keys: decision ("open", "deny", "unknown", "error"), reason (mã 1 ký tự),
+        action, card_id, message và các thông tin bổ sung cho response JSON
+    """
+    # Validate card ID format
+    with scan_latency.span("validate"):
+        is_valid, error_msg = ValidationHelper.validate_card_id(card_id)
+        clean_id = ValidationHelper.clean_card_id(card_id) if is_valid else None
+    if not is_valid:
+        logger.warning(f"ESP32: Invalid card format - {card_id}: {error_msg}")
+        return {
+            "decision": "deny",
+            "reason": SCAN_REASON_INVALID_FORMAT,
+            "action": "reject",
+            "card_id": card_id,
+            "error": "Invalid card ID format",
+            "message": f"Invalid card ID: {error_msg}"
+        }
+    
+    # Quẹt lặp lại trong cửa sổ debounce -> trả kết quả cũ
+    with scan_latency.span("debounce_lookup"):
+        cached = scan_debouncer.get(clean_id, direction, reader)
+    if cached is not None:
+        logger.debug(f"UNO R4: Duplicate scan suppressed - {clean_id} ({direction}, {reader})")
+        return dict(cached, debounced=True)
+    
+    result = _decide_card_scan(clean_id, direction, timestamp)
+    scan_debouncer.put(clean_id, direction, reader, result)
+    return result
+
+
+def _decide_card_scan(clean_id: str, direction: str, timestamp: str) -> Dict[str, Any]:
+    """Quyết định + side effects (cập nhật trạng thái, log) cho thẻ đã validate"""
+    # Check if card exists in system
+    with scan_latency.span("get_card"):
+        success, card_data = card_service.get_card(clean_id)
+    
+    if success and card_data:
+        # Known card - determine action based on direction and current status
+        current_status = card_data.get('status', 0)
+        
+        # Logic: IN reader = entry (status 0->1), OUT reader = exit (status 1->0)
+        if direction == 'IN':
+            # IN reader: Xe vào bãi (nếu đang ngoài)
+            if current_status == 0:
+                new_status = 1  # Vào bãi
+                action = "entry"
+            else:
+                # Đã ở trong bãi rồi, từ chối
+                return {
+                    "decision": "deny",
+                    "reason": SCAN_REASON_ALREADY_INSIDE,
+                    "action": "reject",
+                    "card_id": clean_id,
+                    "error": "Invalid entry",
+                    "message": f"Xe đã ở trong bãi rồi",
+                    "current_status": "parked"
+                }
+        
+        elif direction == 'OUT':
+            # OUT reader: Xe ra khỏi bãi (nếu đang trong)
+            if current_status == 1:
+                new_status = 0  # Ra khỏi bãi
+                action = "exit"
+            else:
+                # Đang ở ngoài bãi rồi, từ chối
+                return {
+                    "decision": "deny",
+                    "reason": SCAN_REASON_NOT_INSIDE,
+                    "action": "reject",
+                    "card_id": clean_id,
+                    "error": "Invalid exit",
+                    "message": f"Xe đang ở ngoài bãi rồi",
+                    "current_status": "available"
+                }
+        
+        else:
+            # Direction không rõ, fallback về toggle cũ
+            new_status = 1 - current_status
+            action = "entry" if new_status == 1 else "exit"
+        
+        # Update card status
+        with scan_latency.span("update_card_status"):
+            update_success, message, updated_card = card_service.update_card_status(clean_id, new_status)
+        
+        if update_success:
+            # Log JSON / database và cập nhật bảng cards chạy qua event bus (subscriber async)
+            event_type = CardEntered if new_status == 1 else CardExited
+            with scan_latency.span("publish"):
+                event_bus.publish(event_type(
+                    card_id=clean_id,
+                    card_name=updated_card.get("name", clean_id),
+                    direction=direction,
+                    timestamp=timestamp
+                ))
+            
+            logger.info(f"UNO R4: Card {clean_id} - {action} processed successfully (Direction: {direction})")
+            
+            return {
+                "decision": "open",
+                "reason": SCAN_REASON_OK,
+                "action": action,
+                "card_id": clean_id,
+                "card": updated_card,
+                "new_status": new_status,
+                "message": f"Card {action} processed"
+            }
+        else:
+            logger.error(f"UNO R4: Failed to update card {clean_id}: {message}")
+            return {
+                "decision": "error",
+                "reason": SCAN_REASON_ERROR,
+                "action": "error",
+                "card_id": clean_id,
+                "error": "Status update failed",
+                "message": message
+            }
+            
+    else:
+        # Unknown card - add to unknown list and reject
+        logger.warning(f"UNO R4: Unknown card detected - {clean_id} (Direction: {direction})")
+        
+        # Log + thêm vào danh sách thẻ lạ qua event bus (subscriber async)
+        with scan_latency.span("publish"):
+            add_success = event_bus.publish(UnknownCardSeen(card_id=clean_id, direction=direction))
+        
+        return {
+            "decision": "unknown",
+            "reason": SCAN_REASON_UNKNOWN_CARD,
+            "action": "reject",
+            "card_id": clean_id,
+            "error": "Unknown card",
+            "message": f"Card not registered in system: {clean_id}",
+            "unknown_card_logged": add_success
+        }
+
+
 @cards_bp.route('/scan', methods=['POST'])
 def scan_card():
     """
@@ -1104,6 +1296,7 @@ def scan_card():
     Returns:
         JSON response with card status and action taken
     """
+    scan_started = perf_counter_ns()
     try:
         logger.info("ESP32: Card scan received")
         
@@ -1129,139 +1322,49 @@ def scan_card():
         
         logger.info(f"UNO R4: Processing card scan - ID: {card_id}, Direction: {direction}")
         
-        # Validate card ID format
-        is_valid, error_msg = ValidationHelper.validate_card_id(card_id)
-        if not is_valid:
-            logger.warning(f"ESP32: Invalid card format - {card_id}: {error_msg}")
-            return jsonify({
-                "success": False,
-                "error": "Invalid card ID format",
-                "message": f"Invalid card ID: {error_msg}",
-                "action": "reject"
-            }), 400
-        
-        # Clean card ID
-        clean_id = ValidationHelper.clean_card_id(card_id)
+        reader = str(data.get('reader') or request.remote_addr or '')
+        result = process_card_scan(card_id, direction, timestamp, reader)
+        decision = result["decision"]
         
-        # Check if card exists in system
-        success, card_data = card_service.get_card(clean_id)
+        if decision == "open":
+            return jsonify({
+                "success": True,
+                "card": result["card"],
+                "action": result["action"],
+                "direction": direction,
+                "message": result["message"],
+                "parking_status": "parked" if result["new_status"] == 1 else "available",
+                "timestamp": timestamp
+            }), 200
         
-        if success and card_data:
-            # Known card - determine action based on direction and current status
-            current_status = card_data.get('status', 0)
-            
-            # Logic: IN reader = entry (status 0->1), OUT reader = exit (status 1->0)
-            if direction == 'IN':
-                # IN reader: Xe vào bãi (nếu đang ngoài)
-                if current_status == 0:
-                    new_status = 1  # Vào bãi
-                    action = "entry"
-                else:
-                    # Đã ở trong bãi rồi, từ chối
-                    return jsonify({
-                        "success": False,
-                        "error": "Invalid entry",
-                        "message": f"Xe đã ở trong bãi rồi",
-                        "action": "reject",
-                        "current_status": "parked"
-                    }), 400
-            
-            elif direction == 'OUT':
-                # OUT reader: Xe ra khỏi bãi (nếu đang trong)
-                if current_status == 1:
-                    new_status = 0  # Ra khỏi bãi
-                    action = "exit"
-                else:
-                    # Đang ở ngoài bãi rồi, từ chối
-                    return jsonify({
-                        "success": False,
-                        "error": "Invalid exit",
-                        "message": f"Xe đang ở ngoài bãi rồi",
-                        "action": "reject",
-                        "current_status": "available"
-                    }), 400
-            
-            else:
-                # Direction không rõ, fallback về toggle cũ
-                new_status = 1 - current_status
-                action = "entry" if new_status == 1 else "exit"
-            
-            # Update card status
-            update_success, message, updated_card = card_service.update_card_status(clean_id, new_status)
-            
-            if update_success:
-                # action đã được xác định ở trên dựa trên direction
-                
-                # ✅ FIX: Chỉ log entry/exit, không log scan riêng để tránh lặp nhật ký
-                # Log entry hoặc exit (không log scan riêng)
-                if new_status == 1:
-                    card_service.log_service.log_card_entry(clean_id, {
-                        "timestamp": timestamp,
-                        "direction": direction,
-                        "source": "uno_r4_wifi"
-                    })
-                    # 💾 Ghi vào database luôn
-                    save_log_to_database(clean_id, "entry", {
-                        "direction": direction,
-                        "source": "uno_r4_wifi"
-                    })
-                    # 💾 Cập nhật status trong database card
-                    save_card_to_database(clean_id, updated_card.get("name", clean_id), 1)
-                else:
-                    card_service.log_service.log_card_exit(clean_id, {
-                        "timestamp": timestamp,
-                        "direction": direction,
-                        "source": "uno_r4_wifi"
-                    })
-                    # 💾 Ghi vào database luôn
-                    save_log_to_database(clean_id, "exit", {
-                        "direction": direction,
-                        "source": "uno_r4_wifi"
-                    })
-                    # 💾 Cập nhật status trong database card
-                    save_card_to_database(clean_id, updated_card.get("name", clean_id), 0)
-                
-                logger.info(f"UNO R4: Card {clean_id} - {action} processed successfully (Direction: {direction})")
-                
-                return jsonify({
-                    "success": True,
-                    "card": updated_card,
-                    "action": action,
-                    "direction": direction,
-                    "message": f"Card {action} processed",
-                    "parking_status": "parked" if new_status == 1 else "available",
-                    "timestamp": timestamp
-                }), 200
-            else:
-                logger.error(f"UNO R4: Failed to update card {clean_id}: {message}")
-                return jsonify({
-                    "success": False,
-                    "error": "Status update failed",
-                    "message": message,
-                    "action": "error"
-                }), 500
-                
-        else:
-            # Unknown card - add to unknown list and reject
-            logger.warning(f"UNO R4: Unknown card detected - {clean_id} (Direction: {direction})")
-            
-            # Log unknown card detection
-            card_service.log_service.log_unknown_card(clean_id, "uno_r4")
-            # 💾 Ghi vào database luôn
-            save_log_to_database(clean_id, "unknown", {"source": "uno_r4_wifi"})
-            
-            # Add to unknown cards list
-            add_success, add_message = card_service.add_unknown_card(clean_id)
-            
+        if decision == "unknown":
             return jsonify({
                 "success": False,
-                "error": "Unknown card",
-                "message": f"Card not registered in system: {clean_id}",
+                "error": result["error"],
+                "message": result["message"],
                 "action": "reject",
-                "card_id": clean_id,
-                "unknown_card_logged": add_success,
+                "card_id": result["card_id"],
+                "unknown_card_logged": result["unknown_card_logged"],
                 "timestamp": timestamp
             }), 403
+        
+        if decision == "error":
+            return jsonify({
+                "success": False,
+                "error": result["error"],
+                "message": result["message"],
+                "action": "error"
+            }), 500
+        
+        response = {
+            "success": False,
+            "error": result["error"],
+            "message": result["message"],
+            "action": "reject"
+        }
+        if "current_status" in result:
+            response["current_status"] = result["current_status"]
+        return jsonify(response), 400
             
     except Exception as e:
         logger.error(f"UNO R4: Error processing card scan: {e}")
@@ -1271,6 +1374,145 @@ def scan_card():
             "message": f"Server error: {str(e)}",
             "action": "error"
         }), 500
+    finally:
+        scan_latency.record("total", perf_counter_ns() - scan_started)
+
+
+@cards_bp.route('/scan/lite', methods=['POST'])
+def scan_card_lite():
+    """
+    Endpoint quẹt thẻ rút gọn cho firmware UNO R4 (plain text, không JSON)
+    
+    Request body (text/plain): "<UID> <DIRECTION>", ví dụ "A1B2C3D4 IN"
+    (cũng chấp nhận form/query params uid=...&direction=...)
+    
+    Response body (text/plain, luôn 2 token): "<DECISION> <REASON>"
+        OPEN 0      - Hợp lệ, mở barrier
+        DENY P|A|F|M - Từ chối (P: đã trong bãi, A: đang ngoài bãi, F: sai định dạng, M: thiếu UID)
+        UNKNOWN U   - Thẻ chưa đăng ký
+        ERROR E     - Lỗi server
+    
+    HTTP status luôn 200 (trừ ERROR = 500) để firmware chỉ cần đọc body.
+    """
+    scan_started = perf_counter_ns()
+    try:
+        uid = request.values.get('uid', '')
+        direction = request.values.get('direction', '')
+        if not uid:
+            parts = request.get_data(as_text=True).replace(',', ' ').split()
+            uid = parts[0] if parts else ''
+            direction = parts[1] if len(parts) > 1 else direction
+        
+        uid = uid.strip()
+        direction = direction.strip().upper()
+        if not uid:
+            return _lite_response("DENY", SCAN_REASON_BAD_REQUEST)
+        
+        result = process_card_scan(uid, direction, reader=request.remote_addr or '')
+        return _lite_response(result["decision"].upper(), result["reason"],
+                              500 if result["decision"] == "error" else 200)
+        
+    except Exception as e:
+        logger.error(f"UNO R4: Error processing lite card scan: {e}")
+        return _lite_response("ERROR", SCAN_REASON_ERROR, 500)
+    finally:
+        scan_latency.record("total_lite", perf_counter_ns() - scan_started)
+
+
+def _lite_response(decision: str, reason: str, status_code: int = 200):
+    """Response plain text cố định "<DECISION> <REASON>" cho /scan/lite"""
+    return Response(f"{decision} {reason}", status=status_code, mimetype='text/plain')
+
+
+@cards_bp.route('/scan/metrics', methods=['GET'])
+def get_scan_metrics():
+    """
+    Latency từng giai đoạn của POST /api/cards/scan (p50/p95/p99)
+    
+    Query params:
+        reset: "true" để xóa số liệu sau khi đọc
+    
+    Returns:
+        JSON response with per-stage latency histograms (ms)
+    """
+    try:
+        metrics = {
+            "stages": scan_latency.snapshot(),
+            "file_io": file_io_latency.snapshot(),
+            "debounce": scan_debouncer.get_stats(),
+            "unknown_cards": unknown_card_store.get_stats()
+        }
+        
+        if request.args.get('reset', 'false').lower() == 'true':
+            scan_latency.reset()
+            file_io_latency.reset()
+            scan_debouncer.clear()
+        
+        return jsonify({
+            "success": True,
+            "metrics": metrics,
+            "message": "Scan latency metrics retrieved"
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting scan metrics: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": f"Lỗi server: {str(e)}"
+        }), 500
+
+
+@cards_bp.route('/allowlist.bloom', methods=['GET'])
+def get_allowlist_bloom():
+    """
+    Bloom filter các UID thẻ đã đăng ký cho reader quyết định offline
+    
+    Reader kiểm tra UID với filter để mở barrier ngay, sau đó báo lượt quẹt về
+    /api/cards/scan như bình thường. False = chắc chắn không có trong allowlist,
+    True = có thể có (false positive ~ALLOWLIST_BLOOM_FP_RATE).
+    
+    Query params:
+        format: "json" để trả về thông số + bit array base64 (debug)
+    
+    Headers:
+        If-None-Match: version đang có trên reader -> 304 nếu không đổi
+    
+    Returns:
+        application/octet-stream (format trong services/allowlist_bloom_service.py)
+        với header ETag / X-Allowlist-Version
+    """
+    try:
+        version, payload = allowlist_bloom.encode()
+        etag = f'"{version}"'
+        
+        if request.args.get('format', '').lower() == 'json':
+            return jsonify({
+                "success": True,
+                "bloom": {
+                    **allowlist_bloom.get_stats(),
+                    "version": version,
+                    "payload_base64": base64.b64encode(payload).decode('ascii')
+                },
+                "message": "Allowlist bloom filter retrieved"
+            }), 200
+        
+        if request.if_none_match.contains(str(version)):
+            response = Response(status=304)
+        else:
+            response = Response(payload, status=200, mimetype='application/octet-stream')
+        response.headers['ETag'] = etag
+        response.headers['X-Allowlist-Version'] = str(version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error building allowlist bloom filter: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": f"Lỗi server: {str(e)}"
+        }), 500
 
 
 @cards_bp.route('/fix-data', methods=['POST'])
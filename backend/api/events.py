@@ -0,0 +1,57 @@
+"""
+Events API - Server-Sent Events cho slot đỗ xe và quẹt thẻ
+Thay cho việc frontend poll định kỳ; các endpoint polling cũ vẫn giữ cho client cũ
+"""
+from flask import Blueprint, Response, request, jsonify
+import logging
+
+from services.event_stream import event_stream
+
+logger = logging.getLogger(__name__)
+
+# Create blueprint for events API
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+@events_bp.route('/stream', methods=['GET'])
+def stream_events():
+    """
+    Luồng SSE (text/event-stream)
+
+    Event: SlotChanged, CardEntered, CardExited, UnknownCardSeen (data = JSON của event),
+    reset (không resume được - client cần tải lại toàn bộ trạng thái qua API polling).
+
+    Kết nối lại: EventSource tự gửi header Last-Event-ID; hoặc query ?last_event_id=...
+
+    Returns:
+        Stream SSE, hoặc 503 khi đã đủ số kết nối tối đa
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    connection = event_stream.connect(last_event_id, request.remote_addr)
+    if connection is None:
+        response = jsonify({
+            "success": False,
+            "error": "Too many event stream clients",
+            "message": f"Đã đủ {event_stream.max_clients} kết nối, dùng API polling hoặc thử lại sau"
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+
+    client, backlog = connection
+    response = Response(event_stream.stream(client, backlog), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Không để reverse proxy gom buffer
+    return response
+
+@events_bp.route('/stats', methods=['GET'])
+def get_event_stream_stats():
+    """
+    Thống kê SSE: số client, buffer, event đã phát, số lần resume / reset
+
+    Returns:
+        JSON response with stream statistics
+    """
+    return jsonify({
+        "success": True,
+        "stats": event_stream.get_stats()
+    }), 200
@@ -4,9 +4,14 @@ Xử lý tất cả API endpoints liên quan đến cảm biến bãi đỗ xe
 """
 from flask import Blueprint, request, jsonify
 import logging
-from typing import Dict, Any
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
 
-from services.esp32_service import ESP32Service
+from services.esp32_poller import esp32_poller
+from services.slot_state_service import slot_state_service
+from services.slot_history_service import slot_history
+from services.slot_analytics_service import slot_analytics
 from utils.validation import ValidationHelper
 
 logger = logging.getLogger(__name__)
@@ -14,57 +19,66 @@ logger = logging.getLogger(__name__)
 # Create blueprint for parking slots API
 parking_slots_bp = Blueprint('parking_slots', __name__, url_prefix='/api/parking-slots')
 
-# Initialize ESP32 service
-esp32_service = ESP32Service()
+# ESP32 service dùng chung với poller nền (cùng cache last_data)
+esp32_service = esp32_poller.service
+
+
+def _is_true(value: str) -> bool:
+    return value.lower() in ['true', '1', 'yes']
+
+
+def _no_snapshot_response():
+    """503 khi poller chưa đọc được ESP32 lần nào"""
+    last_error = esp32_poller.get_last_error()
+    return jsonify({
+        "success": False,
+        "data": None,
+        "error": last_error["error"],
+        "message": last_error["message"],
+        "esp32_url": esp32_service.base_url,
+        "snapshot": esp32_poller.get_metadata()
+    }), 503
 
 @parking_slots_bp.route('/', methods=['GET'])
 def get_parking_slots():
     """
-    Get current parking slots data from ESP32
+    Get current parking slots data (snapshot mới nhất của ESP32 poller)
     
     Query Parameters:
         reset (bool): Whether to reset sensors before reading
+        refresh (bool): Kích hoạt đọc lại ESP32 ở nền (không chờ)
         
     Returns:
-        JSON response with parking slots data or error
+        JSON response with parking slots data (kèm tuổi snapshot) or error
     """
     try:
         logger.info("API: Getting parking slots data")
         
         # Check for reset parameter
-        reset_requested = request.args.get('reset', '').lower() in ['true', '1', 'yes']
+        reset_requested = _is_true(request.args.get('reset', ''))
+        reset_performed = False
+        if reset_requested:
+            reset_performed, _ = esp32_service.reset_sensors()
         
-        # Get data from ESP32
-        success, raw_data, slots_data = esp32_service.get_parking_slots(force_reset=reset_requested)
+        # Refresh bất đồng bộ - response dùng snapshot hiện tại
+        if reset_requested or _is_true(request.args.get('refresh', '')):
+            esp32_poller.request_refresh()
         
-        if success and slots_data:
-            response_data = {
-                "success": True,
-                "data": slots_data.to_dict(),
-                "summary": slots_data.summary,
-                "validation": slots_data.validate(),
-                "reset_performed": raw_data.get("reset_performed", False),
-                "message": "Parking slots data retrieved successfully"
-            }
-            return jsonify(response_data), 200
-        else:
-            # Return error response from ESP32Service
-            error_response = {
-                "success": False,
-                "data": None,
-                "error": raw_data.get("error", "Unknown error"),
-                "message": raw_data.get("message", "Failed to get parking slots data"),
-                "esp32_url": esp32_service.base_url
-            }
-            
-            # Determine appropriate HTTP status code
-            status_code = 503  # Service Unavailable (ESP32 connection issues)
-            if "timeout" in raw_data.get("error", "").lower():
-                status_code = 504  # Gateway Timeout
-            elif "HTTP error" in raw_data.get("error", ""):
-                status_code = 502  # Bad Gateway
-            
-            return jsonify(error_response), status_code
+        snapshot = esp32_poller.get_snapshot()
+        if snapshot is None:
+            return _no_snapshot_response()
+        
+        slots_data = snapshot.slots_data
+        response_data = {
+            "success": True,
+            "data": slots_data.to_dict(),
+            "summary": slots_data.summary,
+            "validation": slots_data.validate(),
+            "reset_performed": reset_performed,
+            "snapshot": esp32_poller.get_metadata(snapshot),
+            "message": "Parking slots data retrieved successfully"
+        }
+        return jsonify(response_data), 200
             
     except Exception as e:
         logger.error(f"Error getting parking slots: {e}")
@@ -122,8 +136,8 @@ def get_system_status():
     try:
         logger.info("API: Getting system status")
         
-        # Get system status from service
-        status = esp32_service.get_system_status()
+        # Trạng thái dựng từ snapshot của poller (không gọi ESP32 trong request)
+        status = esp32_poller.get_system_status()
         
         return jsonify({
             "success": True,
@@ -198,6 +212,8 @@ def health_check():
             "esp32_connected": is_connected,
             "esp32_url": esp32_service.base_url,
             "timeout_setting": esp32_service.timeout,
+            "circuit_breaker": esp32_service.http.breaker.get_status(),
+            "http_client": esp32_service.http.get_stats(),
             "message": "ESP32 connected" if is_connected else "ESP32 not reachable"
         }
         
@@ -216,10 +232,14 @@ def health_check():
 @parking_slots_bp.route('/history', methods=['GET'])
 def get_sensor_history():
     """
-    Get sensor reading history (future feature)
+    Get sensor reading history (time series từng slot, bộ nhớ cố định)
     
     Query Parameters:
-        hours (int): Number of hours of history (default: 24)
+        slot_id (int): Chỉ 1 slot (mặc định: mọi slot)
+        start_ms / end_ms (int): Cửa sổ thời gian, epoch milliseconds (end mặc định: bây giờ)
+        window_ms (int): Độ dài cửa sổ khi không có start_ms (default: 24 giờ)
+        hours (int): Tương thích cũ - window_ms = hours giờ (1-168)
+        resolution (str): raw | 1m | 1h | auto (default: auto)
         
     Returns:
         JSON response with historical data
@@ -227,22 +247,48 @@ def get_sensor_history():
     try:
         logger.info("API: Getting sensor history")
         
-        # Get hours parameter
-        hours = request.args.get('hours', 24)
+        def int_arg(name):
+            value = request.args.get(name)
+            return int(value) if value not in (None, '') else None
+        
         try:
-            hours = int(hours)
-            if hours < 1 or hours > 168:  # Limit to 1 week
-                hours = 24
+            slot_id = int_arg('slot_id')
+            end_ms = int_arg('end_ms') or int(time.time() * 1000)
+            start_ms = int_arg('start_ms')
+            window_ms = int_arg('window_ms')
+            hours = int_arg('hours')
         except ValueError:
-            hours = 24
+            return jsonify({
+                "success": False,
+                "error": "Invalid parameters",
+                "message": "slot_id, start_ms, end_ms, window_ms, hours phải là số nguyên"
+            }), 400
+        
+        if start_ms is None:
+            if window_ms is None and hours is not None:
+                window_ms = min(max(hours, 1), 168) * 3600 * 1000  # Limit to 1 week
+            start_ms = end_ms - (window_ms if window_ms and window_ms > 0 else 24 * 3600 * 1000)
+        
+        resolution = request.args.get('resolution', 'auto').lower()
+        if resolution not in ('auto', 'raw', '1m', '1h'):
+            return jsonify({
+                "success": False,
+                "error": "Invalid resolution",
+                "message": "resolution phải là raw, 1m, 1h hoặc auto"
+            }), 400
+        if start_ms >= end_ms:
+            return jsonify({
+                "success": False,
+                "error": "Invalid window",
+                "message": "start_ms phải nhỏ hơn end_ms"
+            }), 400
         
-        # Get history from service
-        history_data = esp32_service.get_sensor_history(hours)
+        history_data = slot_history.query(start_ms, end_ms, slot_id=slot_id, resolution=resolution)
         
         return jsonify({
             "success": True,
             "history": history_data,
-            "hours_requested": hours,
+            "points": sum(len(points) for points in history_data["slots"].values()),
             "message": "Sensor history retrieved successfully"
         }), 200
         
@@ -254,6 +300,80 @@ def get_sensor_history():
             "message": f"Lỗi server: {str(e)}"
         }), 500
 
+
+def _parse_time_arg(value: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    """
+    from / to của analytics -> epoch giây
+
+    Nhận epoch milliseconds, ngày "YYYY-MM-DD" (giờ máy chủ; end_of_day=True -> hết ngày đó)
+    hoặc ISO datetime. Sai định dạng -> ValueError.
+    """
+    if value in (None, ''):
+        return None
+    if value.isdigit():
+        return int(value) / 1000
+    if len(value) == 10:
+        day = datetime.strptime(value, "%Y-%m-%d")
+        return (day + timedelta(days=1) if end_of_day else day).timestamp()
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+@parking_slots_bp.route('/analytics', methods=['GET'])
+def get_slot_analytics():
+    """
+    Slot utilization / dwell-time analytics
+    
+    Query Parameters:
+        from (str): Ngày "YYYY-MM-DD", ISO datetime hoặc epoch ms (default: 00:00 của 6 ngày trước)
+        to (str): Như from; ngày "YYYY-MM-DD" được tính hết ngày (default: bây giờ)
+        
+    Returns:
+        JSON response: summary (utilization %, avg_dwell_minutes, turnover_per_day, peak_occupied),
+        slots (theo slot), daily (theo ngày; ngày đã kết thúc lấy từ cache)
+    """
+    try:
+        try:
+            start = _parse_time_arg(request.args.get('from'))
+            end = _parse_time_arg(request.args.get('to'), end_of_day=True)
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid parameters",
+                "message": "from / to phải là YYYY-MM-DD, ISO datetime hoặc epoch ms"
+            }), 400
+        
+        end = end if end is not None else time.time()
+        if start is None:
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            start = (today - timedelta(days=6)).timestamp()
+        if start >= end:
+            return jsonify({
+                "success": False,
+                "error": "Invalid window",
+                "message": "from phải nhỏ hơn to"
+            }), 400
+        if end - start > slot_analytics.cache_days * 86400:
+            return jsonify({
+                "success": False,
+                "error": "Window too large",
+                "message": f"Cửa sổ tối đa {slot_analytics.cache_days} ngày"
+            }), 400
+        
+        analytics = slot_analytics.compute(start, end)
+        
+        return jsonify({
+            "success": True,
+            "analytics": analytics,
+            "message": "Slot analytics computed successfully"
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error computing slot analytics: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": f"Lỗi server: {str(e)}"
+        }), 500
+
 @parking_slots_bp.route('/configure', methods=['POST'])
 def configure_esp32():
     """
@@ -319,7 +439,7 @@ def get_single_slot(slot_id: int):
     Get data for a specific parking slot
     
     Args:
-        slot_id: Slot number (0-based index)
+        slot_id: Slot number (slot toàn cục khi có nhiều board ESP32)
         
     Returns:
         JSON response with single slot data
@@ -327,43 +447,42 @@ def get_single_slot(slot_id: int):
     try:
         logger.info(f"API: Getting slot {slot_id} data")
         
-        # Validate slot ID
-        if slot_id < 0 or slot_id > 10:  # Reasonable limit
+        # Validate slot ID (giới hạn trên phụ thuộc số board - slot không có trả về 404)
+        if slot_id < 0:
             return jsonify({
                 "success": False,
                 "error": "Invalid slot ID",
-                "message": f"Slot ID phải từ 0-10, nhận được: {slot_id}"
+                "message": f"Slot ID phải >= 0, nhận được: {slot_id}"
             }), 400
         
-        # Get current data
-        success, raw_data, slots_data = esp32_service.get_parking_slots(force_reset=False)
+        if _is_true(request.args.get('refresh', '')):
+            esp32_poller.request_refresh()
         
-        if success and slots_data:
-            # Find the specific slot
-            target_slot = None
-            for slot in slots_data.slots:
-                if slot.slot_id == slot_id:
-                    target_slot = slot
-                    break
-            
-            if target_slot:
-                return jsonify({
-                    "success": True,
-                    "slot": target_slot.to_dict(),
-                    "message": f"Slot {slot_id} data retrieved successfully"
-                }), 200
-            else:
-                return jsonify({
-                    "success": False,
-                    "error": "Slot not found",
-                    "message": f"Không tìm thấy slot {slot_id}"
-                }), 404
+        # Get current snapshot
+        snapshot = esp32_poller.get_snapshot()
+        if snapshot is None:
+            return _no_snapshot_response()
+        
+        # Find the specific slot
+        target_slot = None
+        for slot in snapshot.slots_data.slots:
+            if slot.slot_id == slot_id:
+                target_slot = slot
+                break
+        
+        if target_slot:
+            return jsonify({
+                "success": True,
+                "slot": target_slot.to_dict(),
+                "snapshot": esp32_poller.get_metadata(snapshot),
+                "message": f"Slot {slot_id} data retrieved successfully"
+            }), 200
         else:
             return jsonify({
                 "success": False,
-                "error": "Failed to get slots data",
-                "message": raw_data.get("message", "Không thể lấy dữ liệu slots")
-            }), 503
+                "error": "Slot not found",
+                "message": f"Không tìm thấy slot {slot_id}"
+            }), 404
             
     except Exception as e:
         logger.error(f"Error getting slot {slot_id}: {e}")
@@ -376,16 +495,20 @@ def get_single_slot(slot_id: int):
 @parking_slots_bp.route('/update', methods=['POST'])
 def update_parking_slot():
     """
-    ESP32 sensor update endpoint - Receive sensor data from hardware
+    ESP32 sensor update endpoint - Receive sensor data from hardware (1 slot)
     
     Expected JSON payload:
     {
         "slot_id": 1,
         "occupied": true,
         "timestamp": "2025-10-06T21:47:00Z",
-        "sensor_value": 123 (optional)
+        "sensor_value": 123 (optional),
+        "controller_id": "esp32-1" (optional, mặc định board chính)
     }
     
+    Thay cho occupied có thể gửi "distance_cm": 7.5 (khoảng cách thô) - backend tự ngưỡng hóa
+    với hysteresis + debounce; slot chỉ đổi trạng thái (và ghi database) khi transition được xác nhận.
+    
     Returns:
         JSON response with update confirmation
     """
@@ -410,6 +533,8 @@ def update_parking_slot():
         
         # Validate required fields
         required_fields = ['slot_id', 'occupied']
+        if 'distance_cm' in data:
+            required_fields = ['slot_id']
         missing_fields = [field for field in required_fields if field not in data]
         if missing_fields:
             return jsonify({
@@ -424,47 +549,39 @@ def update_parking_slot():
         timestamp = data.get('timestamp', '')
         sensor_value = data.get('sensor_value', 0)
         
-        # Validate slot_id
-        if not isinstance(slot_id, int) or slot_id < 0 or slot_id > 10:
-            return jsonify({
-                "success": False,
-                "error": "Invalid slot_id",
-                "message": f"slot_id must be integer 0-10, got: {slot_id}"
-            }), 400
-        
-        # Validate occupied status
-        if not isinstance(occupied, bool):
-            return jsonify({
-                "success": False,
-                "error": "Invalid occupied value",
-                "message": f"occupied must be boolean, got: {type(occupied).__name__}"
-            }), 400
-        
         logger.info(f"ESP32: Slot {slot_id} update - occupied: {occupied}, value: {sensor_value}")
         
-        # Process sensor update via service
-        success, message = esp32_service.update_slot_status(slot_id, occupied, sensor_value, timestamp)
+        # Batch 1 reading: slot_id kiểm tra theo registry, lưu vào bảng parking_slots
+        success, result = slot_state_service.apply_batch(data.get('controller_id'), [data])
         
         if success:
             logger.info(f"ESP32: Slot {slot_id} updated successfully")
+            state = next(iter(result["slots"].values()), {})
+            occupied = state.get("status") == 1
             return jsonify({
                 "success": True,
                 "slot_id": slot_id,
                 "occupied": occupied,
                 "sensor_value": sensor_value,
-                "message": message,
+                "controller_id": result["controller_id"],
+                "changed": bool(result["transitions"]),
+                "distance_cm": state.get("distance"),
+                "last_changed": state.get("last_changed"),
+                "pending_status": state.get("pending"),
+                "message": f"Slot {slot_id} updated to {'occupied' if occupied else 'available'}",
                 "timestamp": timestamp,
                 "action": "sensor_update"
             }), 200
         else:
-            logger.error(f"ESP32: Failed to update slot {slot_id}: {message}")
+            rejected = result.get("rejected") or [{}]
+            logger.error(f"ESP32: Failed to update slot {slot_id}: {result.get('message')}")
             return jsonify({
                 "success": False,
-                "error": "Update failed",
-                "message": message,
+                "error": result.get("error", "Update failed"),
+                "message": rejected[0].get("error") or result.get("message"),
                 "slot_id": slot_id,
                 "action": "error"
-            }), 500
+            }), 500 if result.get("error") == "Database error" else 400
             
     except Exception as e:
         logger.error(f"ESP32: Error processing slot update: {e}")
@@ -473,4 +590,56 @@ def update_parking_slot():
             "error": "Internal server error",
             "message": f"Server error: {str(e)}",
             "action": "error"
-        }), 500
\ No newline at end of file
+        }), 500
+
+@parking_slots_bp.route('/batch', methods=['POST'])
+def batch_update_parking_slots():
+    """
+    ESP32 batch update endpoint - Nhiều slot của 1 controller trong 1 request, ghi database 1 lần
+    
+    Expected JSON payload:
+    {
+        "controller_id": "esp32-1" (optional, mặc định board chính),
+        "readings": [
+            {"slot_id": 1, "occupied": true, "sensor_value": 8, "timestamp": "2025-10-06T21:47:00Z"},
+            {"slot_id": 2, "occupied": false},
+            {"slot_id": 3, "distance_cm": 42.5}
+        ]
+    }
+    
+    slot_id là slot của board (1..N), kiểm tra theo ESP32_CONTROLLERS; slot toàn cục = slot_offset + slot_id.
+    
+    Returns:
+        JSON response: accepted / rejected (theo index) / transitions (slot toàn cục đổi trạng thái sau debounce) /
+        changed (slot đổi trạng thái trong database) / slots (trạng thái detector, last_changed)
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                "success": False,
+                "error": "Invalid payload",
+                "message": "Body phải là JSON object có readings"
+            }), 400
+        
+        success, result = slot_state_service.apply_batch(data.get('controller_id'), data.get('readings'))
+        logger.info(f"ESP32: Batch from {result.get('controller_id', data.get('controller_id'))} - "
+                    f"{result.get('accepted', 0)} accepted, {len(result.get('rejected', []))} rejected")
+        
+        if success:
+            return jsonify({
+                "success": True,
+                **result,
+                "message": f"{result['accepted']} slot readings applied"
+            }), 200
+        
+        status_code = 500 if result.get("error") == "Database error" else 400
+        return jsonify({"success": False, **result}), status_code
+        
+    except Exception as e:
+        logger.error(f"ESP32: Error processing slot batch: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": f"Server error: {str(e)}"
+        }), 500
@@ -10,7 +10,16 @@ from datetime import datetime, timezone
 from typing import Dict, Any
 
 from services.card_service import CardService
-from services.esp32_service import ESP32Service
+from services.esp32_poller import esp32_poller
+from services.db_maintenance_service import db_maintenance_service
+from services.card_reconciliation_service import card_reconciliation_service
+from services.scan_ingest_service import scan_ingest_server
+from services.event_bus import event_bus
+from services.event_stream import event_stream
+from services.occupancy_counter import occupancy_counter
+from services.health_monitor import health_monitor
+from services.principal_cache import get_auth_cache_stats
+from services.password_verifier import password_verifier
 from config.config import (
     CARDS_FILE, UNKNOWN_CARDS_FILE, ESP32_IP, ESP32_PORT, 
     ESP32_TIMEOUT, DETECTION_THRESHOLD, DEBUG_MODE
@@ -23,12 +32,12 @@ system_bp = Blueprint('system', __name__, url_prefix='/api/system')
 
 # Initialize services
 card_service = CardService()
-esp32_service = ESP32Service()
+esp32_service = esp32_poller.service
 
 @system_bp.route('/health', methods=['GET'])
 def health_check():
     """
-    Complete system health check
+    Complete system health check (đọc kết quả cache của health prober nền)
     
     Returns:
         JSON response with overall system health status
@@ -36,23 +45,28 @@ def health_check():
     try:
         logger.info("API: System health check")
         
+        # Kết quả do health prober nền kiểm tra định kỳ - request không gọi ESP32 / database / file thẻ
+        results = health_monitor.get_results()
+        
         # Check individual components
         health_status = {
             "system": {
                 "status": "healthy",
                 "timestamp": datetime.now(timezone.utc).isoformat(),
-                "uptime": "N/A",  # Could be calculated if we track start time
+                "uptime": health_monitor.get_liveness()["uptime_seconds"],
                 "platform": platform.system(),
                 "python_version": platform.python_version()
             },
             "services": {
-                "card_service": check_card_service_health(),
-                "esp32_service": check_esp32_service_health()
+                "card_service": results["card_service"],
+                "esp32_service": results["esp32_service"],
+                "database": results["database"]
             },
             "files": {
-                "cards_file": check_file_health(CARDS_FILE),
-                "unknown_cards_file": check_file_health(UNKNOWN_CARDS_FILE)
+                "cards_file": results["cards_file"],
+                "unknown_cards_file": results["unknown_cards_file"]
             },
+            "prober": health_monitor.get_status(),
             "configuration": {
                 "esp32_ip": ESP32_IP,
                 "esp32_port": ESP32_PORT,
@@ -63,12 +77,7 @@ def health_check():
         }
         
         # Determine overall health
-        overall_healthy = all([
-            health_status["services"]["card_service"]["healthy"],
-            health_status["services"]["esp32_service"]["healthy"],
-            health_status["files"]["cards_file"]["accessible"],
-            health_status["files"]["unknown_cards_file"]["accessible"]
-        ])
+        overall_healthy = all(result["healthy"] for result in results.values())
         
         health_status["system"]["status"] = "healthy" if overall_healthy else "degraded"
         
@@ -103,7 +112,7 @@ def get_system_status():
         
         # Get statistics from services
         card_stats = card_service.get_statistics()
-        esp32_status = esp32_service.get_system_status()
+        esp32_status = esp32_poller.get_system_status()
         
         # Compile system status
         system_status = {
@@ -112,12 +121,20 @@ def get_system_status():
                 "card_management": {
                     "active": True,
                     "statistics": card_stats,
+                    "occupancy_counter": occupancy_counter.get_status(),
                     "files": {
                         "cards_file": str(CARDS_FILE),
                         "unknown_cards_file": str(UNKNOWN_CARDS_FILE)
                     }
                 },
-                "esp32_communication": esp32_status
+                "esp32_communication": esp32_status,
+                "database_maintenance": db_maintenance_service.get_status(),
+                "scan_ingest": scan_ingest_server.get_status(),
+                "event_bus": event_bus.get_stats(),
+                "event_stream": event_stream.get_stats(),
+                "health_prober": health_monitor.get_status(),
+                "auth_cache": get_auth_cache_stats(),
+                "password_verifier": password_verifier.get_stats()
             },
             "configuration": {
                 "esp32_endpoint": f"http://{ESP32_IP}:{ESP32_PORT}",
@@ -319,56 +336,48 @@ def get_system_time():
             "message": f"Lỗi server: {str(e)}"
         }), 500
 
-# Helper functions for health checks
-def check_card_service_health() -> Dict[str, Any]:
-    """Check card service health"""
-    try:
-        cards = card_service.get_all_cards()
-        return {
-            "healthy": True,
-            "message": "Card service operational",
-            "card_count": len(cards)
-        }
-    except Exception as e:
-        return {
-            "healthy": False,
-            "message": f"Card service error: {str(e)}",
-            "card_count": 0
-        }
-
-def check_esp32_service_health() -> Dict[str, Any]:
-    """Check ESP32 service health"""
-    try:
-        connected = esp32_service.is_connected()
-        return {
-            "healthy": connected,
-            "message": "ESP32 connected" if connected else "ESP32 not reachable",
-            "url": esp32_service.base_url
-        }
-    except Exception as e:
-        return {
-            "healthy": False,
-            "message": f"ESP32 service error: {str(e)}",
-            "url": esp32_service.base_url
-        }
-
-def check_file_health(file_path) -> Dict[str, Any]:
-    """Check file accessibility"""
+@system_bp.route('/reconcile', methods=['GET', 'POST'])
+def reconcile_cards():
+    """
+    Đối soát thẻ giữa cards.json và database
+    
+    GET: Trả về báo cáo lần đối soát gần nhất
+    POST: Chạy đối soát ngay (query param dry_run=true để chỉ báo cáo, không sửa)
+    
+    Returns:
+        JSON response with reconciliation report
+    """
     try:
-        # Convert pathlib.Path to string if needed
-        file_path_str = str(file_path)
-        accessible = os.path.exists(file_path_str)
-        size = os.path.getsize(file_path_str) if accessible else 0
-        return {
-            "accessible": accessible,
-            "path": file_path_str,
-            "size_bytes": size,
-            "message": "File accessible" if accessible else "File not found"
-        }
+        if request.method == 'GET':
+            return jsonify({
+                "success": True,
+                "report": card_reconciliation_service.get_last_report(),
+                "message": "Last reconciliation report retrieved"
+            }), 200
+        
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+        logger.info(f"API: Card reconciliation requested (dry_run={dry_run})")
+        
+        success, report = card_reconciliation_service.reconcile(repair=not dry_run)
+        
+        if not success:
+            return jsonify({
+                "success": False,
+                "report": report,
+                "error": "Reconciliation failed",
+                "message": f"Lỗi đối soát: {report.get('error', 'Unknown error')}"
+            }), 409 if report.get('error') == "Reconciliation already running" else 500
+        
+        return jsonify({
+            "success": True,
+            "report": report,
+            "message": "Card reconciliation completed"
+        }), 200
+        
     except Exception as e:
-        return {
-            "accessible": False,
-            "path": str(file_path),
-            "size_bytes": 0,
-            "message": f"File error: {str(e)}"
-        }
\ No newline at end of file
+        logger.error(f"Error in card reconciliation: {e}")
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": f"Lỗi server: {str(e)}"
+        }), 500
@@ -4,12 +4,13 @@ CRUD operations: Create, Read, Update, Delete users
 """
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from functools import wraps
 import models
 from utils.validation import validate_username, validate_password
+from services.principal_cache import principal_cache, check_principal
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
@@ -28,11 +29,16 @@ def admin_required(f):
     @wraps(f)
     @jwt_required()
     def decorated_function(*args, **kwargs):
-        user_id = get_jwt_identity()
-        User = get_user_model()
-        user = User.query.get(user_id)
+        # Cache TTL ngắn thay cho User.query.get mỗi request (invalidate khi sửa / khóa / xóa user)
+        principal = principal_cache.get(get_jwt_identity())
+        reason = check_principal(get_jwt(), principal)
+        if reason:
+            return jsonify({
+                'success': False,
+                'message': reason
+            }), 401
         
-        if not user or user.role != 'admin':
+        if principal['role'] != 'admin':
             return jsonify({
                 'success': False,
                 'message': 'Admin access required'
@@ -267,6 +273,8 @@ def update_user(user_id):
             }), 400
         
         # Update fields
+        revoke_tokens = False
+        
         if 'email' in data:
             user.email = data['email'].strip()
         
@@ -281,15 +289,23 @@ def update_user(user_id):
                     'message': 'Password must be at least 6 characters'
                 }), 400
             user.password_hash = generate_password_hash(password)
+            revoke_tokens = True
         
         if 'is_active' in data:
             user.is_active = bool(data['is_active'])
+            revoke_tokens = revoke_tokens or not user.is_active
         
         if 'role' in data and data['role'] in ['user', 'admin']:
+            revoke_tokens = revoke_tokens or data['role'] != user.role
             user.role = data['role']
         
+        if revoke_tokens:
+            # Token đã cấp trước thay đổi này không dùng được nữa
+            user.token_version = (user.token_version or 0) + 1
+        
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         return jsonify({
             'success': True,
@@ -342,6 +358,7 @@ def delete_user(user_id):
         
         db.session.delete(user)
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         return jsonify({
             'success': True,
@@ -375,8 +392,10 @@ def deactivate_user(user_id):
             }), 404
         
         user.is_active = False
+        user.token_version = (user.token_version or 0) + 1
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         return jsonify({
             'success': True,
@@ -478,12 +497,16 @@ def get_user_login_history(user_id):
     - Users can only view their own history
     """
     try:
-        current_user_id = get_jwt_identity()
-        User = get_user_model()
-        current_user = User.query.get(current_user_id)
+        current_user = principal_cache.get(get_jwt_identity())
+        reason = check_principal(get_jwt(), current_user)
+        if reason:
+            return jsonify({
+                'success': False,
+                'message': reason
+            }), 401
         
         # Check permissions
-        if current_user.role != 'admin' and current_user_id != user_id:
+        if current_user['role'] != 'admin' and current_user['id'] != user_id:
             return jsonify({
                 'success': False,
                 'message': 'You do not have permission to view this user\'s login history'
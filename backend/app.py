@@ -11,7 +11,9 @@ from werkzeug.exceptions import HTTPException
 from flask_jwt_extended import JWTManager
 
 # Import configuration
-from config.config import config, DEBUG_MODE, FRONTEND_BUILD_DIR
+from config.config import (
+    config, DEBUG_MODE, FRONTEND_BUILD_DIR, SCAN_INGEST_ENABLED, ESP32_POLLER_ENABLED, HEALTH_PROBE_ENABLED
+)
 from config.cors import init_cors
 
 # Import database
@@ -23,10 +25,25 @@ from api.parking_slots import parking_slots_bp
 from api.system import system_bp
 from api.auth import auth_bp
 from api.users import users_bp
+from api.events import events_bp
 
 # Import scheduled tasks
 from services.scheduled_tasks import scheduled_tasks
 
+# Import TCP/UDP scan ingest listener
+from services.scan_ingest_service import scan_ingest_server
+
+# Import event bus
+from services.event_bus import event_bus
+from services.scan_event_subscribers import register_scan_subscribers
+from services.event_stream import event_stream
+
+# Import background ESP32 poller
+from services.esp32_poller import esp32_poller
+
+# Import background health prober
+from services.health_monitor import health_monitor
+
 # Setup logging
 logging.basicConfig(
     level=logging.DEBUG if DEBUG_MODE else logging.INFO,
@@ -63,6 +80,8 @@ def _create_user_model(db_instance):
         full_name = db_instance.Column(db_instance.String(120), nullable=True)
         role = db_instance.Column(db_instance.String(20), default='staff', nullable=False)
         is_active = db_instance.Column(db_instance.Boolean, default=True, nullable=False)
+        # Tăng khi đổi mật khẩu / role hoặc khóa tài khoản: JWT có claim "ver" cũ hơn bị từ chối
+        token_version = db_instance.Column(db_instance.Integer, default=0, nullable=False)
         created_at = db_instance.Column(db_instance.DateTime, default=datetime.utcnow, nullable=False)
         updated_at = db_instance.Column(db_instance.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
         
@@ -147,6 +166,14 @@ def create_app(config_name='default'):
         get_sqlalchemy_models()  # Initialize cache on first call
         # Create all database tables if they don't exist
         db.create_all()
+        # Bring existing card_logs table up to date (new columns + indexes)
+        from scripts.init_db import upgrade_card_logs_schema, upgrade_parking_slots_schema, upgrade_users_schema
+        upgrade_card_logs_schema(db.engine)
+        upgrade_parking_slots_schema(db.engine)
+        upgrade_users_schema(db.engine)
+    
+    # Fork pool verify mật khẩu trước khi các thread nền (event bus, scheduler, poller) chạy
+    setup_password_verifier(app)
     
     # Initialize JWT
     jwt = JWTManager(app)
@@ -169,9 +196,21 @@ def create_app(config_name='default'):
     # Add health check endpoint
     setup_health_endpoints(app)
     
+    # Event bus subscribers for scan side effects
+    setup_event_bus(app)
+    
     # Start background scheduler for auto backup and maintenance
     setup_scheduler(app)
     
+    # Start TCP/UDP scan ingest listener (optional)
+    setup_scan_ingest(app)
+    
+    # Start background ESP32 poller (API serves its snapshot)
+    setup_esp32_poller(app)
+    
+    # Start background health prober (health endpoints serve cached results)
+    setup_health_monitor(app)
+    
     logger.info("Flask app created successfully")
     return app
 
@@ -179,11 +218,68 @@ def setup_scheduler(app):
     """Setup and start background scheduler"""
     try:
         # Start scheduler when app is ready
+        scheduled_tasks.init_app(app)
         scheduled_tasks.start_scheduler()
         logger.info("Background scheduler started with Flask app")
     except Exception as e:
         logger.error(f"Failed to start scheduler: {e}")
 
+def setup_password_verifier(app):
+    """Start password verification pool for /api/auth/login"""
+    try:
+        from services.password_verifier import password_verifier
+        password_verifier.start()
+    except Exception as e:
+        logger.error(f"Failed to start password verifier: {e}")
+
+def setup_event_bus(app):
+    """Attach app to event bus and register default subscribers"""
+    try:
+        event_bus.init_app(app)
+        register_scan_subscribers(event_bus)
+        event_stream.init_bus(event_bus)
+        logger.info("Event bus subscribers registered")
+    except Exception as e:
+        logger.error(f"Failed to setup event bus: {e}")
+
+def setup_scan_ingest(app):
+    """Setup and start TCP/UDP scan ingest listener (SCAN_INGEST_ENABLED)"""
+    if not SCAN_INGEST_ENABLED:
+        return
+    try:
+        scan_ingest_server.init_app(app)
+        if scan_ingest_server.start():
+            logger.info("Scan ingest listener started with Flask app")
+        else:
+            logger.warning("Scan ingest listener not running")
+    except Exception as e:
+        logger.error(f"Failed to start scan ingest listener: {e}")
+
+def setup_esp32_poller(app):
+    """Start background ESP32 poller (ESP32_POLLER_ENABLED)"""
+    # Tắt poller -> API đọc ESP32 ngay trong request, không tự khởi động thread
+    esp32_poller.enabled = ESP32_POLLER_ENABLED
+    if not ESP32_POLLER_ENABLED:
+        logger.info("ESP32 poller disabled (ESP32_POLLER_ENABLED=false)")
+        return
+    try:
+        esp32_poller.start()
+    except Exception as e:
+        logger.error(f"Failed to start ESP32 poller: {e}")
+
+def setup_health_monitor(app):
+    """Start background health prober (HEALTH_PROBE_ENABLED)"""
+    health_monitor.init_app(app)
+    # Tắt prober -> API health chạy check ngay trong request, không tự khởi động thread
+    health_monitor.enabled = HEALTH_PROBE_ENABLED
+    if not HEALTH_PROBE_ENABLED:
+        logger.info("Health prober disabled (HEALTH_PROBE_ENABLED=false)")
+        return
+    try:
+        health_monitor.start()
+    except Exception as e:
+        logger.error(f"Failed to start health prober: {e}")
+
 def register_blueprints(app):
     """Register all API blueprints"""
     logger.info("Registering API blueprints...")
@@ -194,6 +290,7 @@ def register_blueprints(app):
     app.register_blueprint(system_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
+    app.register_blueprint(events_bp)
     
     logger.info("API blueprints registered successfully")
 
@@ -369,6 +466,26 @@ def setup_health_endpoints(app):
             "message": "Parking Management System API is running"
         }), 200
     
+    @app.route('/health/live')
+    def liveness_check():
+        """Liveness probe - process còn phục vụ request, không I/O"""
+        return jsonify({
+            "status": "alive",
+            **health_monitor.get_liveness(),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }), 200
+    
+    @app.route('/health/ready')
+    def readiness_check():
+        """Readiness probe - đọc kết quả health check đã cache (database, card service)"""
+        ready, reasons = health_monitor.get_readiness()
+        return jsonify({
+            "status": "ready" if ready else "not_ready",
+            "ready": ready,
+            "reasons": reasons,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }), 200 if ready else 503
+    
     @app.route('/api')
     def api_info():
         """API information endpoint"""
@@ -380,7 +497,9 @@ def setup_health_endpoints(app):
                 "cards": "/api/cards",
                 "parking_slots": "/api/parking-slots", 
                 "system": "/api/system",
-                "health": "/health"
+                "health": "/health",
+                "liveness": "/health/live",
+                "readiness": "/health/ready"
             },
             "documentation": {
                 "cards_api": "Quản lý thẻ RFID và trạng thái đỗ xe",
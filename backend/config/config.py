@@ -9,6 +9,7 @@ Chứa tất cả cấu hình:
 - Flask app configurations
 - Database configuration
 """
+import json
 import os
 from pathlib import Path
 
@@ -25,6 +26,40 @@ SQLALCHEMY_TRACK_MODIFICATIONS = False
 DATA_DIR = BASE_DIR / "data"
 CARDS_FILE = DATA_DIR / "cards.json"          # File lưu thông tin các thẻ đã đăng ký
 UNKNOWN_CARDS_FILE = DATA_DIR / "unknown_cards.json"  # File lưu các thẻ lạ
+UNKNOWN_CARDS_MAX = 1000          # Số thẻ lạ tối đa giữ lại (loại thẻ lâu không thấy nhất)
+UNKNOWN_CARDS_FLUSH_DELAY = 2.0   # Gộp các thay đổi thẻ lạ thành 1 lần ghi file sau N giây (0 = ghi ngay)
+
+# Bloom filter allowlist cho reader (GET /api/cards/allowlist.bloom)
+ALLOWLIST_BLOOM_FP_RATE = 0.01        # Tỉ lệ false positive mục tiêu (1%)
+ALLOWLIST_BLOOM_MIN_CAPACITY = 1024   # Capacity tối thiểu; filter được dựng lại khi số thẻ vượt capacity
+
+# Nguồn đọc log cho /api/cards/logs
+# "json" = đọc card_logs.json (mặc định), "sql" = truy vấn các partition card_logs_YYYYMM trong database
+LOG_READ_SOURCE = os.environ.get('LOG_READ_SOURCE', 'json').lower()
+LOG_RETENTION_MONTHS = 12  # Số tháng log giữ lại trong database (partition card_logs_YYYYMM)
+
+# Bảo trì SQLite (ANALYZE / incremental vacuum)
+DB_MAINTENANCE_INTERVAL = 86400  # 1 ngày
+DB_MAINTENANCE_WINDOW = (2, 5)   # Khung giờ thấp điểm (giờ local): 02:00 - 05:00
+DB_VACUUM_PAGE_BUDGET = 200      # Số trang mỗi đợt incremental vacuum
+DB_VACUUM_MAX_PAGES = 5000       # Số trang tối đa thu hồi mỗi lần bảo trì
+
+# Đối soát thẻ cards.json <-> bảng cards
+RECONCILE_INTERVAL = 3600  # 1 giờ
+RECONCILE_BUCKETS = 256    # Số bucket hash(uid) mod N
+
+# Self-check bộ đếm occupancy (inside/outside/total) với số đếm lại từ cards.json
+OCCUPANCY_CHECK_INTERVAL = 600  # 10 phút
+
+# Time series cảm biến từng slot (services/slot_history_service.py) - bộ nhớ cố định
+SLOT_HISTORY_FILE = DATA_DIR / "slot_history.json"  # Bucket 1 phút / 1 giờ (mẫu thô chỉ trong bộ nhớ)
+SLOT_HISTORY_RAW_CAPACITY = 1800      # Mẫu thô mỗi slot (~1 giờ với ESP32_POLL_INTERVAL = 2s)
+SLOT_HISTORY_MINUTE_CAPACITY = 1440   # Bucket 1 phút mỗi slot (1 ngày)
+SLOT_HISTORY_HOUR_CAPACITY = 720      # Bucket 1 giờ mỗi slot (30 ngày)
+SLOT_HISTORY_MAX_SLOTS = 256          # Số slot tối đa được theo dõi
+SLOT_HISTORY_PERSIST_INTERVAL = 300   # 5 phút
+SLOT_ANALYTICS_CACHE_FILE = DATA_DIR / "slot_analytics.json"  # Số liệu analytics của các ngày đã kết thúc
+SLOT_ANALYTICS_CACHE_DAYS = 400       # Số ngày giữ trong cache analytics
 
 # Cấu hình mạng
 def detect_api_host():
@@ -48,6 +83,45 @@ API_HOST = "0.0.0.0"  # Chạy trên tất cả interface (localhost + 192.168.x
 API_PORT = 5000
 DEBUG_MODE = True
 
+# Scan ingest TCP/UDP (giao thức text theo dòng, chạy cùng process Flask)
+SCAN_INGEST_ENABLED = os.environ.get('SCAN_INGEST_ENABLED', 'false').lower() == 'true'
+SCAN_INGEST_HOST = API_HOST
+SCAN_INGEST_PORT = int(os.environ.get('SCAN_INGEST_PORT', 5001))
+SCAN_INGEST_PROTOCOL = os.environ.get('SCAN_INGEST_PROTOCOL', 'tcp').lower()  # "tcp", "udp" hoặc "both"
+SCAN_INGEST_WORKERS = 1  # Số thread xử lý scan (1 = tuần tự theo thứ tự đến)
+
+# Chống quẹt trùng: cùng (uid, direction, reader) trong cửa sổ này trả kết quả cũ (0 = tắt)
+SCAN_DEBOUNCE_SECONDS = 2.0
+SCAN_DEBOUNCE_MAX_ENTRIES = 1024
+
+# Event bus trong process (services/event_bus.py)
+EVENT_BUS_WORKERS = 2          # Số thread xử lý subscriber async
+EVENT_BUS_QUEUE_SIZE = 1000    # Kích thước queue riêng của mỗi subscriber async
+EVENT_BUS_PUT_TIMEOUT = 0.05   # Giây chờ khi queue đầy trước khi bỏ event
+
+# Server-Sent Events /api/events/stream (services/event_stream.py)
+EVENT_STREAM_MAX_CLIENTS = 50       # Số kết nối SSE tối đa (vượt -> 503)
+EVENT_STREAM_CLIENT_BUFFER = 100    # Event chờ gửi tối đa mỗi client; đầy -> ngắt, client resume bằng Last-Event-ID
+EVENT_STREAM_REPLAY_SIZE = 500      # Số event gần nhất giữ lại để client kết nối lại không mất event
+EVENT_STREAM_HEARTBEAT = 15.0       # Giây giữa 2 heartbeat khi không có event (giữ kết nối qua proxy)
+EVENT_STREAM_RETRY_MS = 3000        # Gợi ý thời gian kết nối lại cho EventSource
+
+# Health check nền (services/health_monitor.py) - /api/system/health, /health/live, /health/ready chỉ đọc cache
+HEALTH_PROBE_ENABLED = os.environ.get('HEALTH_PROBE_ENABLED', 'true').lower() == 'true'
+HEALTH_PROBE_INTERVAL = 15.0   # Giây giữa 2 vòng health check
+HEALTH_RESULT_TTL = 60.0       # Kết quả cũ hơn (prober treo) -> stale, coi như không khỏe
+
+# Cache xác thực (services/principal_cache.py) - API có JWT không query users / decode lại token mỗi request
+AUTH_PRINCIPAL_TTL = float(os.environ.get('AUTH_PRINCIPAL_TTL', 30))  # Giây giữ role / is_active / token_version của 1 user
+AUTH_PRINCIPAL_CACHE_SIZE = 1024   # Số user tối đa trong cache (LRU)
+AUTH_TOKEN_CACHE_SIZE = 1024       # Số token đã verify tối đa trong cache (LRU)
+
+# Verify mật khẩu ngoài request thread (services/password_verifier.py) - login dồn dập không chiếm hết worker
+AUTH_HASH_POOL = os.environ.get('AUTH_HASH_POOL', 'process')  # 'process' (fork lúc khởi động app) hoặc 'thread'
+AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+AUTH_HASH_MAX_PENDING = int(os.environ.get('AUTH_HASH_MAX_PENDING', AUTH_HASH_WORKERS * 4))  # Đang chạy + chờ; vượt -> 503
+AUTH_HASH_TIMEOUT = 10.0   # Giây chờ kết quả tối đa cho 1 lần verify
+
 # ESP32 configuration
 # Lựa chọn 1: WiFi AP (UNO R4 phát WiFi)
 ESP32_IP = "192.168.4.5"
@@ -55,6 +129,40 @@ ESP32_PORT = 80
 ESP32_TIMEOUT = 10
 DETECTION_THRESHOLD = 10  # cm - threshold for parking detection
 
+# Phát hiện trạng thái slot phía backend (services/slot_detector.py)
+# Có xe khi distance <= SLOT_OCCUPIED_BELOW_CM (khớp firmware: <= 15 cm là có xe - esp32_main.ino),
+# trống lại khi >= SLOT_OCCUPIED_BELOW_CM + SLOT_HYSTERESIS_CM
+SLOT_OCCUPIED_BELOW_CM = float(os.environ.get('SLOT_OCCUPIED_BELOW_CM', '15'))
+SLOT_HYSTERESIS_CM = 5
+SLOT_DEBOUNCE_SAMPLES = 3  # Số mẫu liên tiếp để xác nhận trạng thái mới
+# Ngưỡng riêng từng slot (slot toàn cục), ghi đè bằng biến môi trường SLOT_CALIBRATION (JSON), ví dụ:
+# {"3": {"occupied_below": 8, "vacant_above": 14}}
+SLOT_CALIBRATION = json.loads(os.environ['SLOT_CALIBRATION']) if os.environ.get('SLOT_CALIBRATION') else {}
+
+# HTTP client dùng chung cho ESP32 (utils/http_client.py): keep-alive, retry, circuit breaker
+ESP32_HTTP_POOL_SIZE = 4             # Số connection keep-alive tối đa
+ESP32_HTTP_RETRIES = 2               # Số lần retry cho GET (lỗi kết nối / timeout / 502-504)
+ESP32_HTTP_BACKOFF = 0.2             # Giây - backoff cơ sở (x2 mỗi lần, full jitter)
+ESP32_CONNECT_TIMEOUT = 3            # Giây - timeout mở kết nối (read timeout = ESP32_TIMEOUT)
+ESP32_BREAKER_FAILURE_THRESHOLD = 3  # Số lần lỗi liên tiếp để mở circuit breaker
+ESP32_BREAKER_RESET_TIMEOUT = 15.0   # Giây fail fast trước khi thử lại (half-open)
+
+# Danh sách board cảm biến (services/esp32_fleet.py), đọc song song và gộp thành 1 bản đồ slot:
+# slot toàn cục = slot_offset + slot của board; slot_count (tùy chọn) giới hạn số slot lấy từ board.
+# Ghi đè bằng biến môi trường ESP32_CONTROLLERS (JSON), ví dụ:
+# [{"id": "zone-a", "ip": "192.168.4.5"}, {"id": "zone-b", "ip": "192.168.4.6", "slot_offset": 6}]
+ESP32_CONTROLLERS = json.loads(os.environ['ESP32_CONTROLLERS']) if os.environ.get('ESP32_CONTROLLERS') else [
+    {"id": "esp32-1", "ip": ESP32_IP, "port": ESP32_PORT, "slot_offset": 0}
+]
+ESP32_DEFAULT_SLOT_COUNT = 15  # Dải slot dùng khi board chưa có slot_count / chưa đọc được lần nào (esp32_wokwi: 15)
+ESP32_SLOT_BATCH_MAX = 256  # Số reading tối đa mỗi POST /api/parking-slots/batch (slot do board đẩy lên)
+
+# Poller nền cho ESP32 (services/esp32_poller.py) - API đọc snapshot, không chờ ESP32_TIMEOUT
+ESP32_POLLER_ENABLED = os.environ.get('ESP32_POLLER_ENABLED', 'true').lower() == 'true'
+ESP32_POLL_INTERVAL = 2.0      # Giây giữa 2 lần đọc ESP32
+ESP32_SNAPSHOT_MAX_AGE = 10.0  # Snapshot cũ hơn -> stale=True và kích hoạt refresh nền
+ESP32_SNAPSHOT_WAIT = 2.0      # Giây chờ tối đa lần đọc đầu tiên khi chưa có snapshot
+
 # Lựa chọn 2: Local WiFi (kết nối router có Internet)
 # ESP32_IP = "192.168.1.100"      # // IP của ESP32 trong local WiFi
 # ESP32_PORT = 80
@@ -16,7 +16,7 @@ def init_cors(app):
              "http://192.168.4.3:5000",   # Network access (legacy)
          ],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         allow_headers=["Content-Type", "Authorization"],
+         allow_headers=["Content-Type", "Authorization", "Last-Event-ID"],
          supports_credentials=True
     )
     return app
\ No newline at end of file
@@ -3,14 +3,16 @@ Parking slot data model for ESP32 sensor data
 Định nghĩa cấu trúc dữ liệu cho parking slots từ ESP32
 """
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 class ParkingSlot:
     """
     Individual parking slot representation
     """
     
-    def __init__(self, slot_id: int, status: int, last_updated: Optional[str] = None):
+    def __init__(self, slot_id: int, status: int, last_updated: Optional[str] = None,
+                 controller_id: Optional[str] = None, distance_cm: Optional[float] = None,
+                 last_changed: Optional[str] = None):
         """
         Initialize a parking slot
         
@@ -18,10 +20,16 @@ class ParkingSlot:
             slot_id: Slot number (1-6)
             status: Slot status (0=available, 1=occupied) 
             last_updated: ISO timestamp of last sensor reading
+            controller_id: Board ESP32 đo slot này (dữ liệu gộp nhiều board)
+            distance_cm: Khoảng cách thô lần đọc cuối (nếu firmware gửi)
+            last_changed: Thời điểm slot đổi trạng thái gần nhất
         """
         self.slot_id = slot_id
         self.status = status  # 0 = available, 1 = occupied
         self.last_updated = last_updated or datetime.now(timezone.utc).isoformat()
+        self.controller_id = controller_id
+        self.distance_cm = distance_cm
+        self.last_changed = last_changed
     
     def update_status(self, new_status: int) -> bool:
         """
@@ -36,6 +44,7 @@ class ParkingSlot:
         if self.status != new_status:
             self.status = new_status
             self.last_updated = datetime.now(timezone.utc).isoformat()
+            self.last_changed = self.last_updated
             return True
         return False
     
@@ -49,13 +58,19 @@ class ParkingSlot:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
-        return {
+        data = {
             "slot_id": self.slot_id,
             "status": self.status,
             "available": self.is_available(),
             "occupied": self.is_occupied(),
-            "last_updated": self.last_updated
+            "last_updated": self.last_updated,
+            "last_changed": self.last_changed
         }
+        if self.distance_cm is not None:
+            data["distance_cm"] = self.distance_cm
+        if self.controller_id is not None:
+            data["controller_id"] = self.controller_id
+        return data
 
 class ParkingSlotsData:
     """
@@ -79,21 +94,58 @@ class ParkingSlotsData:
         self.ic_count = self.esp32_raw.get("soIC", 1)
         self.esp32_timestamp = self.esp32_raw.get("timestamp", 0)
         
-        # Process slot data
+        # Process slot data (distances: khoảng cách thô cm, tùy chọn, cùng thứ tự với data)
         raw_data = self.esp32_raw.get("data", [])
+        distances = self.esp32_raw.get("distances") or []
         self.slots = []
         
         for i, status in enumerate(raw_data):
             slot = ParkingSlot(
                 slot_id=i + 1,
                 status=status,
-                last_updated=self.last_updated
+                last_updated=self.last_updated,
+                distance_cm=distances[i] if i < len(distances) and isinstance(distances[i], (int, float))
+                and distances[i] >= 0 else None  # null / -1 = cảm biến lỗi
             )
             self.slots.append(slot)
         
         # Calculate summary statistics
         self._calculate_summary()
     
+    @classmethod
+    def merge(cls, parts: List[Tuple[str, int, Optional[int], "ParkingSlotsData"]]) -> "ParkingSlotsData":
+        """
+        Gộp dữ liệu nhiều board thành 1 bản đồ slot toàn cục
+        
+        Args:
+            parts: List (controller_id, slot_offset, slot_count, data); slot toàn cục = slot_offset + slot_id,
+                   slot_count (None = tất cả) giới hạn số slot lấy từ board
+            
+        Returns:
+            ParkingSlotsData mới, slot sắp theo slot_id toàn cục (trùng id -> giữ board đứng trước)
+        """
+        merged = cls({"success": True, "esp32_data": {"data": []}})
+        merged.total_sensors = 0
+        merged.ic_count = 0
+        slots = {}
+        for controller_id, slot_offset, slot_count, data in parts:
+            board_slots = data.slots if slot_count is None else data.slots[:slot_count]
+            merged.total_sensors += data.total_sensors if slot_count is None else len(board_slots)
+            merged.ic_count += data.ic_count
+            merged.esp32_timestamp = max(merged.esp32_timestamp, data.esp32_timestamp)
+            for slot in board_slots:
+                slots.setdefault(slot_offset + slot.slot_id, ParkingSlot(
+                    slot_id=slot_offset + slot.slot_id,
+                    status=slot.status,
+                    last_updated=slot.last_updated,
+                    controller_id=controller_id,
+                    distance_cm=slot.distance_cm,
+                    last_changed=slot.last_changed
+                ))
+        merged.slots = [slots[slot_id] for slot_id in sorted(slots)]
+        merged._calculate_summary()
+        return merged
+    
     def _calculate_summary(self):
         """Calculate summary statistics"""
         total_slots = len(self.slots)
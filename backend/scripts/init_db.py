@@ -44,6 +44,7 @@ def create_sqlalchemy_models():
         full_name = db.Column(db.String(120))
         role = db.Column(db.String(20), default='staff')  # 'admin', 'staff'
         is_active = db.Column(db.Boolean, default=True)
+        token_version = db.Column(db.Integer, default=0)  # Tăng để thu hồi JWT đã cấp
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
         
@@ -73,7 +74,12 @@ def create_sqlalchemy_models():
     
     class CardLogModel(db.Model):
         __tablename__ = 'card_logs'
-        
+        __table_args__ = (
+            # Index ghép cho các truy vấn lọc theo thẻ/action và sắp xếp theo thời gian
+            db.Index('ix_card_logs_card_number_timestamp', 'card_number', 'timestamp'),
+            db.Index('ix_card_logs_action_timestamp', 'action', 'timestamp'),
+        )
+
         id = db.Column(db.Integer, primary_key=True)
         card_number = db.Column(db.String(50), index=True)
         action = db.Column(db.String(10))  # 'in', 'out'
@@ -83,7 +89,10 @@ def create_sqlalchemy_models():
         duration_minutes = db.Column(db.Integer)
         calculated_fee = db.Column(db.Float)
         notes = db.Column(db.String(255))
-        
+        log_uuid = db.Column(db.String(36), index=True)  # UUID của log entry trong card_logs.json
+        details = db.Column(db.Text)  # details dict (JSON string)
+        log_metadata = db.Column(db.Text)  # metadata dict (JSON string)
+
         def __repr__(self):
             return f'<CardLog {self.card_number} {self.action}>'
     
@@ -94,6 +103,9 @@ def create_sqlalchemy_models():
         slot_number = db.Column(db.String(20), unique=True, nullable=False, index=True)
         status = db.Column(db.String(20), default='empty')  # 'empty', 'occupied', 'reserved'
         assigned_card_id = db.Column(db.String(50))
+        controller_id = db.Column(db.String(50))  # Board ESP32 đo slot (ESP32_CONTROLLERS)
+        sensor_value = db.Column(db.Integer)  # Giá trị cảm biến lần đọc cuối
+        last_reading_at = db.Column(db.DateTime)  # Thời điểm đọc cuối (do board gửi lên)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
         
@@ -130,6 +142,86 @@ def create_sqlalchemy_models():
     return UserModel, CardModel, CardLogModel, ParkingSlotModel, ParkingConfigModel, LoginHistoryModel
 
 
+def upgrade_card_logs_schema(engine):
+    """
+    Bổ sung các cột/index mới cho bảng card_logs trên database đã tồn tại
+    (db.create_all() không ALTER bảng cũ)
+
+    Args:
+        engine: SQLAlchemy engine
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    if 'card_logs' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('card_logs')}
+    new_columns = [
+        ('log_uuid', 'VARCHAR(36)'),
+        ('details', 'TEXT'),
+        ('log_metadata', 'TEXT'),
+    ]
+
+    with engine.begin() as conn:
+        for name, ddl_type in new_columns:
+            if name not in existing_columns:
+                conn.execute(text(f"ALTER TABLE card_logs ADD COLUMN {name} {ddl_type}"))
+
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_card_logs_log_uuid ON card_logs (log_uuid)"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_card_logs_card_number_timestamp ON card_logs (card_number, timestamp)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_card_logs_action_timestamp ON card_logs (action, timestamp)"
+        ))
+
+
+def upgrade_parking_slots_schema(engine):
+    """
+    Bổ sung các cột trạng thái cảm biến cho bảng parking_slots trên database đã tồn tại
+
+    Args:
+        engine: SQLAlchemy engine
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    if 'parking_slots' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('parking_slots')}
+    new_columns = [
+        ('controller_id', 'VARCHAR(50)'),
+        ('sensor_value', 'INTEGER'),
+        ('last_reading_at', 'DATETIME'),
+    ]
+
+    with engine.begin() as conn:
+        for name, ddl_type in new_columns:
+            if name not in existing_columns:
+                conn.execute(text(f"ALTER TABLE parking_slots ADD COLUMN {name} {ddl_type}"))
+
+
+def upgrade_users_schema(engine):
+    """
+    Bổ sung cột token_version cho bảng users trên database đã tồn tại
+
+    Args:
+        engine: SQLAlchemy engine
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'token_version' not in existing_columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
+
+
 def init_db():
     """Initialize database with tables and default data"""
     
@@ -143,6 +235,9 @@ def init_db():
         UserModel, CardModel, CardLogModel, ParkingSlotModel, ParkingConfigModel, LoginHistoryModel = create_sqlalchemy_models()
         
         db.create_all()
+        upgrade_card_logs_schema(db.engine)
+        upgrade_parking_slots_schema(db.engine)
+        upgrade_users_schema(db.engine)
         print(f"✓ Database created at: {DATABASE_PATH}")
         
         # Check if admin user exists
@@ -0,0 +1,243 @@
+"""
+Allowlist Bloom Service - Bloom filter các UID thẻ đã đăng ký cho reader quyết định offline
+
+Chức năng chính:
+- Bloom filter (m bit, k hash) của mọi UID trong cards.json, reader tải về qua
+  GET /api/cards/allowlist.bloom và quyết định mở barrier trước khi backend trả lời
+- Cập nhật tăng dần khi tạo/xóa thẻ (counting bloom: mỗi bit có 1 bộ đếm nên xóa được)
+- Version tăng sau mỗi thay đổi; reader dùng If-None-Match để chỉ tải khi có bản mới
+- Tự đồng bộ lại theo diff khi cards.json bị đổi ngoài luồng create/delete (restore, fix-data)
+
+Format nhị phân (big-endian), cũng là format reference decoder scripts/allowlist_bloom_decoder.py đọc:
+    magic    4 byte  b"BLM1"
+    version  uint32
+    m        uint32  số bit
+    k        uint8   số hàm hash
+    count    uint32  số UID trong filter
+    bits     ceil(m/8) byte, bit i = byte[i >> 3] & (1 << (i & 7))
+
+Hash: h1 = FNV-1a 32-bit(uid), h2 = FNV-1a 32-bit(uid, offset basis ALLOWLIST_BLOOM_SEED2) | 1,
+vị trí thứ i = (h1 + i * h2) mod 2^32 mod m, uid đã chuẩn hóa (viết hoa, bỏ khoảng trắng, ASCII).
+"""
+import math
+import os
+import struct
+import threading
+import time
+import logging
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from config.config import CARDS_FILE, ALLOWLIST_BLOOM_FP_RATE, ALLOWLIST_BLOOM_MIN_CAPACITY
+from utils.file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+BLOOM_MAGIC = b"BLM1"
+BLOOM_HEADER = struct.Struct(">4sIIBI")
+
+FNV_OFFSET_BASIS = 0x811C9DC5
+FNV_PRIME = 0x01000193
+# Offset basis của hàm hash thứ 2 (khác FNV chuẩn để h1, h2 độc lập)
+ALLOWLIST_BLOOM_SEED2 = 0x9747B28C
+
+
+def fnv1a_32(data: bytes, basis: int = FNV_OFFSET_BASIS) -> int:
+    """FNV-1a 32-bit (dễ cài trên firmware: chỉ XOR và nhân)"""
+    value = basis
+    for byte in data:
+        value = ((value ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return value
+
+
+def bloom_positions(uid: str, m: int, k: int) -> List[int]:
+    """k vị trí bit của uid (double hashing)"""
+    data = uid.replace(" ", "").upper().encode("ascii", errors="ignore")
+    h1 = fnv1a_32(data)
+    h2 = fnv1a_32(data, ALLOWLIST_BLOOM_SEED2) | 1
+    return [((h1 + i * h2) & 0xFFFFFFFF) % m for i in range(k)]
+
+
+def bloom_parameters(capacity: int, fp_rate: float) -> Tuple[int, int]:
+    """
+    Số bit m (làm tròn lên bội số của 8) và số hash k tối ưu cho capacity phần tử
+
+    m = -n * ln(p) / ln(2)^2, k = m / n * ln(2)
+    """
+    capacity = max(1, capacity)
+    m = int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+    m = max(64, (m + 7) // 8 * 8)
+    k = max(1, min(16, int(round(m / capacity * math.log(2)))))
+    return m, k
+
+
+class AllowlistBloomService:
+    """
+    Counting bloom filter cho allowlist
+
+    Mỗi bit có bộ đếm 1 byte (bão hòa ở 255); bit = 1 khi bộ đếm > 0. Khi số thẻ
+    vượt capacity, filter được dựng lại với capacity gấp đôi để giữ tỉ lệ false positive.
+    """
+
+    def __init__(self, fp_rate: float = ALLOWLIST_BLOOM_FP_RATE,
+                 min_capacity: int = ALLOWLIST_BLOOM_MIN_CAPACITY):
+        self.fp_rate = fp_rate
+        self.min_capacity = max(1, min_capacity)
+        self.file_manager = FileManager()
+        self._lock = threading.RLock()
+        self._members: Set[str] = set()
+        self._capacity = 0
+        self._m = 0
+        self._k = 0
+        self._counters = bytearray()
+        self._bits = bytearray()
+        # Version khởi tạo theo thời gian để vẫn tăng dần sau khi restart backend
+        self._version = int(time.time())
+        self._synced_mtime: Optional[float] = None
+        self._loaded = False
+        self._encoded: Optional[bytes] = None
+
+    @staticmethod
+    def _normalize(uid: str) -> str:
+        return uid.replace(" ", "").upper()
+
+    def _cards_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(CARDS_FILE).st_mtime
+        except OSError:
+            return None
+
+    def _read_uids(self) -> Set[str]:
+        success, raw_data = self.file_manager.read_json(CARDS_FILE, default_value={})
+        if not success or not isinstance(raw_data, dict):
+            raise IOError(f"Cannot read {CARDS_FILE}")
+        return {self._normalize(str(uid)) for uid in raw_data}
+
+    def _rebuild(self, members: Iterable[str]):
+        """Dựng lại toàn bộ filter (gọi khi đang giữ lock)"""
+        self._members = set(members)
+        self._capacity = max(self.min_capacity, len(self._members) * 2)
+        self._m, self._k = bloom_parameters(self._capacity, self.fp_rate)
+        self._counters = bytearray(self._m)
+        self._bits = bytearray(self._m // 8)
+        for uid in self._members:
+            self._set(uid)
+        self._changed()
+        logger.info(f"Allowlist bloom rebuilt: {len(self._members)} cards, m={self._m}, k={self._k}")
+
+    def _set(self, uid: str):
+        counters, bits = self._counters, self._bits
+        for position in bloom_positions(uid, self._m, self._k):
+            if counters[position] < 255:
+                counters[position] += 1
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def _unset(self, uid: str):
+        counters, bits = self._counters, self._bits
+        for position in bloom_positions(uid, self._m, self._k):
+            # Bộ đếm đã bão hòa thì giữ nguyên (không biết giá trị thật)
+            if 0 < counters[position] < 255:
+                counters[position] -= 1
+                if counters[position] == 0:
+                    bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+    def _changed(self):
+        self._version += 1
+        self._encoded = None
+
+    def _ensure_loaded(self):
+        """Dựng filter lần đầu / đồng bộ lại khi cards.json đổi ngoài create/delete (gọi khi đang giữ lock)"""
+        mtime = self._cards_mtime()
+        if self._loaded and mtime == self._synced_mtime:
+            return
+
+        uids = self._read_uids()
+        if not self._loaded:
+            self._rebuild(uids)
+            self._loaded = True
+        else:
+            added = uids - self._members
+            removed = self._members - uids
+            if added or removed:
+                self._apply(added, removed)
+        self._synced_mtime = mtime
+
+    def _apply(self, added: Iterable[str], removed: Iterable[str]):
+        """Cập nhật tăng dần (gọi khi đang giữ lock)"""
+        added = [uid for uid in added if uid not in self._members]
+        removed = [uid for uid in removed if uid in self._members]
+        if not added and not removed:
+            return
+        if len(self._members) + len(added) > self._capacity:
+            self._rebuild((self._members - set(removed)) | set(added))
+            return
+        for uid in removed:
+            self._members.discard(uid)
+            self._unset(uid)
+        for uid in added:
+            self._members.add(uid)
+            self._set(uid)
+        self._changed()
+
+    def add(self, uid: str):
+        """Thẻ mới được tạo"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._apply([self._normalize(uid)], [])
+            self._synced_mtime = self._cards_mtime()
+
+    def remove(self, uid: str):
+        """Thẻ bị xóa"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._apply([], [self._normalize(uid)])
+            self._synced_mtime = self._cards_mtime()
+
+    def might_contain(self, uid: str) -> bool:
+        """True nếu uid có thể nằm trong allowlist (False = chắc chắn không)"""
+        with self._lock:
+            self._ensure_loaded()
+            bits = self._bits
+            return all(bits[position >> 3] & (1 << (position & 7))
+                       for position in bloom_positions(uid, self._m, self._k))
+
+    def get_version(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return self._version
+
+    def encode(self) -> Tuple[int, bytes]:
+        """
+        Filter dạng nhị phân (header + bit array)
+
+        Returns:
+            Tuple of (version, payload)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._encoded is None:
+                header = BLOOM_HEADER.pack(BLOOM_MAGIC, self._version & 0xFFFFFFFF,
+                                           self._m, self._k, len(self._members))
+                self._encoded = header + bytes(self._bits)
+            return self._version, self._encoded
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_loaded()
+            count = len(self._members)
+            # Tỉ lệ false positive ước lượng: (1 - e^(-kn/m))^k
+            estimated_fp = (1 - math.exp(-self._k * count / self._m)) ** self._k if self._m else None
+            return {
+                "version": self._version,
+                "count": count,
+                "capacity": self._capacity,
+                "m": self._m,
+                "k": self._k,
+                "size_bytes": BLOOM_HEADER.size + len(self._bits),
+                "estimated_fp_rate": round(estimated_fp, 6) if estimated_fp is not None else None
+            }
+
+
+# Global instance - CardService cập nhật khi tạo/xóa thẻ, API cards phục vụ cho reader
+allowlist_bloom = AllowlistBloomService()
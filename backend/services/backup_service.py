@@ -201,6 +201,10 @@ class BackupService:
             # Copy backup file thành file chính
             shutil.copy2(backup_path, CARDS_FILE)
             
+            # cards.json bị thay thế -> đếm lại occupancy ở lần đọc sau
+            from services.occupancy_counter import occupancy_counter
+            occupancy_counter.invalidate()
+            
             success_msg = f"Data restored from backup: {backup_filename}"
             logger.info(success_msg)
             return True, success_msg
@@ -4,16 +4,20 @@ Ghi log chi tiết cho mọi thao tác: vào/ra bãi, thêm/xóa thẻ, etc.
 """
 import json
 import logging
+import threading
 import uuid
 from datetime import datetime, timezone
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 from enum import Enum
 
-from config.config import CARDS_FILE
+from config.config import CARDS_FILE, LOG_READ_SOURCE
 
 logger = logging.getLogger(__name__)
 
+# Khóa đọc/ghi card_logs.json dùng chung cho mọi CardLogService (request thread + subscriber event bus)
+_log_file_lock = threading.RLock()
+
 class LogAction(Enum):
     """Enum định nghĩa các loại hành động log"""
     CARD_ENTRY = "entry"           # Thẻ vào bãi
@@ -42,7 +46,18 @@ class CardLogService:
         # Migrate existing logs to use UUID if needed
         self._migrate_old_log_ids()
         
-        logger.info(f"CardLogService initialized - log file: {self.log_file}")
+        # Nguồn đọc logs: "json" hoặc "sql" (xem LOG_READ_SOURCE trong config)
+        self.read_source = LOG_READ_SOURCE
+        self._query_service = None
+        
+        logger.info(f"CardLogService initialized - log file: {self.log_file}, read source: {self.read_source}")
+    
+    @property
+    def query_service(self):
+        if self._query_service is None:
+            from services.log_query_service import LogQueryService
+            self._query_service = LogQueryService()
+        return self._query_service
     
     def _ensure_log_file(self):
         """Tạo file log nếu chưa tồn tại"""
@@ -117,20 +132,21 @@ class CardLogService:
             # Thêm thông tin context tự động
             log_entry["details"]["local_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            # ✅ Ghi vào JSON file
-            log_data = self._read_log_file()
-            log_data["logs"].append(log_entry)
-            
-            # Giới hạn số lượng logs (tối đa 10000 entries để tránh file quá lớn)
-            max_logs = 10000
-            if len(log_data["logs"]) > max_logs:
-                # Giữ lại 8000 logs mới nhất
-                log_data["logs"] = log_data["logs"][-8000:]
-                logger.info(f"Trimmed logs to keep latest 8000 entries")
-            
-            # Ghi lại file
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(log_data, f, ensure_ascii=False, indent=2)
+            # ✅ Ghi vào JSON file (đọc - thêm - ghi trong lock để không mất log khi ghi đồng thời)
+            with _log_file_lock:
+                log_data = self._read_log_file()
+                log_data["logs"].append(log_entry)
+                
+                # Giới hạn số lượng logs (tối đa 10000 entries để tránh file quá lớn)
+                max_logs = 10000
+                if len(log_data["logs"]) > max_logs:
+                    # Giữ lại 8000 logs mới nhất
+                    log_data["logs"] = log_data["logs"][-8000:]
+                    logger.info(f"Trimmed logs to keep latest 8000 entries")
+                
+                # Ghi lại file
+                with open(self.log_file, 'w', encoding='utf-8') as f:
+                    json.dump(log_data, f, ensure_ascii=False, indent=2)
             
             # ✅ Ghi vào database (nếu available)
             self._save_to_database(card_id, action, log_entry)
@@ -152,42 +168,17 @@ class CardLogService:
             log_entry: Log entry dict
         """
         try:
-            # Tạo CardLogModel entry - mapping fields từ JSON sang database
-            card_log_data = {
-                "card_number": card_id,  # Map từ card_id
-                "action": action.value,  # entry, exit, scan, unknown, created, deleted, etc
-                "notes": log_entry["details"].get("local_time", ""),  # Store local_time as notes
-            }
+            # Map fields từ JSON sang database (giữ nguyên id, details, metadata
+            # để có thể đọc lại từ SQL với cùng format)
+            from services.log_query_service import LogQueryService
+            card_log_data = LogQueryService.build_row_data(log_entry)
             
-            # Parse timestamp safely
-            try:
-                timestamp_str = log_entry["timestamp"]
-                if isinstance(timestamp_str, str):
-                    card_log_data["timestamp"] = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                else:
-                    card_log_data["timestamp"] = timestamp_str
-            except (ValueError, KeyError):
-                card_log_data["timestamp"] = datetime.now(timezone.utc)
-            
-            # Nếu có source info, thêm vào notes
-            if "source" in log_entry["details"]:
-                card_log_data["notes"] = f"{card_log_data['notes']} [Source: {log_entry['details']['source']}]"
-            
-            # Nếu có thêm info, thêm vào metadata
-            if log_entry.get("metadata"):
-                card_log_data["notes"] = f"{card_log_data['notes']} {json.dumps(log_entry['metadata'])}"
-            
-            # Thử import và save vào database
+            # Thử import và save vào database (partition card_logs_YYYYMM theo timestamp)
             try:
                 from app import db as app_db
-                from scripts.init_db import create_sqlalchemy_models
+                from services.log_partition_service import log_partition_router
                 
-                # Get CardLogModel
-                UserModel, CardModel, CardLogModel, ParkingSlotModel, ParkingConfigModel = create_sqlalchemy_models()
-                
-                # Tạo record mới
-                new_log = CardLogModel(**card_log_data)
-                app_db.session.add(new_log)
+                log_partition_router.insert(card_log_data)
                 app_db.session.commit()
                 
                 logger.debug(f"Saved log to database: {card_id} - {action.value}")
@@ -199,6 +190,7 @@ class CardLogService:
                 logger.debug(f"Database write failed: {db_error}")
                 try:
                     app_db.session.rollback()
+                    log_partition_router.invalidate()
                 except:
                     pass
                 
@@ -209,7 +201,7 @@ class CardLogService:
     def _read_log_file(self) -> Dict[str, Any]:
         """Đọc file log, trả về dict hoặc tạo mới nếu bị lỗi"""
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
+            with _log_file_lock, open(self.log_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logger.warning(f"Log file read error, creating new: {e}")
@@ -227,7 +219,10 @@ class CardLogService:
                  card_id: Optional[str] = None,
                  action: Optional[LogAction] = None,
                  limit: int = 100,
-                 offset: int = 0) -> Dict[str, Any]:
+                 offset: int = 0,
+                 since: Optional[datetime] = None,
+                 until: Optional[datetime] = None,
+                 order: str = "desc") -> Dict[str, Any]:
         """
         Lấy danh sách logs với filter + total count cho pagination
         
@@ -236,11 +231,30 @@ class CardLogService:
             action: Filter theo loại action (optional)  
             limit: Số lượng logs tối đa trả về
             offset: Bỏ qua n logs đầu tiên
+            since: Chỉ lấy logs từ thời điểm này (optional)
+            until: Chỉ lấy logs trước thời điểm này (optional)
+            order: "desc" (mới nhất trước) hoặc "asc"
             
         Returns:
             Dict với keys: logs, total_count, filtered_count
         """
+        if self.read_source == "sql":
+            try:
+                return self.query_service.get_logs_with_count(
+                    card_id=card_id,
+                    action=action.value if action else None,
+                    since=since,
+                    until=until,
+                    order=order,
+                    limit=limit,
+                    offset=offset
+                )
+            except Exception as e:
+                logger.warning(f"SQL log query failed, falling back to JSON: {e}")
+        
         try:
+            from services.log_query_service import parse_log_time
+            
             log_data = self._read_log_file()
             all_logs = log_data.get("logs", [])
             
@@ -254,8 +268,27 @@ class CardLogService:
             if action:
                 filtered_logs = [log for log in filtered_logs if log.get("action") == action.value]
             
-            # Sort theo timestamp (mới nhất trước)
-            filtered_logs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+            # Filter theo khoảng thời gian nếu được chỉ định
+            if since is not None or until is not None:
+                since_dt = parse_log_time(since)
+                until_dt = parse_log_time(until)
+                in_range = []
+                for log in filtered_logs:
+                    try:
+                        log_dt = parse_log_time(log.get("timestamp"))
+                    except ValueError:
+                        continue
+                    if log_dt is None:
+                        continue
+                    if since_dt is not None and log_dt < since_dt:
+                        continue
+                    if until_dt is not None and log_dt >= until_dt:
+                        continue
+                    in_range.append(log)
+                filtered_logs = in_range
+            
+            # Sort theo timestamp (mặc định mới nhất trước)
+            filtered_logs.sort(key=lambda x: x.get("timestamp", ""), reverse=(order != "asc"))
             
             # Get total count sau khi filter
             total_count = len(filtered_logs)
@@ -0,0 +1,211 @@
+"""
+Card Reconciliation Service - Đối soát thẻ giữa cards.json và bảng cards (CardModel)
+
+Chức năng chính:
+- Chia thẻ vào N bucket theo hash(uid) mod N ở cả 2 phía
+- So sánh digest từng bucket, chỉ diff chi tiết các bucket lệch
+- Sửa database theo cards.json (nguồn dữ liệu chính)
+- Báo cáo số thẻ thiếu / thừa / sai lệch đã sửa
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+
+from config.config import CARDS_FILE, RECONCILE_BUCKETS
+from utils.file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+# Các cột CardModel được mirror từ cards.json (giống save_card_to_database trong api/cards.py)
+MIRRORED_FIELDS = ("owner_name", "status", "owner_phone", "vehicle_info")
+
+
+def bucket_of(uid: str, bucket_count: int) -> int:
+    """
+    Bucket của thẻ: hash(uid) mod N
+
+    Dùng hash() built-in cho nhanh: giá trị thay đổi giữa các process nhưng 2 phía
+    luôn được tính trong cùng 1 lần chạy nên vẫn so sánh được.
+    """
+    return hash(uid) % bucket_count
+
+
+class CardReconciliationService:
+    """
+    Lớp service đối soát và sửa lệch dữ liệu thẻ giữa JSON và database
+
+    cards.json là nguồn chính: thẻ thiếu trong database được thêm, thẻ chỉ có
+    trong database bị xóa, thẻ lệch giá trị được cập nhật theo JSON.
+    """
+
+    def __init__(self, bucket_count: int = RECONCILE_BUCKETS):
+        self.bucket_count = max(1, bucket_count)
+        self.file_manager = FileManager()
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _load_json_side(self) -> Dict[str, Tuple[Optional[str], ...]]:
+        """Đọc cards.json -> {uid: mirrored fields} (mapping giống save_card_to_database)"""
+        success, raw_data = self.file_manager.read_json(CARDS_FILE, default_value={})
+        if not success:
+            raise IOError(f"Cannot read {CARDS_FILE}")
+        side = {}
+        for uid, card_data in raw_data.items():
+            if isinstance(card_data, dict):
+                get = card_data.get
+                side[str(uid)] = (
+                    get("name") or "",
+                    "active" if get("status") == 1 else "inactive",
+                    get("entry_time") or None,
+                    get("exit_time") or None,
+                )
+        return side
+
+    def _load_db_side(self, CardModel) -> Dict[str, Tuple[Optional[str], ...]]:
+        """Đọc bảng cards (chỉ các cột cần so sánh) -> {card_number: mirrored fields}"""
+        from app import db
+
+        # Đọc bằng cursor DB-API để tránh chi phí dựng Row của SQLAlchemy (~100k dòng)
+        columns = ", ".join(("card_number",) + MIRRORED_FIELDS)
+        cursor = db.session.connection().connection.driver_connection.execute(
+            f"SELECT {columns} FROM {CardModel.__tablename__}"
+        )
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def _bucket_digests(self, side: Dict[str, Tuple[Optional[str], ...]]) -> List[int]:
+        """Digest từng bucket = XOR hash(uid, fields) của các thẻ trong bucket (không phụ thuộc thứ tự)"""
+        bucket_count = self.bucket_count
+        digests = [0] * bucket_count
+        # Vòng lặp nóng (~100k thẻ): inline bucket_of để tránh chi phí gọi hàm
+        for uid, fields in side.items():
+            digests[hash(uid) % bucket_count] ^= hash((uid,) + fields)
+        return digests
+
+    def reconcile(self, repair: bool = True) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Đối soát cards.json với bảng cards và (tùy chọn) sửa database
+
+        Args:
+            repair: False để chỉ báo cáo (dry run)
+
+        Returns:
+            Tuple of (success, report)
+        """
+        if not self._lock.acquire(blocking=False):
+            return False, {"error": "Reconciliation already running"}
+
+        started = time.perf_counter()
+        report: Dict[str, Any] = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "bucket_count": self.bucket_count,
+            "repair": repair,
+            "success": False
+        }
+
+        try:
+            from app import db
+            from models.models_cache import get_sqlalchemy_models
+
+            _, CardModel, _, _, _, _ = get_sqlalchemy_models()
+
+            json_side = self._load_json_side()
+            db_side = self._load_db_side(CardModel)
+            report["json_cards"] = len(json_side)
+            report["db_cards"] = len(db_side)
+
+            json_digests = self._bucket_digests(json_side)
+            db_digests = self._bucket_digests(db_side)
+            mismatched_buckets = {
+                index for index in range(self.bucket_count)
+                if json_digests[index] != db_digests[index]
+            }
+            report["mismatched_buckets"] = len(mismatched_buckets)
+            report["detect_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+            # Chỉ diff chi tiết các bucket lệch
+            missing, extra, changed = [], [], []
+            if mismatched_buckets:
+                for uid, fields in json_side.items():
+                    if bucket_of(uid, self.bucket_count) not in mismatched_buckets:
+                        continue
+                    if uid not in db_side:
+                        missing.append(uid)
+                    elif db_side[uid] != fields:
+                        changed.append(uid)
+                for uid in db_side:
+                    if uid not in json_side and bucket_of(uid, self.bucket_count) in mismatched_buckets:
+                        extra.append(uid)
+
+            report["missing_in_db"] = len(missing)
+            report["extra_in_db"] = len(extra)
+            report["changed"] = len(changed)
+            report["sample"] = {
+                "missing_in_db": missing[:20],
+                "extra_in_db": extra[:20],
+                "changed": changed[:20]
+            }
+
+            if repair and (missing or extra or changed):
+                self._repair(db, CardModel, json_side, missing, extra, changed)
+                report["repaired"] = len(missing) + len(extra) + len(changed)
+            else:
+                report["repaired"] = 0
+
+            report["success"] = True
+            if mismatched_buckets:
+                logger.warning(f"Card reconciliation: {len(mismatched_buckets)} buckets drifted - "
+                               f"missing {len(missing)}, extra {len(extra)}, changed {len(changed)}, "
+                               f"repaired {report['repaired']}")
+            else:
+                logger.info(f"Card reconciliation: {len(json_side)} cards in sync")
+
+        except Exception as e:
+            report["error"] = str(e)
+            logger.error(f"Card reconciliation failed: {e}")
+            try:
+                from app import db
+                db.session.rollback()
+            except Exception:
+                pass
+
+        finally:
+            report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self.last_report = report
+            self._lock.release()
+
+        return report["success"], report
+
+    def _repair(self, db, CardModel, json_side: Dict[str, Tuple[Optional[str], ...]],
+                missing: List[str], extra: List[str], changed: List[str]):
+        """Sửa database theo cards.json trong 1 transaction"""
+        table = CardModel.__table__
+        now = datetime.now(timezone.utc)
+
+        if missing:
+            db.session.execute(table.insert(), [
+                dict(zip(MIRRORED_FIELDS, json_side[uid]),
+                     card_number=uid, card_type="unknown", created_at=now, updated_at=now)
+                for uid in missing
+            ])
+
+        for uid in changed:
+            db.session.execute(
+                table.update()
+                .where(table.c.card_number == uid)
+                .values(**dict(zip(MIRRORED_FIELDS, json_side[uid])), updated_at=now)
+            )
+
+        if extra:
+            db.session.execute(table.delete().where(table.c.card_number.in_(extra)))
+
+        db.session.commit()
+
+    def get_last_report(self) -> Optional[Dict[str, Any]]:
+        """Báo cáo của lần đối soát gần nhất"""
+        return self.last_report
+
+
+# Global instance - dùng chung cho ScheduledTasks và System API
+card_reconciliation_service = CardReconciliationService()
@@ -15,7 +15,12 @@ import logging
 
 from models.card import ParkingCard
 from utils.file_manager import FileManager
-from config.config import CARDS_FILE, UNKNOWN_CARDS_FILE
+from utils.latency import scan_latency
+from services.scan_debounce_service import scan_debouncer
+from services.unknown_card_store import unknown_card_store
+from services.allowlist_bloom_service import allowlist_bloom
+from services.occupancy_counter import occupancy_counter
+from config.config import CARDS_FILE
 
 logger = logging.getLogger(__name__)
 
@@ -112,9 +117,15 @@ class CardService:
             for card_uid, card_obj in cards_dict.items():
                 cards_data[card_uid] = card_obj.to_dict()
             
-            success, message = self.file_manager.write_json(CARDS_FILE, cards_data, max_backups=5)
+            # Ghi file + cập nhật bộ đếm trong cùng lock (self-check không đếm lại chen giữa)
+            with occupancy_counter.transaction():
+                success, message = self.file_manager.write_json(CARDS_FILE, cards_data, max_backups=5)
+                if success:
+                    occupancy_counter.on_created(status)
             
             if success:
+                scan_debouncer.invalidate(uid)
+                allowlist_bloom.add(uid)
                 try:
                     from services.card_log_service import LogAction
                     self.log_service.add_log(uid, LogAction.CARD_CREATED, {"initial_status": status})
@@ -140,15 +151,21 @@ class CardService:
                 logger.warning(error_msg)
                 return False, error_msg
             
+            deleted_status = cards_dict[uid].status
             del cards_dict[uid]
             
             cards_data = {}
             for card_uid, card_obj in cards_dict.items():
                 cards_data[card_uid] = card_obj.to_dict()
             
-            success, message = self.file_manager.write_json(CARDS_FILE, cards_data, max_backups=5)
+            with occupancy_counter.transaction():
+                success, message = self.file_manager.write_json(CARDS_FILE, cards_data, max_backups=5)
+                if success:
+                    occupancy_counter.on_deleted(deleted_status)
             
             if success:
+                scan_debouncer.invalidate(uid)
+                allowlist_bloom.remove(uid)
                 try:
                     from services.card_log_service import LogAction
                     self.log_service.add_log(uid, LogAction.CARD_DELETED, {"reason": "manual_deletion"})
@@ -168,7 +185,8 @@ class CardService:
             
     def update_card_status(self, uid: str, new_status: int) -> Tuple[bool, str, Optional[Dict]]:
         try:
-            cards_dict = self.get_all_cards()
+            with scan_latency.span("update_card_status.read"):
+                cards_dict = self.get_all_cards()
             if uid not in cards_dict:
                 error_msg = f"Thẻ {uid} không tồn tại"
                 logger.warning(error_msg)
@@ -185,15 +203,23 @@ class CardService:
             for card_uid, card_obj in cards_dict.items():
                 cards_data[card_uid] = card_obj.to_dict()
             
-            success, message = self.file_manager.write_json(CARDS_FILE, cards_data, max_backups=5)
+            # Bao gồm cả backup file cards.json (xem file_io_latency)
+            with occupancy_counter.transaction():
+                with scan_latency.span("update_card_status.write_json"):
+                    success, message = self.file_manager.write_json(CARDS_FILE, cards_data, max_backups=5)
+                if success:
+                    occupancy_counter.on_status_changed(old_status, new_status)
             
             if success:
+                # Kết quả quẹt đã cache của thẻ không còn đúng
+                scan_debouncer.invalidate(uid)
                 try:
                     from services.card_log_service import LogAction
-                    if new_status == 1:
-                        self.log_service.add_log(uid, LogAction.CARD_ENTRY, {"previous_status": old_status, "new_status": new_status})
-                    else:
-                        self.log_service.add_log(uid, LogAction.CARD_EXIT, {"previous_status": old_status, "new_status": new_status})
+                    with scan_latency.span("update_card_status.log"):
+                        if new_status == 1:
+                            self.log_service.add_log(uid, LogAction.CARD_ENTRY, {"previous_status": old_status, "new_status": new_status})
+                        else:
+                            self.log_service.add_log(uid, LogAction.CARD_EXIT, {"previous_status": old_status, "new_status": new_status})
                 except Exception as e:
                     logger.warning(f"Failed to log status update: {e}")
                 
@@ -211,9 +237,8 @@ class CardService:
             
     def get_statistics(self) -> Dict[str, Any]:
         try:
-            cards = self.get_all_cards()
-            total_cards = len(cards)
-            inside_count = sum(1 for card in cards.values() if card.status == 1)
+            # O(1): bộ đếm cập nhật khi tạo/xóa/đổi trạng thái thẻ (xem services/occupancy_counter.py)
+            total_cards, inside_count = occupancy_counter.get_counts()
             outside_count = total_cards - inside_count
             
             return {
@@ -228,11 +253,10 @@ class CardService:
             
     def add_unknown_card(self, uid: str, metadata: Dict[str, Any] = None) -> Tuple[bool, str]:
         try:
-            unknown_cards = self.get_unknown_cards()
-            normalized_uid = uid.upper().strip()
-            for card in unknown_cards:
-                if card.get("uid") == normalized_uid:
-                    return True, f"Unknown card {uid} already exists"
+            # Thẻ đã có -> chỉ tăng count / last_seen, không ghi log trùng
+            is_new, entry = unknown_card_store.record(uid, metadata)
+            if not is_new:
+                return True, f"Unknown card {uid} already exists (seen {entry['count']} times)"
             
             try:
                 from services.card_log_service import LogAction
@@ -240,22 +264,8 @@ class CardService:
             except Exception as e:
                 logger.warning(f"Failed to log unknown card: {e}")
             
-            unknown_card = {
-                "uid": normalized_uid,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                **(metadata or {})
-            }
-            
-            unknown_cards.append(unknown_card)
-            data = {"unknown_cards": unknown_cards}
-            success, message = self.file_manager.write_json(UNKNOWN_CARDS_FILE, data, max_backups=5)
-            
-            if success:
-                logger.info(f"Added unknown card: {uid}")
-                return True, f"Unknown card {uid} added successfully"
-            else:
-                logger.error(f"Failed to save unknown card: {message}")
-                return False, f"Failed to save unknown card: {message}"
+            logger.info(f"Added unknown card: {uid}")
+            return True, f"Unknown card {uid} added successfully"
         except Exception as e:
             error_msg = f"Error adding unknown card {uid}: {e}"
             logger.error(error_msg)
@@ -263,32 +273,18 @@ class CardService:
 
     def get_unknown_cards(self) -> List[Dict[str, Any]]:
         try:
-            success, data = self.file_manager.read_json(UNKNOWN_CARDS_FILE, default_value={"unknown_cards": []})
-            if success:
-                return data.get("unknown_cards", [])
-            return []
+            return unknown_card_store.list()
         except Exception as e:
             logger.error(f"Failed to load unknown cards: {e}")
             return []
     
     def remove_unknown_card(self, uid: str) -> Tuple[bool, str]:
         try:
-            unknown_cards = self.get_unknown_cards()
-            normalized_uid = uid.upper().strip()
-            updated_cards = [card for card in unknown_cards if card.get("uid") != normalized_uid]
-            
-            if len(updated_cards) == len(unknown_cards):
+            if not unknown_card_store.remove(uid):
                 return True, f"Unknown card {uid} was not in list"
             
-            data = {"unknown_cards": updated_cards}
-            success, message = self.file_manager.write_json(UNKNOWN_CARDS_FILE, data, max_backups=5)
-            
-            if success:
-                logger.info(f"Removed unknown card: {uid}")
-                return True, f"Unknown card {uid} removed successfully"
-            else:
-                logger.error(f"Failed to remove unknown card: {message}")
-                return False, f"Failed to remove unknown card: {message}"
+            logger.info(f"Removed unknown card: {uid}")
+            return True, f"Unknown card {uid} removed successfully"
         except Exception as e:
             error_msg = f"Failed to remove unknown card {uid}: {e}"
             logger.error(error_msg)
@@ -297,8 +293,9 @@ class CardService:
     def clear_unknown_cards(self) -> bool:
         """Clear all unknown cards from the system"""
         try:
-            data = {"unknown_cards": []}
-            success, message = self.file_manager.write_json(UNKNOWN_CARDS_FILE, data, max_backups=5)
+            unknown_card_store.clear()
+            # Xóa thủ công từ admin -> ghi file ngay, không chờ ghi gộp
+            success, message = unknown_card_store.flush()
             
             if success:
                 logger.info("Cleared all unknown cards")
@@ -0,0 +1,232 @@
+"""
+Database Maintenance Service - Bảo trì định kỳ file SQLite (parking_system.db)
+
+Chức năng chính:
+- PRAGMA optimize / ANALYZE để giữ query plan tốt
+- Incremental vacuum theo từng đợt nhỏ (page budget) để thu hồi dung lượng
+  mà không khóa database lâu, tránh chặn các lượt quẹt thẻ
+- quick_check để phát hiện lỗi file database
+- Ghi nhận page_count, freelist_count, thời gian chạy của mỗi lần bảo trì
+"""
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from config.config import (
+    DB_MAINTENANCE_WINDOW, DB_VACUUM_PAGE_BUDGET, DB_VACUUM_MAX_PAGES
+)
+
+logger = logging.getLogger(__name__)
+
+# auto_vacuum modes của SQLite
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class DatabaseMaintenanceService:
+    """
+    Lớp service chạy các tác vụ bảo trì SQLite
+
+    Mỗi lệnh chạy trên connection AUTOCOMMIT riêng, incremental vacuum được chia
+    thành nhiều đợt DB_VACUUM_PAGE_BUDGET trang, nghỉ giữa các đợt để các request
+    ghi (scan thẻ) chen vào được.
+    """
+
+    def __init__(self, history_size: int = 10):
+        self._lock = threading.Lock()
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.history = deque(maxlen=history_size)
+        self.total_runs = 0
+
+    def _get_engine(self):
+        """Lấy engine (lazy import để tránh circular import, cần app context)"""
+        from app import db
+        return db.engine
+
+    @staticmethod
+    def is_off_peak(now: Optional[datetime] = None) -> bool:
+        """
+        Kiểm tra thời điểm hiện tại có nằm trong khung giờ thấp điểm không
+
+        Args:
+            now: Thời điểm local (mặc định hiện tại)
+
+        Returns:
+            True nếu nằm trong DB_MAINTENANCE_WINDOW (giờ bắt đầu, giờ kết thúc)
+        """
+        start_hour, end_hour = DB_MAINTENANCE_WINDOW
+        hour = (now or datetime.now()).hour
+        if start_hour <= end_hour:
+            return start_hour <= hour < end_hour
+        # Khung giờ qua nửa đêm, ví dụ (23, 4)
+        return hour >= start_hour or hour < end_hour
+
+    @staticmethod
+    def _read_page_stats(conn) -> Dict[str, int]:
+        """Đọc page_size, page_count, freelist_count, auto_vacuum"""
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar() or 0
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar() or 0
+        freelist_count = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+        auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() or 0
+        return {
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_count": freelist_count,
+            "file_size_bytes": page_size * page_count,
+            "auto_vacuum": AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum))
+        }
+
+    def _enable_incremental_vacuum(self, conn) -> bool:
+        """
+        Chuyển database sang auto_vacuum=INCREMENTAL (chỉ làm 1 lần)
+
+        SQLite chỉ áp dụng thay đổi auto_vacuum sau một lần VACUUM đầy đủ.
+        Database của hệ thống nhỏ nên lần VACUUM này chạy nhanh.
+
+        Returns:
+            True nếu đã chuyển đổi trong lần chạy này
+        """
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() or 0
+        if mode == 2:
+            return False
+
+        logger.info("Switching database to auto_vacuum=INCREMENTAL (one-time full VACUUM)")
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        return True
+
+    def _incremental_vacuum(self, conn, page_budget: int, max_pages: int,
+                            pause_seconds: float) -> Tuple[int, int]:
+        """
+        Thu hồi các trang trống theo từng đợt page_budget trang
+
+        Returns:
+            Tuple (số trang đã thu hồi, số đợt đã chạy)
+        """
+        reclaimed = 0
+        batches = 0
+        while reclaimed < max_pages:
+            free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+            if free_pages <= 0:
+                break
+
+            batch = min(page_budget, free_pages, max_pages - reclaimed)
+            # sqlite3 execute() chỉ step 1 lần (= 1 trang); executescript chạy hết lệnh
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(batch)});")
+            remaining = conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+            if remaining >= free_pages:
+                break
+            reclaimed += free_pages - remaining
+            batches += 1
+
+            if pause_seconds > 0:
+                time.sleep(pause_seconds)
+        return reclaimed, batches
+
+    def run_maintenance(self,
+                        page_budget: int = DB_VACUUM_PAGE_BUDGET,
+                        max_pages: int = DB_VACUUM_MAX_PAGES,
+                        full_analyze: bool = False,
+                        pause_seconds: float = 0.05) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Chạy 1 lượt bảo trì: optimize/ANALYZE, incremental vacuum, quick_check
+
+        Args:
+            page_budget: Số trang tối đa mỗi đợt incremental vacuum
+            max_pages: Tổng số trang tối đa thu hồi trong lượt này
+            full_analyze: True để chạy ANALYZE toàn bộ thay vì PRAGMA optimize
+            pause_seconds: Thời gian nghỉ giữa các đợt vacuum
+
+        Returns:
+            Tuple of (success, run stats)
+        """
+        if not self._lock.acquire(blocking=False):
+            return False, {"error": "Maintenance already running"}
+
+        started = time.perf_counter()
+        run: Dict[str, Any] = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "success": False
+        }
+
+        try:
+            engine = self._get_engine()
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                run["before"] = self._read_page_stats(conn)
+                run["converted_to_incremental"] = self._enable_incremental_vacuum(conn)
+
+                # ANALYZE đầy đủ nếu được yêu cầu hoặc chưa từng có thống kê
+                has_stats = conn.exec_driver_sql(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                ).scalar()
+                analyze_start = time.perf_counter()
+                if full_analyze or not has_stats:
+                    conn.exec_driver_sql("ANALYZE")
+                    run["analyze"] = "full"
+                else:
+                    conn.exec_driver_sql("PRAGMA optimize")
+                    run["analyze"] = "optimize"
+                run["analyze_ms"] = round((time.perf_counter() - analyze_start) * 1000, 2)
+
+                vacuum_start = time.perf_counter()
+                reclaimed, batches = self._incremental_vacuum(conn, page_budget, max_pages, pause_seconds)
+                run["vacuum"] = {
+                    "pages_reclaimed": reclaimed,
+                    "batches": batches,
+                    "page_budget": page_budget,
+                    "max_pages": max_pages,
+                    "duration_ms": round((time.perf_counter() - vacuum_start) * 1000, 2)
+                }
+
+                integrity = conn.exec_driver_sql("PRAGMA quick_check").fetchall()
+                run["integrity"] = "ok" if [row[0] for row in integrity] == ["ok"] else [row[0] for row in integrity[:10]]
+
+                run["after"] = self._read_page_stats(conn)
+
+            run["success"] = True
+            logger.info(f"Database maintenance completed: reclaimed {reclaimed} pages, "
+                        f"freelist {run['before']['freelist_count']} -> {run['after']['freelist_count']}, "
+                        f"integrity {run['integrity']}")
+
+        except Exception as e:
+            run["error"] = str(e)
+            logger.error(f"Database maintenance failed: {e}")
+
+        finally:
+            run["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self.last_run = run
+            self.history.append(run)
+            self.total_runs += 1
+            self._lock.release()
+
+        return run["success"], run
+
+    def get_status(self) -> Dict[str, Any]:
+        """Thông tin bảo trì cho /api/system/status"""
+        return {
+            "running": self._lock.locked(),
+            "total_runs": self.total_runs,
+            "off_peak_window": {
+                "start_hour": DB_MAINTENANCE_WINDOW[0],
+                "end_hour": DB_MAINTENANCE_WINDOW[1],
+                "active_now": self.is_off_peak()
+            },
+            "page_budget": DB_VACUUM_PAGE_BUDGET,
+            "max_pages_per_run": DB_VACUUM_MAX_PAGES,
+            "last_run": self.last_run,
+            "recent_runs": [
+                {
+                    "started_at": run.get("started_at"),
+                    "success": run.get("success"),
+                    "duration_ms": run.get("duration_ms"),
+                    "pages_reclaimed": run.get("vacuum", {}).get("pages_reclaimed", 0)
+                }
+                for run in self.history
+            ]
+        }
+
+
+# Global instance - dùng chung cho ScheduledTasks và System API
+db_maintenance_service = DatabaseMaintenanceService()
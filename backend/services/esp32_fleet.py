@@ -0,0 +1,220 @@
+"""
+ESP32 Fleet - Registry nhiều board cảm biến ESP32, đọc song song và gộp bản đồ slot
+
+Chức năng chính:
+- Registry controller từ ESP32_CONTROLLERS: id, địa chỉ, slot_offset, slot_count
+- Mỗi board có ESP32Service + HTTP client / circuit breaker riêng (board chính dùng client chung)
+- fetch_all(): đọc mọi board song song trên thread pool; board chậm không chặn board khác
+  (board còn đang đọc từ chu kỳ trước thì bỏ qua, không xếp thêm request)
+- merged(): gộp lần đọc mới nhất của từng board thành 1 ParkingSlotsData toàn cục
+- resolve_slot(): kiểm tra slot do board đẩy lên có thuộc dải slot của board không
+- Health / độ trễ từng board cho /api/parking-slots/status
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait as wait_futures
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from models.parking_slot import ParkingSlotsData
+from services.esp32_service import ESP32Service, esp32_http_client
+from utils.http_client import ResilientHTTPClient
+from utils.latency import LatencyHistogram
+from config.config import (
+    ESP32_CONTROLLERS, ESP32_DEFAULT_SLOT_COUNT, ESP32_IP, ESP32_PORT, ESP32_HTTP_POOL_SIZE, ESP32_HTTP_RETRIES, ESP32_HTTP_BACKOFF,
+    ESP32_CONNECT_TIMEOUT, ESP32_BREAKER_FAILURE_THRESHOLD, ESP32_BREAKER_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ESP32Controller:
+    """1 board cảm biến trong registry"""
+
+    def __init__(self, controller_id: str, ip: str, port: int = ESP32_PORT, slot_offset: int = 0,
+                 slot_count: Optional[int] = None):
+        self.id = controller_id
+        self.slot_offset = slot_offset
+        self.slot_count = slot_count
+        base_url = f"http://{ip}:{port}"
+        # Board mặc định trong config dùng chung client (và breaker) với các ESP32Service khác
+        if base_url == f"http://{ESP32_IP}:{ESP32_PORT}":
+            http = esp32_http_client
+        else:
+            http = ResilientHTTPClient(
+                f"esp32:{controller_id}",
+                pool_size=ESP32_HTTP_POOL_SIZE,
+                retries=ESP32_HTTP_RETRIES,
+                backoff=ESP32_HTTP_BACKOFF,
+                connect_timeout=ESP32_CONNECT_TIMEOUT,
+                failure_threshold=ESP32_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=ESP32_BREAKER_RESET_TIMEOUT
+            )
+        self.service = ESP32Service(base_url=base_url, http=http, slot_offset=slot_offset)
+        self.in_flight: Optional[Future] = None
+        self.polls = 0
+        self.failures = 0
+        self.last_success_at: Optional[str] = None
+        self.last_success_monotonic: Optional[float] = None
+        self.last_error: Optional[Dict[str, Any]] = None
+        self.last_latency_ms: Optional[float] = None
+        self.latency = LatencyHistogram()
+
+    def fetch(self) -> bool:
+        """Đọc board (chạy trên thread pool)"""
+        started = time.perf_counter_ns()
+        try:
+            success, raw_data, slots_data = self.service.get_parking_slots(force_reset=False)
+        except Exception as e:
+            success, raw_data = False, {"error": "Unexpected error", "message": str(e)}
+        elapsed_ns = time.perf_counter_ns() - started
+        self.latency.record(elapsed_ns)
+        self.last_latency_ms = round(elapsed_ns / 1_000_000, 2)
+        self.polls += 1
+        if success:
+            self.last_success_at = datetime.now(timezone.utc).isoformat()
+            self.last_success_monotonic = time.monotonic()
+            self.last_error = None
+        else:
+            self.failures += 1
+            self.last_error = {
+                "error": raw_data.get("error", "Unknown error"),
+                "message": raw_data.get("message", "Failed to get parking slots data"),
+                "at": datetime.now(timezone.utc).isoformat()
+            }
+        return success
+
+    def get_status(self) -> Dict[str, Any]:
+        data = self.service.get_cached_data()
+        slot_count = self.slot_count if self.slot_count is not None else (len(data.slots) if data else None)
+        to_ms = lambda value: round(value / 1_000_000, 2) if value is not None else None
+        age = time.monotonic() - self.last_success_monotonic if self.last_success_monotonic else None
+        return {
+            "url": self.service.base_url,
+            "slot_offset": self.slot_offset,
+            "slot_range": [self.slot_offset + 1, self.slot_offset + slot_count] if slot_count else None,
+            "healthy": self.last_error is None and self.last_success_at is not None,
+            "in_flight": self.in_flight is not None and not self.in_flight.done(),
+            "polls": self.polls,
+            "failures": self.failures,
+            "last_success_at": self.last_success_at,
+            "data_age_seconds": round(age, 3) if age is not None else None,
+            "last_error": self.last_error,
+            "latency_ms": {
+                "last": self.last_latency_ms,
+                "p50": to_ms(self.latency.percentile(50)),
+                "p95": to_ms(self.latency.percentile(95))
+            },
+            "circuit_breaker": self.service.http.breaker.state,
+            "detector": self.service.detector.get_stats()
+        }
+
+
+class ESP32Fleet:
+    """
+    Registry các board ESP32
+
+    Board đầu tiên là board chính (primary): dùng cho /reset, /update và health check nhanh.
+    """
+
+    def __init__(self, controllers: List[Dict[str, Any]] = None):
+        self.controllers: Dict[str, ESP32Controller] = {}
+        for index, entry in enumerate(controllers or ESP32_CONTROLLERS):
+            controller_id = str(entry.get("id") or f"esp32-{index + 1}")
+            if controller_id in self.controllers:
+                raise ValueError(f"Duplicate ESP32 controller id: {controller_id}")
+            self.controllers[controller_id] = ESP32Controller(
+                controller_id,
+                ip=entry["ip"],
+                port=int(entry.get("port", ESP32_PORT)),
+                slot_offset=int(entry.get("slot_offset", 0)),
+                slot_count=int(entry["slot_count"]) if entry.get("slot_count") is not None else None
+            )
+        if not self.controllers:
+            raise ValueError("ESP32_CONTROLLERS is empty")
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.controllers), thread_name_prefix="esp32-fetch")
+
+    @property
+    def primary(self) -> ESP32Controller:
+        return next(iter(self.controllers.values()))
+
+    def get_controller(self, controller_id: str) -> Optional[ESP32Controller]:
+        return self.controllers.get(controller_id)
+
+    def fetch_all(self, wait: float) -> Dict[str, bool]:
+        """
+        Đọc mọi board song song
+
+        Args:
+            wait: Giây chờ tối đa; board chưa xong vẫn tiếp tục đọc ở nền, kết quả dùng ở chu kỳ sau
+
+        Returns:
+            Dict controller_id -> success cho các board đọc xong trong thời gian chờ
+        """
+        futures = {}
+        with self._lock:
+            for controller in self.controllers.values():
+                if controller.in_flight is None or controller.in_flight.done():
+                    controller.in_flight = self._executor.submit(controller.fetch)
+                futures[controller.id] = controller.in_flight
+
+        wait_futures(list(futures.values()), timeout=wait)
+        return {controller_id: future.result() for controller_id, future in futures.items() if future.done()}
+
+    def merged(self) -> Optional[ParkingSlotsData]:
+        """Bản đồ slot toàn cục từ lần đọc mới nhất của mỗi board (None nếu chưa board nào có dữ liệu)"""
+        parts: List[Tuple[str, int, Optional[int], ParkingSlotsData]] = []
+        for controller in self.controllers.values():
+            data = controller.service.get_cached_data()
+            if data is not None:
+                parts.append((controller.id, controller.slot_offset, controller.slot_count, data))
+        if not parts:
+            return None
+        return ParkingSlotsData.merge(parts)
+
+    def slot_capacity(self, controller: ESP32Controller) -> int:
+        """
+        Số slot của board: slot_count trong config, hoặc totalSensors lần đọc gần nhất,
+        hoặc khoảng cách tới slot_offset của board kế tiếp, hoặc ESP32_DEFAULT_SLOT_COUNT
+        """
+        if controller.slot_count is not None:
+            return controller.slot_count
+        data = controller.service.get_cached_data()
+        if data is not None:
+            return data.total_sensors
+        next_offsets = [other.slot_offset for other in self.controllers.values()
+                        if other.slot_offset > controller.slot_offset]
+        return min(next_offsets) - controller.slot_offset if next_offsets else ESP32_DEFAULT_SLOT_COUNT
+
+    def resolve_slot(self, controller_id: str, slot_id: int) -> Tuple[Optional[int], str]:
+        """
+        Đổi slot của board (1..N) sang slot toàn cục
+
+        Returns:
+            Tuple of (global_slot_id hoặc None, message lỗi)
+        """
+        controller = self.controllers.get(controller_id)
+        if controller is None:
+            return None, f"Unknown controller: {controller_id}"
+        if not isinstance(slot_id, int) or isinstance(slot_id, bool) or slot_id < 1:
+            return None, f"slot_id must be a positive integer, got: {slot_id}"
+        capacity = self.slot_capacity(controller)
+        if slot_id > capacity:
+            return None, f"slot_id must be 1-{capacity} for {controller_id}, got: {slot_id}"
+        return controller.slot_offset + slot_id, ''
+
+    def get_last_error(self) -> Optional[Dict[str, Any]]:
+        """Lỗi của board lỗi đầu tiên (theo thứ tự registry)"""
+        for controller in self.controllers.values():
+            if controller.last_error:
+                return controller.last_error
+        return None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {controller_id: controller.get_status() for controller_id, controller in self.controllers.items()}
+
+
+# Global instance - registry dùng chung cho ESP32 poller
+esp32_fleet = ESP32Fleet()
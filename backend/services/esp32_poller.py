@@ -0,0 +1,238 @@
+"""
+ESP32 Poller - Thread nền đọc ESP32 định kỳ, API chỉ đọc snapshot (stale-while-revalidate)
+
+Chức năng chính:
+- Thread riêng đọc mọi board trong ESP32 fleet (song song) mỗi ESP32_POLL_INTERVAL giây,
+  snapshot là bản đồ slot gộp của tất cả board
+- API đọc snapshot mới nhất ngay lập tức kèm tuổi dữ liệu (age_seconds, stale),
+  không còn chờ ESP32_TIMEOUT khi board cảm biến không phản hồi
+- Snapshot cũ hơn ESP32_SNAPSHOT_MAX_AGE vẫn được trả về (stale=True) và tự kích hoạt refresh nền
+- request_refresh(): refresh bất đồng bộ; nhiều yêu cầu đồng thời được gộp thành 1 lần đọc ESP32
+- ESP32_POLLER_ENABLED=false: không chạy thread; get_snapshot() đọc ESP32 ngay trong request khi
+  chưa có snapshot / snapshot stale / có request_refresh() (request đồng thời chờ chung 1 lần đọc)
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+from services.esp32_fleet import ESP32Fleet, esp32_fleet
+from services.slot_history_service import slot_history
+from models.parking_slot import ParkingSlotsData
+from config.config import ESP32_POLLER_ENABLED, ESP32_POLL_INTERVAL, ESP32_SNAPSHOT_MAX_AGE, ESP32_SNAPSHOT_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class ESP32Snapshot:
+    """Kết quả đọc ESP32 thành công gần nhất"""
+
+    __slots__ = ("slots_data", "raw_data", "fetched_at", "fetched_monotonic")
+
+    def __init__(self, slots_data: ParkingSlotsData, raw_data: Dict[str, Any]):
+        self.slots_data = slots_data
+        self.raw_data = raw_data
+        self.fetched_at = datetime.now(timezone.utc).isoformat()
+        self.fetched_monotonic = time.monotonic()
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.fetched_monotonic
+
+
+class ESP32Poller:
+    """
+    Poller nền cho ESP32
+
+    Attributes:
+        fleet: Registry các board ESP32
+        service: ESP32Service của board chính (/reset, /update, health check)
+        interval: Chu kỳ đọc (giây)
+        max_age: Tuổi tối đa trước khi snapshot bị coi là stale (giây)
+        enabled: False -> API đọc snapshot không tự khởi động thread poller
+    """
+
+    def __init__(self, fleet: Optional[ESP32Fleet] = None, interval: float = ESP32_POLL_INTERVAL,
+                 max_age: float = ESP32_SNAPSHOT_MAX_AGE, enabled: bool = ESP32_POLLER_ENABLED):
+        self.fleet = fleet or esp32_fleet
+        self.service = self.fleet.primary.service
+        self.interval = interval
+        self.max_age = max_age
+        self.enabled = enabled
+        self._snapshot: Optional[ESP32Snapshot] = None
+        self._last_error: Optional[Dict[str, Any]] = None
+        self._last_attempt_at: Optional[str] = None
+        self._consecutive_failures = 0
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresh_requested = threading.Event()
+        self._first_attempt_done = threading.Event()
+        self._refreshing = False
+        self.stats = {
+            "polls": 0,
+            "failures": 0,
+            "refresh_requests": 0,
+            "coalesced_requests": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Thread nền
+    # ------------------------------------------------------------------
+    def start(self):
+        """Khởi động thread poller (gọi nhiều lần vẫn an toàn)"""
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="esp32-poller", daemon=True)
+            self._thread.start()
+            logger.info(f"ESP32 poller started (interval {self.interval}s, {self.service.base_url})")
+
+    def stop(self):
+        self._stop.set()
+        self._refresh_requested.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.service.timeout + 1)
+        logger.info("ESP32 poller stopped")
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._poll_once()
+            # Ngủ tới chu kỳ sau hoặc tới khi có request_refresh()
+            self._refresh_requested.wait(self.interval)
+            self._refresh_requested.clear()
+
+    def _poll_once(self):
+        self._refreshing = True
+        self._last_attempt_at = datetime.now(timezone.utc).isoformat()
+        try:
+            # Board chưa trả lời trong 1 chu kỳ vẫn đọc tiếp ở nền, được gộp ở chu kỳ sau
+            results = self.fleet.fetch_all(wait=self.interval)
+            self.stats["polls"] += 1
+            slots_data = self.fleet.merged() if any(results.values()) else None
+            if slots_data:
+                self._snapshot = ESP32Snapshot(slots_data, {"controllers": results})
+                slot_history.record_snapshot(slots_data)
+                self._last_error = None
+                self._consecutive_failures = 0
+            else:
+                last_error = self.fleet.get_last_error() or {
+                    "error": "ESP32 timeout",
+                    "message": f"Không có board nào trả lời trong {self.interval}s"
+                }
+                self._record_failure(last_error["error"], last_error["message"])
+        except Exception as e:
+            self._record_failure("Unexpected error", str(e))
+        finally:
+            self._refreshing = False
+            self._first_attempt_done.set()
+
+    def _record_failure(self, error: str, message: str):
+        self.stats["failures"] += 1
+        self._consecutive_failures += 1
+        self._last_error = {"error": error, "message": message, "at": self._last_attempt_at}
+        # Chỉ log lần lỗi đầu tiên của chuỗi lỗi để không spam log mỗi chu kỳ
+        if self._consecutive_failures == 1:
+            logger.warning(f"ESP32 poller: {error} - {message}")
+
+    # ------------------------------------------------------------------
+    # API đọc
+    # ------------------------------------------------------------------
+    def request_refresh(self) -> bool:
+        """
+        Yêu cầu đọc lại ESP32 (không chờ)
+
+        Returns:
+            False nếu yêu cầu được gộp vào 1 lần refresh đang chờ / đang chạy
+        """
+        if self.enabled:
+            self.start()
+        self.stats["refresh_requests"] += 1
+        if self._refresh_requested.is_set() or self._refreshing:
+            self.stats["coalesced_requests"] += 1
+            if self._refresh_requested.is_set():
+                return False
+        self._refresh_requested.set()
+        return True
+
+    def get_snapshot(self, wait: float = ESP32_SNAPSHOT_WAIT) -> Optional[ESP32Snapshot]:
+        """
+        Snapshot mới nhất (có thể stale); chờ tối đa `wait` giây nếu chưa có lần đọc nào
+
+        Snapshot quá ESP32_SNAPSHOT_MAX_AGE sẽ kích hoạt refresh nền.
+        """
+        if not self.enabled:
+            return self._get_snapshot_inline()
+        self.start()
+        if self._snapshot is None and not self._first_attempt_done.is_set():
+            self._first_attempt_done.wait(wait)
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age_seconds > self.max_age:
+            self.request_refresh()
+        return snapshot
+
+    def _get_snapshot_inline(self) -> Optional[ESP32Snapshot]:
+        """Poller tắt: đọc ESP32 trong request khi cần, request đồng thời dùng chung kết quả"""
+        with self._inline_lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.age_seconds > self.max_age or self._refresh_requested.is_set():
+                self._refresh_requested.clear()
+                self._poll_once()
+        return self._snapshot
+
+    def get_metadata(self, snapshot: Optional[ESP32Snapshot] = None) -> Dict[str, Any]:
+        """Thông tin tuổi dữ liệu / trạng thái poller cho response API"""
+        snapshot = snapshot if snapshot is not None else self._snapshot
+        age = snapshot.age_seconds if snapshot else None
+        return {
+            "fetched_at": snapshot.fetched_at if snapshot else None,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "stale": age is None or age > self.max_age,
+            "max_age_seconds": self.max_age,
+            "poll_interval_seconds": self.interval,
+            "refreshing": self._refreshing or self._refresh_requested.is_set(),
+            "last_attempt_at": self._last_attempt_at,
+            "last_error": self._last_error,
+            "consecutive_failures": self._consecutive_failures,
+            "degraded_controllers": [controller_id for controller_id, controller in self.fleet.controllers.items()
+                                     if controller.last_error]
+        }
+
+    def get_last_error(self) -> Dict[str, Any]:
+        return self._last_error or {"error": "No data yet", "message": "ESP32 chưa có dữ liệu"}
+
+    def get_system_status(self) -> Dict[str, Any]:
+        """Giống ESP32Service.get_system_status() nhưng dựng từ snapshot, không gọi ESP32 / không chờ"""
+        snapshot = self.get_snapshot(wait=0)
+        status = {
+            "esp32_connected": snapshot is not None and self._consecutive_failures == 0,
+            "esp32_url": self.service.base_url,
+            "last_communication": snapshot.fetched_at if snapshot else None,
+            "timeout_setting": self.service.timeout,
+            "snapshot": self.get_metadata(snapshot),
+            "poller": {"running": self.is_running(), **self.stats},
+            "controllers": self.fleet.get_status()
+        }
+        if snapshot:
+            slots_data = snapshot.slots_data
+            status.update({
+                "total_sensors": slots_data.total_sensors,
+                "ic_count": slots_data.ic_count,
+                "esp32_uptime_ms": slots_data.esp32_timestamp,
+                "data_valid": slots_data.validate()["valid"],
+                "summary": slots_data.summary
+            })
+        if self._last_error:
+            status.update(self._last_error)
+        return status
+
+
+# Global instance - dùng chung cho Parking Slots API và System API
+esp32_poller = ESP32Poller()
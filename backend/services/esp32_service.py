@@ -14,12 +14,29 @@ from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timezone
 
 from models.parking_slot import ParkingSlotsData
+from services.event_bus import event_bus, SlotChanged
+from services.slot_detector import SlotDetector
+from utils.http_client import ResilientHTTPClient, CircuitOpenError
 from config.config import (
-    ESP32_IP, ESP32_PORT, ESP32_TIMEOUT, DETECTION_THRESHOLD
+    ESP32_IP, ESP32_PORT, ESP32_TIMEOUT, DETECTION_THRESHOLD,
+    ESP32_HTTP_POOL_SIZE, ESP32_HTTP_RETRIES, ESP32_HTTP_BACKOFF, ESP32_CONNECT_TIMEOUT,
+    ESP32_BREAKER_FAILURE_THRESHOLD, ESP32_BREAKER_RESET_TIMEOUT
 )
 
 logger = logging.getLogger(__name__)
 
+# HTTP client dùng chung cho mọi ESP32Service (poller, system API, scheduler):
+# 1 connection pool + 1 circuit breaker cho cùng 1 thiết bị
+esp32_http_client = ResilientHTTPClient(
+    "esp32",
+    pool_size=ESP32_HTTP_POOL_SIZE,
+    retries=ESP32_HTTP_RETRIES,
+    backoff=ESP32_HTTP_BACKOFF,
+    connect_timeout=ESP32_CONNECT_TIMEOUT,
+    failure_threshold=ESP32_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=ESP32_BREAKER_RESET_TIMEOUT
+)
+
 class ESP32Service:
     """
     Lớp service xử lý giao tiếp với ESP32 và quản lý dữ liệu cảm biến
@@ -30,17 +47,31 @@ class ESP32Service:
         last_data: Dữ liệu cảm biến lần cuối  
         last_updated: Thời gian cập nhật cuối
         detection_threshold: Ngưỡng phát hiện xe (cm)
+        http: HTTP client dùng chung (pool + retry + circuit breaker)
+        slot_offset: Cộng vào slot_id khi phát SlotChanged (nhiều board - xem esp32_fleet)
+        detector: Hysteresis + debounce; chỉ transition đã xác nhận mới đổi cache / phát SlotChanged
     """
     
-    def __init__(self):
-        """Khởi tạo ESP32 service với cấu hình từ config"""
-        self.base_url = f"http://{ESP32_IP}:{ESP32_PORT}"
+    def __init__(self, base_url: Optional[str] = None, http: Optional[ResilientHTTPClient] = None,
+                 slot_offset: int = 0):
+        """
+        Khởi tạo ESP32 service (mặc định: board ESP32_IP/ESP32_PORT trong config)
+        
+        Args:
+            base_url: URL của board (controller khác trong ESP32_CONTROLLERS)
+            http: HTTP client riêng của board (mặc định client dùng chung)
+            slot_offset: Offset slot toàn cục của board
+        """
+        self.base_url = base_url or f"http://{ESP32_IP}:{ESP32_PORT}"
         logger.info(f"� ESP32Service: Kết nối tới ESP32 tại {self.base_url}")
             
         self.timeout = ESP32_TIMEOUT
         self.last_data = None
         self.last_updated = None
         self.detection_threshold = DETECTION_THRESHOLD
+        self.http = http or esp32_http_client
+        self.slot_offset = slot_offset
+        self.detector = SlotDetector(slot_offset)
     
     def get_parking_slots(self, force_reset: bool = False) -> Tuple[bool, Dict[str, Any], Optional[ParkingSlotsData]]:
         """
@@ -65,7 +96,7 @@ class ESP32Service:
             logger.info(f"Fetching ESP32 data from: {url}")
             
             # Make request to ESP32
-            response = requests.get(url, timeout=self.timeout)
+            response = self.http.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             raw_data = response.json()
@@ -82,7 +113,8 @@ class ESP32Service:
                     "soIC": raw_data.get("soIC", 1),
                     "totalSensors": raw_data.get("totalSensors", 6),
                     "timestamp": raw_data.get("timestamp", 0),
-                    "data": raw_data["data"]
+                    "data": raw_data["data"],
+                    "distances": raw_data.get("distances")
                 },
                 "reset_performed": force_reset and raw_data.get("success", False),
                 "last_updated": datetime.now(timezone.utc).isoformat()
@@ -96,13 +128,25 @@ class ESP32Service:
             if not validation["valid"]:
                 logger.warning(f"ESP32 data validation failed: {validation['errors']}")
             
-            # Cache successful response
-            self.last_data = slots_data
+            # Đưa lần đọc qua detector; cache chỉ đổi ở slot có transition đã xác nhận
+            slots_data = self._apply_reading(slots_data)
             self.last_updated = processed_data["last_updated"]
             
             logger.info(f"Successfully retrieved ESP32 data: {len(slots_data.slots)} slots")
             return True, processed_data, slots_data
             
+        except CircuitOpenError:
+            logger.debug(f"ESP32 circuit open - skipping request to {self.base_url}")
+            error_response = {
+                "success": False,
+                "error": "ESP32 circuit open",
+                "message": "ESP32 lỗi liên tục, tạm ngừng gửi request",
+                "esp32_url": self.base_url,
+                "circuit_breaker": self.http.breaker.get_status(),
+                "last_updated": datetime.now(timezone.utc).isoformat()
+            }
+            return False, error_response, None
+            
         except requests.exceptions.ConnectionError:
             logger.error(f"Cannot connect to ESP32 at {self.base_url}")
             error_response = {
@@ -145,6 +189,65 @@ class ESP32Service:
             }
             return False, error_response, None
     
+    def _apply_reading(self, current: ParkingSlotsData) -> ParkingSlotsData:
+        """
+        Cập nhật cache từ 1 lần đọc /data
+        
+        Lần đọc đầu (hoặc board đổi số slot): lấy luôn trạng thái. Các lần sau giữ nguyên cache,
+        chỉ slot có transition đã qua debounce mới đổi trạng thái; metadata của board thì luôn cập nhật.
+        
+        Returns:
+            Dữ liệu cache sau khi cập nhật (self.last_data)
+        """
+        previous = self.last_data
+        if previous is None or len(previous.slots) != len(current.slots):
+            self.last_data = current
+            for slot in current.slots:
+                self.observe_slot(slot.slot_id, slot.status, slot.distance_cm, samples_required=1)
+                slot.last_changed = self.detector.get_state(slot.slot_id).get("last_changed")
+            return current
+        
+        for slot in current.slots:
+            cached = previous.get_slot(slot.slot_id)
+            cached.distance_cm = slot.distance_cm
+            cached.last_updated = slot.last_updated
+            self.observe_slot(slot.slot_id, slot.status, slot.distance_cm)
+        previous.success = current.success
+        previous.reset_performed = current.reset_performed
+        previous.last_updated = current.last_updated
+        previous.esp32_raw = current.esp32_raw
+        previous.total_sensors = current.total_sensors
+        previous.ic_count = current.ic_count
+        previous.esp32_timestamp = current.esp32_timestamp
+        return previous
+    
+    def observe_slot(self, slot_id: int, status: Optional[int] = None, distance: Optional[float] = None,
+                     samples_required: Optional[int] = None) -> Optional[Tuple[Optional[int], int, str]]:
+        """
+        Đưa 1 mẫu của slot qua detector; khi trạng thái đổi thật sự thì cập nhật cache và phát SlotChanged
+        
+        Args:
+            slot_id: Slot của board này (1..N)
+            status: 0/1 do firmware báo
+            distance: Khoảng cách thô (cm), ưu tiên hơn status
+            samples_required: Ghi đè số mẫu debounce (1 = nhận ngay)
+            
+        Returns:
+            (old_status, new_status, last_changed) nếu slot đổi trạng thái, ngược lại None
+        """
+        transition = self.detector.observe(slot_id, status, distance, samples_required)
+        if transition is None:
+            return None
+        old_status, new_status, last_changed = transition
+        if self.last_data:
+            self.last_data.update_slot_status(slot_id, new_status)
+            slot = self.last_data.get_slot(slot_id)
+            if slot is not None:
+                slot.last_changed = last_changed
+        event_bus.publish(SlotChanged(slot_id=self.slot_offset + slot_id,
+                                      old_status=old_status, new_status=new_status))
+        return transition
+    
     def reset_sensors(self) -> Tuple[bool, str]:
         """
         Reset ESP32 sensors via dedicated reset endpoint
@@ -157,7 +260,8 @@ class ESP32Service:
             logger.info(f"Resetting ESP32 sensors via: {url}")
             
             # Send POST request to reset sensors
-            response = requests.post(url, timeout=self.timeout * 2)  # Longer timeout for reset
+            # Longer timeout for reset; không retry vì /detect không idempotent
+            response = self.http.post(url, timeout=self.timeout * 2, retries=0)
             response.raise_for_status()
             
             data = response.json()
@@ -171,6 +275,10 @@ class ESP32Service:
                 logger.error(f"ESP32 reset failed: {error_msg}")
                 return False, error_msg
                 
+        except CircuitOpenError:
+            logger.warning("ESP32 circuit open - reset skipped")
+            return False, "ESP32 lỗi liên tục, tạm ngừng gửi request reset"
+            
         except requests.exceptions.ConnectionError:
             logger.error("Cannot connect to ESP32 for reset")
             return False, "Không thể kết nối với ESP32 để reset"
@@ -233,7 +341,8 @@ class ESP32Service:
             True if ESP32 is reachable, False otherwise
         """
         try:
-            response = requests.get(f"{self.base_url}/data", timeout=5)
+            # Không retry: health check cần trả lời nhanh; breaker mở -> False ngay
+            response = self.http.get(f"{self.base_url}/data", timeout=5, retries=0)
             return response.status_code == 200
         except:
             return False
@@ -255,7 +364,7 @@ class ESP32Service:
     
     def get_sensor_history(self, hours: int = 24) -> Dict[str, Any]:
         """
-        Get sensor reading history (future feature)
+        Get sensor reading history (time series từng slot - services/slot_history_service.py)
         
         Args:
             hours: Number of hours of history to retrieve
@@ -263,18 +372,16 @@ class ESP32Service:
         Returns:
             Dictionary with historical data
         """
-        # This could be used to get historical sensor data
-        # For now, just return current status
-        logger.info("ESP32 history endpoint not yet implemented")
-        return {
-            "history_available": False,
-            "message": "Historical data tracking not yet implemented",
-            "current_data": self.last_data.to_dict() if self.last_data else None
-        }
+        from services.slot_history_service import slot_history
+        
+        end_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        return slot_history.query(end_ms - hours * 3600 * 1000, end_ms)
     
     def update_slot_status(self, slot_id: int, occupied: bool, sensor_value: int = 0, timestamp: str = "") -> Tuple[bool, str]:
         """
-        Update parking slot status from ESP32 sensor data
+        Update parking slot status from ESP32 sensor data (chỉ cache trong bộ nhớ)
+        
+        Trạng thái lưu bền vào bảng parking_slots: xem services/slot_state_service.py
         
         Args:
             slot_id: Slot number
@@ -288,17 +395,7 @@ class ESP32Service:
         try:
             logger.info(f"ESP32: Updating slot {slot_id} - occupied: {occupied}, value: {sensor_value}")
             
-            # For now, just log the update since we don't have persistent slot storage
-            # In a full implementation, this would update a database or cache
-            
-            if self.last_data:
-                # Try to find and update the slot in cached data
-                for slot in self.last_data.slots:
-                    if slot.slot_id == slot_id:
-                        slot.occupied = occupied
-                        slot.distance_cm = sensor_value if sensor_value > 0 else slot.distance_cm
-                        slot.timestamp = timestamp or slot.timestamp
-                        break
+            self.observe_slot(slot_id, 1 if occupied else 0, samples_required=1)
             
             # Log the update
             status_text = "occupied" if occupied else "available"
@@ -0,0 +1,295 @@
+"""
+Event Bus - Bus sự kiện trong process cho thẻ và slot đỗ xe
+
+Chức năng chính:
+- Event có kiểu (dataclass): CardEntered, CardExited, UnknownCardSeen, SlotChanged
+  (subscribe lớp cha để nhận cả lớp con, ví dụ CardMoved = CardEntered + CardExited)
+- Subscriber sync: chạy ngay trong thread publish (việc nhẹ, cần kết quả ngay)
+- Subscriber async: mỗi subscriber có queue riêng (giới hạn), xử lý trên thread pool chung,
+  giữ đúng thứ tự event của từng subscriber; chạy trong Flask app context
+- Backpressure: queue đầy -> chờ tối đa EVENT_BUS_PUT_TIMEOUT rồi bỏ event (đếm dropped)
+- Metrics từng subscriber: delivered, failed, dropped, queue depth, độ trễ hàng đợi
+
+Cách dùng:
+    event_bus.subscribe(CardEntered, handler, mode="async", name="db_log")
+    event_bus.publish(CardEntered(card_id="A1B2C3D4", direction="IN"))
+"""
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from time import perf_counter_ns
+from typing import Callable, Dict, Any, List, Optional, Type
+
+from config.config import EVENT_BUS_WORKERS, EVENT_BUS_QUEUE_SIZE, EVENT_BUS_PUT_TIMEOUT
+from utils.latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass(frozen=True)
+class Event:
+    """Event gốc - subscribe Event để nhận mọi loại event"""
+    occurred_at: str = field(init=False, default='')
+
+    def __post_init__(self):
+        object.__setattr__(self, "occurred_at", _now_iso())
+
+
+@dataclass(frozen=True)
+class CardMoved(Event):
+    """Thẻ quẹt vào/ra thành công - subscribe lớp này để nhận cả 2 theo đúng thứ tự"""
+    card_id: str
+    card_name: str = ''
+    direction: str = ''
+    timestamp: str = ''
+    source: str = 'uno_r4_wifi'
+
+
+@dataclass(frozen=True)
+class CardEntered(CardMoved):
+    """Thẻ quẹt vào bãi thành công"""
+
+
+@dataclass(frozen=True)
+class CardExited(CardMoved):
+    """Thẻ quẹt ra bãi thành công"""
+
+
+@dataclass(frozen=True)
+class UnknownCardSeen(Event):
+    """Quẹt thẻ chưa đăng ký"""
+    card_id: str
+    direction: str = ''
+    source: str = 'uno_r4_wifi'
+
+
+@dataclass(frozen=True)
+class SlotChanged(Event):
+    """Slot đổi trạng thái (0 = trống, 1 = có xe)"""
+    slot_id: int
+    old_status: Optional[int]
+    new_status: int
+    source: str = 'esp32'
+
+
+class _Subscriber:
+    """1 subscriber: handler + queue riêng (async) + bộ đếm"""
+
+    def __init__(self, name: str, event_type: Type[Event], handler: Callable[[Event], Any],
+                 mode: str, max_queue: int):
+        self.name = name
+        self.event_type = event_type
+        self.handler = handler
+        self.mode = mode
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue) if mode == "async" else None
+        # True khi đã có 1 task drain queue trên thread pool (mỗi subscriber tối đa 1 task -> giữ thứ tự)
+        self.scheduled = False
+        self.lock = threading.Lock()
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.queue_wait = LatencyHistogram()
+        self.handler_time = LatencyHistogram()
+
+    def get_stats(self) -> Dict[str, Any]:
+        to_ms = lambda value: round(value / 1_000_000, 3) if value is not None else None
+        stats = {
+            "event": self.event_type.__name__,
+            "mode": self.mode,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "handler_p95_ms": to_ms(self.handler_time.percentile(95))
+        }
+        if self.mode == "async":
+            stats.update({
+                "dropped": self.dropped,
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "max_queue_depth": self.max_depth,
+                "queue_wait_p95_ms": to_ms(self.queue_wait.percentile(95)),
+                "queue_wait_max_ms": to_ms(self.queue_wait.max_ns) if self.queue_wait.count else None
+            })
+        return stats
+
+
+class EventBus:
+    """
+    Bus sự kiện in-process
+
+    Handler async chạy trên ThreadPoolExecutor (EVENT_BUS_WORKERS thread) dùng chung;
+    event của cùng 1 subscriber luôn được xử lý tuần tự theo thứ tự publish.
+    """
+
+    def __init__(self, workers: int = EVENT_BUS_WORKERS, max_queue: int = EVENT_BUS_QUEUE_SIZE,
+                 put_timeout: float = EVENT_BUS_PUT_TIMEOUT):
+        self.app = None
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.put_timeout = put_timeout
+        self._subscribers: Dict[str, _Subscriber] = {}
+        self._by_type: Dict[Type[Event], List[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.published: Dict[str, int] = {}
+
+    def init_app(self, app):
+        """Gắn Flask app để handler async chạy trong app context"""
+        self.app = app
+
+    def subscribe(self, event_type: Type[Event], handler: Callable[[Event], Any], mode: str = "sync",
+                  name: Optional[str] = None, max_queue: Optional[int] = None):
+        """
+        Đăng ký handler cho 1 loại event (và các lớp con)
+
+        Args:
+            event_type: Lớp event (Event = mọi event)
+            handler: Hàm nhận 1 event
+            mode: "sync" (chạy trong thread publish) hoặc "async" (queue + thread pool)
+            name: Tên subscriber (mặc định tên handler); đăng ký lại cùng tên sẽ thay thế
+            max_queue: Kích thước queue riêng (async)
+        """
+        if mode not in ("sync", "async"):
+            raise ValueError(f"Invalid subscriber mode: {mode}")
+        name = name or getattr(handler, "__name__", repr(handler))
+        subscriber = _Subscriber(name, event_type, handler, mode, max_queue or self.max_queue)
+        with self._lock:
+            self._subscribers[name] = subscriber
+            self._by_type = {}
+        logger.debug(f"Event bus: {name} subscribed to {event_type.__name__} ({mode})")
+
+    def unsubscribe(self, name: str) -> bool:
+        with self._lock:
+            removed = self._subscribers.pop(name, None) is not None
+            self._by_type = {}
+        return removed
+
+    def _subscribers_for(self, event_type: Type[Event]) -> List[_Subscriber]:
+        """Subscriber theo loại event (cache theo type, xóa khi subscribe/unsubscribe)"""
+        subscribers = self._by_type.get(event_type)
+        if subscribers is None:
+            with self._lock:
+                subscribers = [s for s in self._subscribers.values() if issubclass(event_type, s.event_type)]
+                self._by_type[event_type] = subscribers
+        return subscribers
+
+    def publish(self, event: Event) -> bool:
+        """
+        Phát 1 event tới mọi subscriber
+
+        Returns:
+            True nếu mọi handler sync chạy thành công và mọi subscriber async nhận được event
+        """
+        event_name = type(event).__name__
+        self.published[event_name] = self.published.get(event_name, 0) + 1
+
+        accepted = True
+        for subscriber in self._subscribers_for(type(event)):
+            if subscriber.mode == "sync":
+                accepted &= self._run_handler(subscriber, event)
+            else:
+                accepted &= self._enqueue(subscriber, event)
+        return accepted
+
+    def _run_handler(self, subscriber: _Subscriber, event: Event) -> bool:
+        started = perf_counter_ns()
+        try:
+            subscriber.handler(event)
+            subscriber.delivered += 1
+            return True
+        except Exception as e:
+            subscriber.failed += 1
+            logger.error(f"Event bus: subscriber {subscriber.name} failed on {type(event).__name__}: {e}")
+            return False
+        finally:
+            subscriber.handler_time.record(perf_counter_ns() - started)
+
+    def _enqueue(self, subscriber: _Subscriber, event: Event) -> bool:
+        try:
+            subscriber.queue.put((perf_counter_ns(), event), timeout=self.put_timeout)
+        except queue.Full:
+            subscriber.dropped += 1
+            logger.warning(f"Event bus: queue of {subscriber.name} full, dropped {type(event).__name__}")
+            return False
+
+        depth = subscriber.queue.qsize()
+        if depth > subscriber.max_depth:
+            subscriber.max_depth = depth
+
+        with subscriber.lock:
+            if subscriber.scheduled:
+                return True
+            subscriber.scheduled = True
+        self._get_executor().submit(self._drain, subscriber)
+        return True
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="event-bus")
+        return self._executor
+
+    def _drain(self, subscriber: _Subscriber):
+        """Xử lý hết queue của 1 subscriber (chạy trên thread pool)"""
+        if self.app is not None:
+            with self.app.app_context():
+                self._drain_queue(subscriber)
+        else:
+            self._drain_queue(subscriber)
+
+    def _drain_queue(self, subscriber: _Subscriber):
+        while True:
+            try:
+                enqueued_at, event = subscriber.queue.get_nowait()
+            except queue.Empty:
+                with subscriber.lock:
+                    # Kiểm tra lại trong lock: event có thể vừa được put sau get_nowait
+                    if subscriber.queue.empty():
+                        subscriber.scheduled = False
+                        return
+                continue
+            subscriber.queue_wait.record(perf_counter_ns() - enqueued_at)
+            self._run_handler(subscriber, event)
+            subscriber.queue.task_done()
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """
+        Chờ mọi queue async xử lý xong (dùng khi shutdown / test)
+
+        Returns:
+            True nếu mọi queue đã rỗng trong thời gian chờ
+        """
+        import time
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            busy = [s for s in list(self._subscribers.values()) if s.mode == "async" and s.scheduled]
+            if not busy:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Metrics cho monitoring"""
+        return {
+            "workers": self.workers,
+            "published": dict(self.published),
+            "subscribers": {name: s.get_stats() for name, s in list(self._subscribers.items())}
+        }
+
+
+# Global instance
+event_bus = EventBus()
+
+# Xử lý nốt event còn trong queue khi process thoát
+atexit.register(event_bus.drain)
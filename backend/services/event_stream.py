@@ -0,0 +1,203 @@
+"""
+Event Stream - Đẩy event của event bus tới trình duyệt qua Server-Sent Events
+
+Chức năng chính:
+- 1 subscriber duy nhất trên event bus (SlotChanged, CardEntered, CardExited, UnknownCardSeen)
+  phát lại cho mọi client SSE -> nhiều tab mở không nhân số request tới ESP32 / file thẻ
+- Mỗi client có buffer riêng giới hạn; client chậm làm đầy buffer thì bị ngắt
+  (không chặn publisher, không ăn bộ nhớ) và tự kết nối lại
+- Id event dạng "<epoch>-<seq>"; giữ EVENT_STREAM_REPLAY_SIZE event gần nhất để client kết nối lại
+  với Last-Event-ID nhận nốt event bị lỡ. Id quá cũ / của process trước -> event "reset" (tải lại toàn bộ)
+- Heartbeat (comment SSE) khi không có event để proxy không cắt kết nối
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from services.event_bus import EventBus, Event, SlotChanged, CardEntered, CardExited, UnknownCardSeen
+from config.config import (
+    EVENT_STREAM_MAX_CLIENTS, EVENT_STREAM_CLIENT_BUFFER, EVENT_STREAM_REPLAY_SIZE,
+    EVENT_STREAM_HEARTBEAT, EVENT_STREAM_RETRY_MS
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_EVENT_TYPES = (SlotChanged, CardEntered, CardExited, UnknownCardSeen)
+
+
+class _StreamClient:
+    """1 kết nối SSE"""
+
+    def __init__(self, client_id: int, remote_addr: Optional[str], buffer_size: int):
+        self.id = client_id
+        self.remote_addr = remote_addr
+        self.queue: "queue.Queue" = queue.Queue(maxsize=buffer_size)
+        self.overflowed = False
+        self.closed = False
+        self.sent = 0
+        self.connected_at = datetime.now(timezone.utc).isoformat()
+
+
+class EventStream:
+    """Hub SSE: nhận event từ event bus, phát cho các client đang kết nối"""
+
+    def __init__(self, max_clients: int = EVENT_STREAM_MAX_CLIENTS, buffer_size: int = EVENT_STREAM_CLIENT_BUFFER,
+                 replay_size: int = EVENT_STREAM_REPLAY_SIZE, heartbeat: float = EVENT_STREAM_HEARTBEAT):
+        self.max_clients = max_clients
+        self.buffer_size = max(1, buffer_size)
+        self.heartbeat = heartbeat
+        # Id của process này; Last-Event-ID của process trước (server restart) không resume được
+        self.epoch = format(int(time.time()), "x")
+        self._lock = threading.Lock()
+        self._clients: Dict[int, _StreamClient] = {}
+        self._replay: deque = deque(maxlen=max(1, replay_size))
+        self._seq = 0
+        self._next_client_id = 1
+        self.stats = {
+            "events": 0,
+            "connections": 0,
+            "rejected_connections": 0,
+            "resumed": 0,
+            "resets": 0,
+            "overflow_disconnects": 0
+        }
+
+    def init_bus(self, bus: EventBus):
+        """Đăng ký hub làm subscriber (sync - chỉ put_nowait vào buffer các client)"""
+        for event_type in STREAM_EVENT_TYPES:
+            bus.subscribe(event_type, self._on_event, mode="sync", name=f"event_stream:{event_type.__name__}")
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _on_event(self, event: Event):
+        data = json.dumps(asdict(event), ensure_ascii=False, default=str)
+        with self._lock:
+            self._seq += 1
+            message = f"id: {self._event_id(self._seq)}\nevent: {type(event).__name__}\ndata: {data}\n\n"
+            self._replay.append((self._seq, message))
+            self.stats["events"] += 1
+            clients = list(self._clients.values())
+
+        for client in clients:
+            if client.overflowed:
+                continue
+            try:
+                client.queue.put_nowait(message)
+            except queue.Full:
+                # Client không đọc kịp: ngắt để nó kết nối lại và resume từ replay buffer
+                client.overflowed = True
+                self.stats["overflow_disconnects"] += 1
+                logger.warning(f"Event stream: client {client.id} ({client.remote_addr}) too slow, disconnecting")
+
+    def _backlog(self, last_event_id: Optional[str]) -> List[str]:
+        """Event client đã lỡ kể từ last_event_id (gọi trong lock)"""
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition("-")
+        oldest = self._replay[0][0] if self._replay else self._seq + 1
+        if epoch == self.epoch and seq.isdigit() and oldest - 1 <= int(seq) <= self._seq:
+            self.stats["resumed"] += 1
+            return [message for event_seq, message in self._replay if event_seq > int(seq)]
+
+        # Không resume được (restart hoặc quá cũ): báo client tải lại trạng thái đầy đủ
+        self.stats["resets"] += 1
+        data = json.dumps({"reason": "history unavailable", "last_event_id": last_event_id})
+        return [f"id: {self._event_id(self._seq)}\nevent: reset\ndata: {data}\n\n"]
+
+    def connect(self, last_event_id: Optional[str] = None,
+                remote_addr: Optional[str] = None) -> Optional[Tuple[_StreamClient, List[str]]]:
+        """
+        Đăng ký 1 client SSE
+
+        Args:
+            last_event_id: Header Last-Event-ID khi EventSource kết nối lại
+            remote_addr: Địa chỉ client (log / stats)
+
+        Returns:
+            (client, event cần gửi lại) hoặc None nếu đã đủ EVENT_STREAM_MAX_CLIENTS
+        """
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                self.stats["rejected_connections"] += 1
+                return None
+            client = _StreamClient(self._next_client_id, remote_addr, self.buffer_size)
+            self._next_client_id += 1
+            self._clients[client.id] = client
+            self.stats["connections"] += 1
+            # Đăng ký + lấy backlog trong cùng lock: không mất / trùng event giữa replay và buffer
+            backlog = self._backlog(last_event_id)
+        logger.info(f"Event stream: client {client.id} connected from {remote_addr} "
+                    f"({len(backlog)} replayed)")
+        return client, backlog
+
+    def disconnect(self, client: _StreamClient):
+        with self._lock:
+            self._clients.pop(client.id, None)
+        client.closed = True
+        logger.info(f"Event stream: client {client.id} disconnected ({client.sent} events sent)")
+
+    def stream(self, client: _StreamClient, backlog: List[str]) -> Iterator[str]:
+        """Generator nội dung text/event-stream cho 1 client (Flask Response)"""
+        try:
+            yield f"retry: {EVENT_STREAM_RETRY_MS}\n\n"
+            for message in backlog:
+                client.sent += 1
+                yield message
+            while not client.overflowed and not client.closed:
+                try:
+                    message = client.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield f": heartbeat {datetime.now(timezone.utc).isoformat()}\n\n"
+                    continue
+                if message is None:
+                    break
+                client.sent += 1
+                yield message
+        finally:
+            self.disconnect(client)
+
+    def close_all(self):
+        """Đóng mọi kết nối (shutdown)"""
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            client.closed = True
+            try:
+                client.queue.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = [{
+                "id": client.id,
+                "remote_addr": client.remote_addr,
+                "connected_at": client.connected_at,
+                "sent": client.sent,
+                "buffered": client.queue.qsize()
+            } for client in self._clients.values()]
+            return dict(
+                self.stats,
+                clients=len(clients),
+                max_clients=self.max_clients,
+                client_buffer=self.buffer_size,
+                replay_buffered=len(self._replay),
+                last_event_id=self._event_id(self._seq) if self._seq else None,
+                heartbeat_seconds=self.heartbeat,
+                connected=clients
+            )
+
+
+# Global instance - dùng chung cho /api/events/stream
+event_stream = EventStream()
+
+# Trả các generator SSE đang chờ khi process thoát
+atexit.register(event_stream.close_all)
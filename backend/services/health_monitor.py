@@ -0,0 +1,277 @@
+"""
+Health Monitor - Thread nền chạy health check định kỳ, API chỉ đọc kết quả đã cache
+
+Chức năng chính:
+- Mỗi HEALTH_PROBE_INTERVAL giây chạy lần lượt các check đã đăng ký (database, card service,
+  ESP32, file dữ liệu), lưu kết quả kèm thời điểm kiểm tra và thời gian chạy
+- /api/system/health, /health/live, /health/ready chỉ đọc cache: load balancer gọi liên tục
+  cũng không chạm tới ESP32 / file thẻ / database trong request
+- Kết quả cũ hơn HEALTH_RESULT_TTL (prober bị treo) bị đánh dấu stale và coi như không khỏe
+- Readiness: đã chạy xong ít nhất 1 vòng check và mọi check critical (database, card service) đều khỏe
+- ESP32: khi poller nền đang chạy thì dựng từ trạng thái poller (không gọi thêm request tới board)
+- HEALTH_PROBE_ENABLED=false: không chạy thread; API chạy check ngay trong request, tối đa 1 vòng
+  mỗi HEALTH_PROBE_INTERVAL (request đồng thời dùng chung kết quả)
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from config.config import HEALTH_PROBE_ENABLED, HEALTH_PROBE_INTERVAL, HEALTH_RESULT_TTL, CARDS_FILE, UNKNOWN_CARDS_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Prober nền + cache kết quả health check
+
+    Attributes:
+        interval: Chu kỳ chạy check (giây)
+        ttl: Tuổi tối đa của 1 kết quả trước khi bị coi là stale (giây)
+        enabled: False -> không chạy thread prober, API chạy check ngay trong request (có giới hạn tần suất)
+    """
+
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL, ttl: float = HEALTH_RESULT_TTL,
+                 enabled: bool = HEALTH_PROBE_ENABLED):
+        self.app = None
+        self.enabled = enabled
+        self.interval = interval
+        self.ttl = ttl
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._started_monotonic = time.monotonic()
+        self._checks: Dict[str, Tuple[Callable[[], Dict[str, Any]], bool]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+        self._last_round_monotonic: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._first_round_done = threading.Event()
+        self.rounds = 0
+        self.last_round_ms: Optional[float] = None
+
+    def init_app(self, app):
+        """Gắn Flask app để check chạy trong app context (database)"""
+        self.app = app
+
+    def register(self, name: str, check: Callable[[], Dict[str, Any]], critical: bool = False):
+        """
+        Đăng ký 1 check
+
+        Args:
+            name: Tên check (key trong kết quả)
+            check: Hàm không tham số trả về dict có "healthy" (bool) và "message"
+            critical: True nếu check này quyết định readiness
+        """
+        self._checks[name] = (check, critical)
+
+    # ------------------------------------------------------------------
+    # Thread nền
+    # ------------------------------------------------------------------
+    def start(self):
+        """Khởi động thread prober (gọi nhiều lần vẫn an toàn)"""
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+            self._thread.start()
+            logger.info(f"Health prober started (interval {self.interval}s, {len(self._checks)} checks)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        logger.info("Health prober stopped")
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_checks()
+            self._stop.wait(self.interval)
+
+    def run_checks(self):
+        """Chạy 1 vòng mọi check và cập nhật cache"""
+        started = time.perf_counter()
+        if self.app is not None:
+            with self.app.app_context():
+                self._run_all()
+        else:
+            self._run_all()
+        self.rounds += 1
+        self._last_round_monotonic = time.monotonic()
+        self.last_round_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._first_round_done.set()
+
+    def _run_all(self):
+        for name, (check, critical) in list(self._checks.items()):
+            started = time.perf_counter()
+            try:
+                result = dict(check())
+            except Exception as e:
+                result = {"healthy": False, "message": f"{name} check error: {str(e)}"}
+            previous = self._results.get(name, {})
+            result.update({
+                "critical": critical,
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "consecutive_failures": 0 if result.get("healthy") else previous.get("consecutive_failures", 0) + 1,
+                "_checked_monotonic": time.monotonic()
+            })
+            if previous and previous.get("healthy") != result.get("healthy"):
+                logger.warning(f"Health: {name} is now {'healthy' if result.get('healthy') else 'unhealthy'}"
+                               f" - {result.get('message')}")
+            with self._lock:
+                self._results[name] = result
+
+    # ------------------------------------------------------------------
+    # Đọc kết quả (không I/O)
+    # ------------------------------------------------------------------
+    def _ensure_fresh(self):
+        """Prober bật: khởi động thread nếu chưa chạy; tắt: chạy 1 vòng check nếu kết quả cũ hơn interval"""
+        if self.enabled:
+            self.start()
+            return
+        with self._inline_lock:
+            last = self._last_round_monotonic
+            if last is None or time.monotonic() - last >= self.interval:
+                self.run_checks()
+
+    def get_results(self) -> Dict[str, Dict[str, Any]]:
+        """Kết quả cache của mọi check kèm age_seconds / stale; check chưa chạy -> pending"""
+        self._ensure_fresh()
+        now = time.monotonic()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        for name, (_, critical) in self._checks.items():
+            result = results.get(name)
+            if result is None:
+                results[name] = {"healthy": False, "pending": True, "critical": critical,
+                                 "message": "Health check chưa chạy"}
+                continue
+            age = now - result.pop("_checked_monotonic")
+            result["age_seconds"] = round(age, 3)
+            result["stale"] = age > self.ttl
+            if result["stale"]:
+                result["healthy"] = False
+        return results
+
+    def get_readiness(self) -> Tuple[bool, List[str]]:
+        """
+        Readiness: sẵn sàng nhận traffic chưa
+
+        Returns:
+            Tuple of (ready, lý do chưa sẵn sàng)
+        """
+        self._ensure_fresh()
+        if not self._first_round_done.is_set():
+            return False, ["health checks not run yet"]
+        reasons = [f"{name}: {result.get('message')}"
+                   for name, result in self.get_results().items()
+                   if result["critical"] and not result["healthy"]]
+        return not reasons, reasons
+
+    def get_liveness(self) -> Dict[str, Any]:
+        """Liveness: process còn phục vụ request (không phụ thuộc thiết bị / database)"""
+        return {
+            "alive": True,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "uptime_seconds": round(time.monotonic() - self._started_monotonic, 1),
+            "prober_running": self.is_running()
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.is_running(),
+            "interval_seconds": self.interval,
+            "result_ttl_seconds": self.ttl,
+            "rounds": self.rounds,
+            "last_round_ms": self.last_round_ms
+        }
+
+
+# ----------------------------------------------------------------------
+# Các check mặc định
+# ----------------------------------------------------------------------
+_card_service = None
+
+
+def check_database_health() -> Dict[str, Any]:
+    """SELECT 1 trên database (cần app context)"""
+    from sqlalchemy import text
+    from app import db
+
+    try:
+        db.session.execute(text("SELECT 1"))
+        return {"healthy": True, "message": "Database reachable"}
+    finally:
+        db.session.remove()
+
+
+def check_card_service_health() -> Dict[str, Any]:
+    """Card service đọc được danh sách thẻ"""
+    global _card_service
+    if _card_service is None:
+        from services.card_service import CardService
+        _card_service = CardService()
+    cards = _card_service.get_all_cards()
+    return {
+        "healthy": True,
+        "message": "Card service operational",
+        "card_count": len(cards)
+    }
+
+
+def check_esp32_service_health() -> Dict[str, Any]:
+    """ESP32: dựng từ poller nền nếu đang chạy, ngược lại gọi thử /data (chỉ trong thread prober)"""
+    from services.esp32_poller import esp32_poller
+
+    service = esp32_poller.service
+    if esp32_poller.is_running():
+        metadata = esp32_poller.get_metadata()
+        connected = metadata["fetched_at"] is not None and metadata["consecutive_failures"] == 0
+        return {
+            "healthy": connected,
+            "message": "ESP32 connected" if connected else "ESP32 not reachable",
+            "url": service.base_url,
+            "source": "poller",
+            "data_age_seconds": metadata["age_seconds"]
+        }
+    connected = service.is_connected()
+    return {
+        "healthy": connected,
+        "message": "ESP32 connected" if connected else "ESP32 not reachable",
+        "url": service.base_url,
+        "source": "probe"
+    }
+
+
+def check_file_health(file_path) -> Dict[str, Any]:
+    """File dữ liệu tồn tại và đọc được kích thước"""
+    file_path_str = str(file_path)
+    accessible = os.path.exists(file_path_str)
+    size = os.path.getsize(file_path_str) if accessible else 0
+    return {
+        "healthy": accessible,
+        "accessible": accessible,
+        "path": file_path_str,
+        "size_bytes": size,
+        "message": "File accessible" if accessible else "File not found"
+    }
+
+
+# Global instance - prober dùng chung cho System API và /health/live, /health/ready
+health_monitor = HealthMonitor()
+health_monitor.register("database", check_database_health, critical=True)
+health_monitor.register("card_service", check_card_service_health, critical=True)
+health_monitor.register("esp32_service", check_esp32_service_health)
+health_monitor.register("cards_file", lambda: check_file_health(CARDS_FILE))
+health_monitor.register("unknown_cards_file", lambda: check_file_health(UNKNOWN_CARDS_FILE))
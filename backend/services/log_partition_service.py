@@ -0,0 +1,300 @@
+"""
+Log Partition Service - Lưu log thẻ theo partition hàng tháng (card_logs_YYYYMM)
+
+Chức năng chính:
+- Định tuyến ghi log vào bảng card_logs_YYYYMM theo timestamp
+- Tự tạo partition mới (cùng cột và index với card_logs)
+- Partition pruning: truy vấn chỉ chạm các partition giao với khoảng thời gian
+- Retention: xóa log cũ bằng DROP TABLE cả partition thay vì DELETE từng dòng
+"""
+import re
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, Index, select, func, text
+
+from config.config import LOG_RETENTION_MONTHS
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "card_logs_"
+PARTITION_PATTERN = re.compile(r'^card_logs_(\d{4})(\d{2})$')
+
+
+def partition_name_for(dt: datetime) -> str:
+    """Tên partition chứa thời điểm dt, ví dụ card_logs_202512"""
+    return f"{PARTITION_PREFIX}{dt.year:04d}{dt.month:02d}"
+
+
+def month_bounds(name: str) -> Tuple[datetime, datetime]:
+    """
+    Khoảng thời gian [start, end) của một partition
+
+    Args:
+        name: Tên partition card_logs_YYYYMM
+
+    Returns:
+        Tuple (start, end) dạng datetime naive UTC
+    """
+    match = PARTITION_PATTERN.match(name)
+    if not match:
+        raise ValueError(f"Invalid partition name: {name}")
+    year, month = int(match.group(1)), int(match.group(2))
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+class LogPartitionRouter:
+    """
+    Lớp định tuyến đọc/ghi log thẻ trên các partition card_logs_YYYYMM
+
+    Mỗi partition có cùng cấu trúc cột với CardLogModel (card_logs) và các index
+    (timestamp), (card_number, timestamp), (action, timestamp), (log_uuid).
+    Tất cả timestamp là datetime naive theo UTC.
+    """
+
+    def __init__(self):
+        self._metadata = MetaData()
+        self._tables: Dict[str, Table] = {}
+        self._known_partitions: Optional[set] = None
+        self._lock = threading.Lock()
+
+    def _get_db(self):
+        """Lấy db instance (lazy import để tránh circular import)"""
+        from app import db
+        return db
+
+    def _get_table(self, name: str) -> Table:
+        """Lấy (hoặc dựng) Table object cho partition, copy cột từ CardLogModel"""
+        table = self._tables.get(name)
+        if table is None:
+            from models.models_cache import get_sqlalchemy_models
+            _, _, CardLogModel, _, _, _ = get_sqlalchemy_models()
+
+            columns = [column._copy() for column in CardLogModel.__table__.columns]
+            table = Table(name, self._metadata, *columns)
+            Index(f"ix_{name}_card_number_timestamp", table.c.card_number, table.c.timestamp)
+            Index(f"ix_{name}_action_timestamp", table.c.action, table.c.timestamp)
+            self._tables[name] = table
+        return table
+
+    def list_partitions(self, refresh: bool = False) -> List[str]:
+        """
+        Danh sách partition hiện có, sắp xếp từ cũ đến mới
+
+        Args:
+            refresh: True để đọc lại từ sqlite_master
+        """
+        with self._lock:
+            if self._known_partitions is None or refresh:
+                db = self._get_db()
+                rows = db.session.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'card_logs_%'"
+                )).fetchall()
+                self._known_partitions = {row[0] for row in rows if PARTITION_PATTERN.match(row[0])}
+            return sorted(self._known_partitions)
+
+    def ensure_partition(self, name: str) -> Table:
+        """Tạo partition nếu chưa tồn tại và trả về Table object"""
+        table = self._get_table(name)
+        if name in self.list_partitions():
+            return table
+
+        with self._lock:
+            if name not in self._known_partitions:
+                # Tạo trong transaction của session để không tranh lock với các INSERT đang chờ commit
+                db = self._get_db()
+                table.create(bind=db.session.connection(), checkfirst=True)
+                self._known_partitions.add(name)
+                logger.info(f"Created log partition: {name}")
+        return table
+
+    def invalidate(self):
+        """Xóa cache danh sách partition (gọi sau khi rollback)"""
+        with self._lock:
+            self._known_partitions = None
+
+    def partitions_for_range(self, since: Optional[datetime] = None,
+                             until: Optional[datetime] = None) -> List[str]:
+        """
+        Các partition có khoảng thời gian giao với [since, until)
+
+        Args:
+            since: Thời điểm bắt đầu (naive UTC, optional)
+            until: Thời điểm kết thúc, không bao gồm (naive UTC, optional)
+
+        Returns:
+            List tên partition, cũ đến mới
+        """
+        selected = []
+        for name in self.list_partitions():
+            start, end = month_bounds(name)
+            if since is not None and end <= since:
+                continue
+            if until is not None and start >= until:
+                continue
+            selected.append(name)
+        return selected
+
+    def insert(self, row_data: Dict[str, Any]):
+        """
+        Ghi 1 log vào partition tương ứng với timestamp (không commit)
+
+        Args:
+            row_data: Dict cột -> giá trị (xem LogQueryService.build_row_data)
+        """
+        self.insert_many([row_data])
+
+    def insert_many(self, rows: List[Dict[str, Any]]):
+        """Ghi nhiều log, gom theo partition để mỗi partition chỉ 1 lệnh INSERT (không commit)"""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            grouped.setdefault(partition_name_for(row["timestamp"]), []).append(row)
+
+        db = self._get_db()
+        for name, partition_rows in grouped.items():
+            table = self.ensure_partition(name)
+            db.session.execute(table.insert(), partition_rows)
+
+    def _apply_filters(self, table: Table, stmt, card_id: Optional[str], action: Optional[str],
+                       since: Optional[datetime], until: Optional[datetime]):
+        """Áp dụng các filter chung cho một partition"""
+        stmt = stmt.where(table.c.log_uuid.isnot(None))
+        if card_id:
+            stmt = stmt.where(table.c.card_number == card_id)
+        if action:
+            stmt = stmt.where(table.c.action == action)
+        if since is not None:
+            stmt = stmt.where(table.c.timestamp >= since)
+        if until is not None:
+            stmt = stmt.where(table.c.timestamp < until)
+        return stmt
+
+    def query_page(self,
+                   card_id: Optional[str] = None,
+                   action: Optional[str] = None,
+                   since: Optional[datetime] = None,
+                   until: Optional[datetime] = None,
+                   order: str = "desc",
+                   limit: int = 100,
+                   offset: int = 0) -> Tuple[List[Any], int]:
+        """
+        Truy vấn 1 trang log trên các partition liên quan
+
+        Partition không giao với [since, until) bị bỏ qua hoàn toàn. Vì các
+        partition không chồng lấn thời gian, trang kết quả được ghép bằng cách
+        duyệt partition theo thứ tự và bỏ qua cả partition nằm trọn trong offset.
+
+        Returns:
+            Tuple (rows, total_count)
+        """
+        db = self._get_db()
+        partitions = self.partitions_for_range(since, until)
+        if order != "asc":
+            partitions = list(reversed(partitions))
+
+        counts = []
+        for name in partitions:
+            table = self._get_table(name)
+            stmt = self._apply_filters(table, select(func.count()).select_from(table),
+                                       card_id, action, since, until)
+            counts.append((name, db.session.execute(stmt).scalar() or 0))
+
+        total_count = sum(count for _, count in counts)
+
+        rows = []
+        skip = offset
+        remaining = limit
+        for name, count in counts:
+            if remaining <= 0:
+                break
+            if skip >= count:
+                skip -= count
+                continue
+
+            table = self._get_table(name)
+            stmt = self._apply_filters(table, select(table), card_id, action, since, until)
+            if order == "asc":
+                stmt = stmt.order_by(table.c.timestamp.asc(), table.c.id.asc())
+            else:
+                stmt = stmt.order_by(table.c.timestamp.desc(), table.c.id.desc())
+            fetched = db.session.execute(stmt.offset(skip).limit(remaining)).fetchall()
+
+            rows.extend(fetched)
+            remaining -= len(fetched)
+            skip = 0
+
+        return rows, total_count
+
+    def existing_uuids(self, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> set:
+        """Tập log_uuid đã có trong các partition giao với [since, until)"""
+        db = self._get_db()
+        uuids = set()
+        for name in self.partitions_for_range(since, until):
+            table = self._get_table(name)
+            stmt = select(table.c.log_uuid).where(table.c.log_uuid.isnot(None))
+            uuids.update(row[0] for row in db.session.execute(stmt))
+        return uuids
+
+    def drop_partitions_before(self, cutoff: datetime) -> List[str]:
+        """
+        Xóa các partition kết thúc trước cutoff (DROP TABLE, không DELETE từng dòng)
+
+        Args:
+            cutoff: Thời điểm (naive UTC); partition có end <= cutoff bị xóa
+
+        Returns:
+            List tên partition đã xóa
+        """
+        db = self._get_db()
+        dropped = []
+        for name in self.list_partitions(refresh=True):
+            _, end = month_bounds(name)
+            if end > cutoff:
+                continue
+            db.session.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+            db.session.commit()
+            with self._lock:
+                self._known_partitions.discard(name)
+            self._tables.pop(name, None)
+            if name in self._metadata.tables:
+                self._metadata.remove(self._metadata.tables[name])
+            dropped.append(name)
+            logger.info(f"Dropped log partition: {name}")
+        return dropped
+
+    def retention_cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """
+        Mốc thời gian retention: giữ tháng hiện tại và (LOG_RETENTION_MONTHS - 1) tháng trước đó
+
+        Args:
+            now: Thời điểm tham chiếu (naive UTC, mặc định hiện tại)
+
+        Returns:
+            Ngày đầu tháng cũ nhất còn được giữ
+        """
+        now = now or datetime.utcnow()
+        month_index = now.year * 12 + (now.month - 1) - (max(1, LOG_RETENTION_MONTHS) - 1)
+        return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+    def apply_retention(self, now: Optional[datetime] = None) -> List[str]:
+        """Xóa các partition cũ hơn mốc retention"""
+        return self.drop_partitions_before(self.retention_cutoff(now))
+
+    def get_partition_stats(self) -> List[Dict[str, Any]]:
+        """Số dòng của từng partition (dùng cho thống kê/giám sát)"""
+        db = self._get_db()
+        stats = []
+        for name in self.list_partitions():
+            table = self._get_table(name)
+            count = db.session.execute(select(func.count()).select_from(table)).scalar() or 0
+            stats.append({"partition": name, "rows": count})
+        return stats
+
+
+# Global instance - dùng chung cho CardLogService, LogQueryService và ScheduledTasks
+log_partition_router = LogPartitionRouter()
@@ -0,0 +1,260 @@
+"""
+Log Query Service - Truy vấn log thẻ trực tiếp trong database
+
+Chức năng chính:
+- Đẩy filter card_id, action, khoảng thời gian, sắp xếp và limit xuống SQL
+- Tận dụng index (card_number, timestamp), (action, timestamp)
+- Chỉ truy vấn các partition card_logs_YYYYMM giao với khoảng thời gian
+- Trả về đúng format như CardLogService đọc từ JSON
+- Backfill các log cũ từ card_logs.json / bảng card_logs vào partitions
+"""
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_log_time(value: Any) -> Optional[datetime]:
+    """
+    Chuyển timestamp (ISO string hoặc datetime) về datetime UTC naive
+    (cùng dạng với giá trị lưu trong cột card_logs.timestamp)
+
+    Args:
+        value: ISO string hoặc datetime
+
+    Returns:
+        datetime naive theo UTC, hoặc None nếu không parse được
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class LogQueryService:
+    """
+    Service đọc log từ các partition card_logs_YYYYMM với filter thực hiện bằng SQL
+
+    Chỉ các bản ghi có log_uuid (được mirror từ CardLogService.add_log) mới được
+    trả về, để kết quả khớp với card_logs.json. Các bản ghi không có log_uuid là
+    bản ghi trùng do api/cards.py ghi trực tiếp vào bảng card_logs.
+    """
+
+    def __init__(self):
+        self._backfill_done = False
+
+    @property
+    def router(self):
+        from services.log_partition_service import log_partition_router
+        return log_partition_router
+
+    def get_logs_with_count(self,
+                            card_id: Optional[str] = None,
+                            action: Optional[str] = None,
+                            since: Optional[datetime] = None,
+                            until: Optional[datetime] = None,
+                            order: str = "desc",
+                            limit: int = 100,
+                            offset: int = 0) -> Dict[str, Any]:
+        """
+        Lấy danh sách logs từ database + total count cho pagination
+
+        Args:
+            card_id: Filter theo card ID (optional)
+            action: Filter theo action value, ví dụ "entry" (optional)
+            since: Chỉ lấy logs có timestamp >= since (optional)
+            until: Chỉ lấy logs có timestamp < until (optional)
+            order: "desc" (mới nhất trước) hoặc "asc"
+            limit: Số lượng logs tối đa trả về
+            offset: Bỏ qua n logs đầu tiên
+
+        Returns:
+            Dict với keys: logs, total_count, filtered_count, has_more
+        """
+        if not self._backfill_done:
+            self.backfill()
+
+        rows, total_count = self.router.query_page(
+            card_id=card_id,
+            action=action,
+            since=parse_log_time(since),
+            until=parse_log_time(until),
+            order=order,
+            limit=limit,
+            offset=offset
+        )
+        logs = [self._row_to_dict(row) for row in rows]
+
+        return {
+            "logs": logs,
+            "total_count": total_count,
+            "filtered_count": len(logs),
+            "has_more": offset + limit < total_count
+        }
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        """Chuyển 1 bản ghi card_logs về format giống log entry trong JSON"""
+        timestamp = row.timestamp
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.replace(tzinfo=timezone.utc).isoformat()
+
+        try:
+            details = json.loads(row.details) if row.details else {}
+        except (TypeError, ValueError):
+            details = {}
+        try:
+            metadata = json.loads(row.log_metadata) if row.log_metadata else {}
+        except (TypeError, ValueError):
+            metadata = {}
+
+        return {
+            "id": row.log_uuid,
+            "timestamp": timestamp,
+            "card_id": row.card_number,
+            "action": row.action,
+            "details": details,
+            "metadata": metadata
+        }
+
+    @staticmethod
+    def build_row_data(log_entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Map một log entry JSON sang các cột của CardLogModel
+
+        Args:
+            log_entry: Log entry dict (format card_logs.json)
+
+        Returns:
+            Dict kwargs cho CardLogModel
+        """
+        details = log_entry.get("details") or {}
+        metadata = log_entry.get("metadata") or {}
+
+        notes = details.get("local_time", "")
+        if "source" in details:
+            notes = f"{notes} [Source: {details['source']}]"
+
+        try:
+            timestamp = parse_log_time(log_entry.get("timestamp"))
+        except ValueError:
+            timestamp = None
+
+        return {
+            "card_number": str(log_entry.get("card_id")),
+            "action": log_entry.get("action"),
+            "timestamp": timestamp or datetime.now(timezone.utc).replace(tzinfo=None),
+            "notes": notes[:255],
+            "log_uuid": log_entry.get("id"),
+            "details": json.dumps(details, ensure_ascii=False),
+            "log_metadata": json.dumps(metadata, ensure_ascii=False)
+        }
+
+    def backfill(self) -> int:
+        """
+        Đưa các log chưa có trong partitions vào database: trước hết là các dòng
+        có log_uuid trong bảng card_logs cũ, sau đó là các entry trong card_logs.json
+
+        Returns:
+            Tổng số bản ghi đã thêm
+        """
+        added = self.migrate_legacy_table()
+        added += self.backfill_from_json()
+        self._backfill_done = True
+        return added
+
+    def migrate_legacy_table(self) -> int:
+        """
+        Chép các dòng có log_uuid từ bảng card_logs (trước khi chia partition) sang partitions
+
+        Returns:
+            Số bản ghi đã thêm
+        """
+        from app import db
+        from models.models_cache import get_sqlalchemy_models
+
+        _, _, CardLogModel, _, _, _ = get_sqlalchemy_models()
+        columns = [column.name for column in CardLogModel.__table__.columns if column.name != 'id']
+
+        try:
+            legacy_rows = db.session.query(CardLogModel).filter(CardLogModel.log_uuid.isnot(None)).all()
+            if not legacy_rows:
+                return 0
+
+            cutoff = self.router.retention_cutoff()
+            legacy_rows = [row for row in legacy_rows if row.timestamp and row.timestamp >= cutoff]
+            if not legacy_rows:
+                return 0
+
+            existing = self.router.existing_uuids(min(row.timestamp for row in legacy_rows), None)
+            missing = [
+                {name: getattr(row, name) for name in columns}
+                for row in legacy_rows
+                if row.log_uuid not in existing
+            ]
+
+            if missing:
+                self.router.insert_many(missing)
+                db.session.commit()
+                logger.info(f"Copied {len(missing)} logs from card_logs into monthly partitions")
+            return len(missing)
+
+        except Exception as e:
+            logger.error(f"Legacy card_logs migration failed: {e}")
+            db.session.rollback()
+            self.router.invalidate()
+            return 0
+
+    def backfill_from_json(self, log_file: Optional[Path] = None) -> int:
+        """
+        Chép các log entry có trong card_logs.json nhưng chưa có trong database
+
+        Args:
+            log_file: Đường dẫn file log (mặc định data/card_logs.json)
+
+        Returns:
+            Số bản ghi đã thêm
+        """
+        from app import db
+        from config.config import CARDS_FILE
+
+        log_file = log_file or Path(CARDS_FILE).parent / "card_logs.json"
+
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                logs: List[Dict[str, Any]] = json.load(f).get("logs", [])
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.warning(f"Log backfill skipped - cannot read {log_file}: {e}")
+            return 0
+
+        try:
+            # Bỏ qua các log đã quá hạn retention (partition của chúng đã bị xóa)
+            cutoff = self.router.retention_cutoff()
+            rows = [self.build_row_data(entry) for entry in logs if entry.get("id")]
+            rows = [row for row in rows if row["timestamp"] >= cutoff]
+            if not rows:
+                return 0
+
+            # Chỉ kiểm tra các partition trong khoảng thời gian của file JSON
+            existing = self.router.existing_uuids(min(row["timestamp"] for row in rows), None)
+            missing = [row for row in rows if row["log_uuid"] not in existing]
+
+            if missing:
+                self.router.insert_many(missing)
+                db.session.commit()
+                logger.info(f"Backfilled {len(missing)} logs from JSON into card_logs partitions")
+            return len(missing)
+
+        except Exception as e:
+            logger.error(f"Log backfill failed: {e}")
+            db.session.rollback()
+            self.router.invalidate()
+            return 0
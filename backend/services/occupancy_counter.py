@@ -0,0 +1,145 @@
+"""
+Occupancy Counter - Bộ đếm số xe trong/ngoài bãi cập nhật tăng dần
+
+Chức năng chính:
+- Giữ total / inside trong bộ nhớ, đọc thống kê O(1) thay vì parse toàn bộ cards.json
+- Cập nhật nguyên tử khi thẻ đổi trạng thái, được tạo hoặc bị xóa: ghi cards.json và cập nhật bộ đếm
+  nằm trong cùng 1 lock (transaction()), self-check không đếm lại giữa 2 bước đó
+- Self-check định kỳ (ScheduledTasks): đếm lại từ cards.json, sửa nếu lệch và ghi nhận drift
+- invalidate() khi cards.json bị thay thế ngoài CardService (restore backup)
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from config.config import CARDS_FILE
+from utils.file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+
+class OccupancyCounter:
+    """
+    Bộ đếm occupancy dùng chung cho mọi CardService
+
+    Lần đọc đầu tiên (hoặc sau invalidate) đếm lại từ cards.json; các lần sau chỉ đọc số trong bộ nhớ.
+    """
+
+    def __init__(self):
+        self.file_manager = FileManager()
+        # RLock: on_* được gọi khi đang giữ lock của transaction()
+        self._lock = threading.RLock()
+        self._total = 0
+        self._inside = 0
+        self._loaded = False
+        self.checks = 0
+        self.drift_count = 0
+        self.last_check: Optional[Dict[str, Any]] = None
+
+    def _recount(self) -> Tuple[int, int]:
+        """Đếm lại total / inside từ cards.json"""
+        success, raw_data = self.file_manager.read_json(CARDS_FILE, default_value={})
+        if not success or not isinstance(raw_data, dict):
+            raise IOError(f"Cannot read {CARDS_FILE}")
+        cards = [card for card in raw_data.values() if isinstance(card, dict)]
+        return len(cards), sum(1 for card in cards if card.get("status") == 1)
+
+    def _ensure_loaded(self):
+        """Đếm lại nếu chưa có số liệu (gọi khi đang giữ lock)"""
+        if not self._loaded:
+            self._total, self._inside = self._recount()
+            self._loaded = True
+
+    def transaction(self) -> threading.RLock:
+        """
+        Lock bao quanh ghi cards.json + on_created / on_deleted / on_status_changed
+
+        Cách dùng:
+            with occupancy_counter.transaction():
+                success, message = file_manager.write_json(CARDS_FILE, ...)
+                if success:
+                    occupancy_counter.on_status_changed(old_status, new_status)
+        """
+        return self._lock
+
+    def on_created(self, status: int):
+        with self._lock:
+            if self._loaded:
+                self._total += 1
+                if status == 1:
+                    self._inside += 1
+
+    def on_deleted(self, status: int):
+        with self._lock:
+            if self._loaded:
+                self._total -= 1
+                if status == 1:
+                    self._inside -= 1
+
+    def on_status_changed(self, old_status: int, new_status: int):
+        with self._lock:
+            if self._loaded and old_status != new_status:
+                if new_status == 1:
+                    self._inside += 1
+                elif old_status == 1:
+                    self._inside -= 1
+
+    def invalidate(self):
+        """Bỏ số liệu hiện tại, lần đọc sau sẽ đếm lại"""
+        with self._lock:
+            self._loaded = False
+
+    def get_counts(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple of (total, inside)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._total, self._inside
+
+    def self_check(self) -> Dict[str, Any]:
+        """
+        So sánh bộ đếm với số đếm lại từ cards.json, sửa nếu lệch
+
+        Returns:
+            Kết quả kiểm tra (expected / actual / drift)
+        """
+        started = time.perf_counter()
+        with self._lock:
+            # Giữ lock trong lúc đếm lại: writer đang ghi file + cập nhật bộ đếm phải chờ (transaction())
+            total, inside = self._recount()
+            result = {
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "counter_total": self._total if self._loaded else None,
+                "counter_inside": self._inside if self._loaded else None,
+                "actual_total": total,
+                "actual_inside": inside,
+                "drift": self._loaded and (self._total != total or self._inside != inside)
+            }
+            self._total, self._inside = total, inside
+            self._loaded = True
+            self.checks += 1
+            if result["drift"]:
+                self.drift_count += 1
+
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.last_check = result
+        if result["drift"]:
+            logger.warning(f"Occupancy counter drift corrected: counter {result['counter_inside']}/"
+                           f"{result['counter_total']}, actual {inside}/{total}")
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "checks": self.checks,
+            "drift_count": self.drift_count,
+            "last_check": self.last_check
+        }
+
+
+# Global instance - dùng chung cho CardService (api/cards.py, api/system.py) và ScheduledTasks
+occupancy_counter = OccupancyCounter()
@@ -0,0 +1,219 @@
+"""
+Password Verifier - Kiểm tra mật khẩu (bcrypt / pbkdf2) trong pool riêng, ngoài request thread
+
+Chức năng chính:
+- bcrypt.checkpw tốn ~100-300ms CPU; login dồn dập (đổi ca) hoặc dò mật khẩu hàng loạt không được
+  chiếm hết worker của Flask làm chậm quẹt thẻ ở cổng
+- Pool process riêng (AUTH_HASH_WORKERS) dùng fork, chỉ tạo trong start() - gọi sớm trong create_app()
+  trước các thread nền: mọi worker được fork 1 lần lúc đó. spawn / forkserver không dùng được vì worker
+  import lại __main__ (run.py -> tạo app, scheduler, poller trong từng worker)
+- Thread pool (bcrypt nhả GIL khi hash) khi: AUTH_HASH_POOL = 'thread', nền tảng không có fork (Windows),
+  start() chưa được gọi, hoặc pool process bị hỏng (không fork lại từ process đã nhiều thread)
+- Giới hạn số verify đang chạy + chờ (AUTH_HASH_MAX_PENDING): vượt -> PasswordVerifierUnavailable (API trả 503)
+  ngay, không xếp hàng vô hạn
+- Metrics: latency tổng / thời gian chờ / thời gian hash (auth_latency), số đang xử lý, đỉnh, tỉ lệ bận của worker
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Tuple
+
+import bcrypt
+from werkzeug.security import check_password_hash
+
+from config.config import AUTH_HASH_POOL, AUTH_HASH_WORKERS, AUTH_HASH_MAX_PENDING, AUTH_HASH_TIMEOUT
+from utils.latency import auth_latency
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordVerifierUnavailable(Exception):
+    """Pool verify mật khẩu quá tải / quá thời gian / hỏng - thử lại sau"""
+
+
+def _check_password(password: str, password_hash: str) -> Tuple[bool, int]:
+    """
+    Chạy trong worker: hỗ trợ cả hash bcrypt và werkzeug (pbkdf2 / scrypt)
+
+    Returns:
+        Tuple of (mật khẩu đúng, thời gian hash ns)
+    """
+    started = time.perf_counter_ns()
+    if password_hash.startswith('$2'):
+        valid = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    else:
+        valid = check_password_hash(password_hash, password)
+    return valid, time.perf_counter_ns() - started
+
+
+def _worker_pid() -> int:
+    """Task rỗng để khởi động worker"""
+    return os.getpid()
+
+
+class PasswordVerifier:
+    """
+    Pool verify mật khẩu có giới hạn hàng đợi
+
+    Attributes:
+        workers: Số process (thread) hash song song
+        max_pending: Số verify tối đa đang chạy + chờ
+        timeout: Giây chờ kết quả tối đa
+    """
+
+    def __init__(self, workers: int = AUTH_HASH_WORKERS, max_pending: int = AUTH_HASH_MAX_PENDING,
+                 timeout: float = AUTH_HASH_TIMEOUT, mode: str = AUTH_HASH_POOL):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.timeout = timeout
+        self.mode = mode
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "pool_restarts": 0,
+            "peak_in_flight": 0
+        }
+
+    def _get_executor(self) -> Executor:
+        """Pool hiện tại; tạo lazy chỉ ra thread pool (không fork từ request thread)"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self._create_thread_pool()
+            return self._executor
+
+    def _create_thread_pool(self) -> Executor:
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-verify")
+
+    def start(self):
+        """
+        Tạo pool và fork worker ngay (gọi sớm trong create_app, trước khi các thread nền chạy)
+
+        Worker fork từ process đã có nhiều thread có thể kế thừa lock đang bị giữ;
+        fork lúc khởi động thì worker chỉ mang trạng thái gần như đơn luồng.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                return
+            if self.mode == 'process' and 'fork' in multiprocessing.get_all_start_methods():
+                logger.info(f"Password verifier: process pool ({self.workers} workers, "
+                            f"max {self.max_pending} pending)")
+                # Với fork, ProcessPoolExecutor tạo đủ worker ngay ở task đầu tiên
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('fork'))
+            else:
+                if self.mode == 'process':
+                    logger.warning("Password verifier: fork not available, using thread pool")
+                self._executor = self._create_thread_pool()
+            executor = self._executor
+        try:
+            pid = executor.submit(_worker_pid).result(timeout=self.timeout)
+            logger.info(f"Password verifier ready (worker pid {pid})")
+        except Exception as e:
+            logger.error(f"Password verifier: failed to start pool: {e}")
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor(executor)
+
+    def _reset_executor(self, executor: Executor):
+        """
+        Bỏ pool hỏng (worker bị kill / OOM) và thay bằng thread pool
+
+        Lúc này scheduler, poller, prober, event bus đã chạy - fork lại không an toàn.
+        """
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = self._create_thread_pool()
+                self.stats["pool_restarts"] += 1
+                logger.warning("Password verifier: process pool broken, switched to thread pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, _future: Optional[Future] = None):
+        # Giải phóng slot khi task thực sự xong (kể cả sau timeout), không phải khi request bỏ chờ
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """
+        Kiểm tra mật khẩu trong pool
+
+        Raises:
+            PasswordVerifierUnavailable: Pool đầy, quá AUTH_HASH_TIMEOUT hoặc pool hỏng
+        """
+        if not self._slots.acquire(blocking=False):
+            self.stats["rejected"] += 1
+            raise PasswordVerifierUnavailable(f"Password verifier saturated ({self.max_pending} pending)")
+        with self._lock:
+            self._in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self._in_flight)
+        self.stats["submitted"] += 1
+
+        started = time.perf_counter_ns()
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(_check_password, password, password_hash)
+        except Exception as e:
+            self._release()
+            self.stats["errors"] += 1
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                self._reset_executor(executor)
+            raise PasswordVerifierUnavailable(f"Password verifier unavailable: {e}") from e
+        future.add_done_callback(self._release)
+
+        try:
+            valid, hash_ns = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self.stats["timeouts"] += 1
+            raise PasswordVerifierUnavailable(f"Password verification timed out after {self.timeout}s")
+        except BrokenProcessPool as e:
+            self.stats["errors"] += 1
+            self._reset_executor(executor)
+            raise PasswordVerifierUnavailable(f"Password verifier unavailable: {e}") from e
+
+        total_ns = time.perf_counter_ns() - started
+        auth_latency.record("password_verify", total_ns)
+        auth_latency.record("password_hash", hash_ns)
+        auth_latency.record("password_queue_wait", max(0, total_ns - hash_ns))
+        self.stats["completed"] += 1
+        return valid
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+        busy = min(in_flight, self.workers)
+        return dict(
+            self.stats,
+            mode=type(self._executor).__name__ if self._executor is not None else None,
+            workers=self.workers,
+            max_pending=self.max_pending,
+            in_flight=in_flight,
+            queued=max(0, in_flight - self.workers),
+            utilization=round(busy / self.workers * 100, 1)
+        )
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance - dùng cho POST /api/auth/login
+password_verifier = PasswordVerifier()
+
+# Dừng worker process khi process chính thoát
+atexit.register(password_verifier.shutdown)
@@ -0,0 +1,182 @@
+"""
+Principal Cache - Cache xác thực cho các endpoint có JWT
+
+Chức năng chính:
+- TokenCache: LRU giới hạn token -> claims đã verify; cùng 1 token gọi lại (trang admin gọi song song
+  nhiều API) không decode + kiểm tra chữ ký HS256 lại. Vẫn kiểm tra exp mỗi lần đọc cache,
+  token lỗi không được cache (token rác không đẩy token hợp lệ ra khỏi LRU)
+- PrincipalCache: user_id -> role, is_active, token_version với TTL ngắn (AUTH_PRINCIPAL_TTL),
+  thay cho User.query.get mỗi request admin
+- Sửa / khóa / xóa user gọi invalidate() nên thay đổi có hiệu lực ngay trong process này;
+  process khác (nhiều worker) thấy thay đổi sau tối đa AUTH_PRINCIPAL_TTL giây
+- token_version tăng khi đổi mật khẩu / role hoặc khóa tài khoản: token cũ (claim "ver" nhỏ hơn) bị từ chối
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import jwt
+
+from config.config import AUTH_PRINCIPAL_TTL, AUTH_PRINCIPAL_CACHE_SIZE, AUTH_TOKEN_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """LRU token -> claims đã verify chữ ký"""
+
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def decode(self, token: str, secret: str) -> Dict[str, Any]:
+        """
+        Giống jwt.decode(token, secret, algorithms=['HS256']) nhưng dùng lại kết quả đã verify
+
+        Raises:
+            jwt.ExpiredSignatureError: Token hết hạn (kể cả khi claims nằm trong cache)
+            jwt.InvalidTokenError: Token không hợp lệ
+        """
+        # Key gồm cả secret: đổi JWT_SECRET_KEY thì claims cũ không còn dùng được
+        key = hashlib.sha256(f"{secret}\0{token}".encode("utf-8")).digest()
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None:
+                self._entries.move_to_end(key)
+        if claims is not None:
+            if "exp" in claims and claims["exp"] <= time.time():
+                with self._lock:
+                    self._entries.pop(key, None)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            self.stats["hits"] += 1
+            return claims
+
+        self.stats["misses"] += 1
+        claims = jwt.decode(token, secret, algorithms=["HS256"])
+        with self._lock:
+            self._entries[key] = claims
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return dict(self.stats, size=size, max_size=self.max_size)
+
+
+class PrincipalCache:
+    """Cache TTL user_id -> thông tin phân quyền (cần app context khi miss)"""
+
+    def __init__(self, ttl: float = AUTH_PRINCIPAL_TTL, max_size: int = AUTH_PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id) -> Optional[Dict[str, Any]]:
+        """
+        Thông tin phân quyền của user
+
+        Args:
+            user_id: Id user (int hoặc str từ claim "sub")
+
+        Returns:
+            {"id", "username", "role", "is_active", "token_version"} hoặc None nếu user không tồn tại
+        """
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.stats["hits"] += 1
+                return entry[1]
+
+        self.stats["misses"] += 1
+        principal = self._load(user_id)
+        if principal is None:
+            # Không cache user không tồn tại: id rác không chiếm chỗ trong LRU
+            self.invalidate(user_id, count=False)
+            return None
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return principal
+
+    @staticmethod
+    def _load(user_id: int) -> Optional[Dict[str, Any]]:
+        import models
+
+        user = models.User.query.get(user_id)
+        if user is None:
+            return None
+        return {
+            "id": user.id,
+            "username": user.username,
+            "role": user.role,
+            "is_active": bool(user.is_active),
+            "token_version": user.token_version or 0
+        }
+
+    def invalidate(self, user_id, count: bool = True):
+        """Bỏ cache của 1 user (gọi sau khi sửa / khóa / xóa user)"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if count:
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return dict(self.stats, size=size, max_size=self.max_size, ttl_seconds=self.ttl)
+
+
+def check_principal(claims: Dict[str, Any], principal: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Token còn dùng được cho principal này không
+
+    Returns:
+        None nếu hợp lệ, ngược lại lý do từ chối
+    """
+    if principal is None:
+        return "User not found"
+    if not principal["is_active"]:
+        return "User account is inactive"
+    if claims.get("ver", 0) < principal["token_version"]:
+        return "Token has been revoked"
+    return None
+
+
+def get_auth_cache_stats() -> Dict[str, Any]:
+    return {"tokens": token_cache.get_stats(), "principals": principal_cache.get_stats()}
+
+
+# Global instance - dùng chung cho api/auth.py (token_required) và api/users.py (admin_required)
+token_cache = TokenCache()
+principal_cache = PrincipalCache()
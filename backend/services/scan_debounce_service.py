@@ -0,0 +1,145 @@
+"""
+Scan Debounce Service - Chống quẹt trùng (reader báo cùng 1 thẻ nhiều lần trong ~1 giây)
+
+Chức năng chính:
+- TTL cache theo key (uid, direction, reader) lưu kết quả quẹt gần nhất
+- Lượt quẹt lặp lại trong cửa sổ SCAN_DEBOUNCE_SECONDS trả về kết quả đã cache,
+  không đọc/ghi cards.json, log hay unknown_cards
+- Giới hạn số entry (SCAN_DEBOUNCE_MAX_ENTRIES), tự loại entry hết hạn / cũ nhất
+- Bộ đếm số lượt bị chặn theo từng decision
+"""
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Any, Optional, Tuple, Set
+
+from config.config import SCAN_DEBOUNCE_SECONDS, SCAN_DEBOUNCE_MAX_ENTRIES
+
+# Kết quả lỗi không cache để lượt quẹt sau được thử lại
+NON_CACHEABLE_DECISIONS = {"error"}
+
+
+class ScanDebouncer:
+    """
+    TTL cache cho kết quả quẹt thẻ
+
+    Entry được giữ theo thứ tự thời điểm ghi (OrderedDict); vì TTL cố định nên
+    entry đầu tiên luôn hết hạn sớm nhất, việc dọn dẹp chỉ cần pop từ đầu.
+    """
+
+    def __init__(self, ttl_seconds: float = SCAN_DEBOUNCE_SECONDS,
+                 max_entries: int = SCAN_DEBOUNCE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_uid: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+        self.suppressed_by_decision: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _remove(self, key: Tuple[str, str, str]):
+        """Xóa 1 entry và index theo uid (gọi khi đang giữ lock)"""
+        self._entries.pop(key, None)
+        keys = self._keys_by_uid.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_uid[key[0]]
+
+    def _purge(self, now: float):
+        """Loại entry hết hạn ở đầu và entry cũ nhất khi vượt giới hạn (gọi khi đang giữ lock)"""
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at <= now:
+                self._remove(key)
+                self.expired += 1
+            elif len(self._entries) > self.max_entries:
+                self._remove(key)
+                self.evicted += 1
+            else:
+                break
+
+    def get(self, uid: str, direction: str, reader: str) -> Optional[Dict[str, Any]]:
+        """
+        Lấy kết quả đã cache cho lượt quẹt lặp lại
+
+        Returns:
+            Result dict của lần quẹt trước, hoặc None nếu không có / đã hết hạn
+        """
+        if not self.enabled:
+            return None
+
+        key = (uid, direction, reader)
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(key)
+                    self.expired += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            decision = entry[1].get("decision", "unknown")
+            self.suppressed_by_decision[decision] = self.suppressed_by_decision.get(decision, 0) + 1
+            return entry[1]
+
+    def put(self, uid: str, direction: str, reader: str, result: Dict[str, Any]):
+        """Cache kết quả quẹt thẻ trong ttl_seconds"""
+        if not self.enabled or result.get("decision") in NON_CACHEABLE_DECISIONS:
+            return
+
+        key = (uid, direction, reader)
+        now = monotonic()
+        with self._lock:
+            # Ghi lại key cũ -> đưa về cuối để giữ thứ tự theo thời điểm hết hạn
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl_seconds, result)
+            self._keys_by_uid.setdefault(uid, set()).add(key)
+            self._purge(now)
+
+    def invalidate(self, uid: str):
+        """Xóa mọi entry của thẻ (khi thẻ được tạo/xóa/đổi trạng thái ngoài luồng quẹt)"""
+        with self._lock:
+            for key in list(self._keys_by_uid.get(uid, ())):
+                self._remove(key)
+                self.invalidated += 1
+
+    def clear(self):
+        """Xóa toàn bộ cache và bộ đếm"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_uid.clear()
+            self._reset_counters()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Bộ đếm cho /api/cards/scan/metrics"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "suppressed": self.hits,
+                "suppressed_by_decision": dict(self.suppressed_by_decision),
+                "misses": self.misses,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "invalidated": self.invalidated
+            }
+
+
+# Global instance - dùng chung cho HTTP scan, scan lite và TCP/UDP ingest
+scan_debouncer = ScanDebouncer()
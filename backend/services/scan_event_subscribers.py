@@ -0,0 +1,85 @@
+"""
+Scan Event Subscribers - Side effect của lượt quẹt thẻ, chạy qua event bus
+
+Trước đây chạy đồng bộ trong request /api/cards/scan; nay là subscriber async
+(queue riêng + thread pool) nên response trả về ngay sau khi cập nhật cards.json:
+- scan.json_log:      card_logs.json (entry / exit)
+- scan.db_log:        bảng card_logs trong database
+- scan.db_card:       trạng thái thẻ trong bảng cards
+- scan.unknown_log:   log thẻ lạ (JSON + database)
+- scan.unknown_store: danh sách thẻ lạ (unknown_cards.json)
+
+Thêm consumer mới: event_bus.subscribe(...) ở đây hoặc ở module khác, không cần sửa endpoint.
+"""
+import logging
+
+from services.event_bus import EventBus, CardMoved, CardEntered, UnknownCardSeen
+
+logger = logging.getLogger(__name__)
+
+
+def _log_details(event: CardMoved):
+    return {
+        "timestamp": event.timestamp,
+        "direction": event.direction,
+        "source": event.source
+    }
+
+
+def write_json_log(event: CardMoved):
+    """Ghi entry/exit vào card_logs.json"""
+    from api.cards import card_service
+
+    if isinstance(event, CardEntered):
+        card_service.log_service.log_card_entry(event.card_id, _log_details(event))
+    else:
+        card_service.log_service.log_card_exit(event.card_id, _log_details(event))
+
+
+def write_db_log(event: CardMoved):
+    """Ghi entry/exit vào bảng card_logs"""
+    from api.cards import save_log_to_database
+
+    action = "entry" if isinstance(event, CardEntered) else "exit"
+    # Hàm ghi database tự nuốt exception -> báo lỗi cho event bus (đếm failures / retry)
+    if not save_log_to_database(event.card_id, action, {
+        "direction": event.direction,
+        "source": event.source
+    }):
+        raise RuntimeError(f"Failed to write {action} log of {event.card_id} to database")
+
+
+def write_db_card(event: CardMoved):
+    """Cập nhật trạng thái thẻ trong bảng cards"""
+    from api.cards import save_card_to_database
+
+    status = 1 if isinstance(event, CardEntered) else 0
+    if not save_card_to_database(event.card_id, event.card_name or event.card_id, status):
+        raise RuntimeError(f"Failed to write card {event.card_id} to database")
+
+
+def log_unknown_card(event: UnknownCardSeen):
+    """Log thẻ lạ vào card_logs.json và database"""
+    from api.cards import card_service, save_log_to_database
+
+    card_service.log_service.log_unknown_card(event.card_id, "uno_r4")
+    if not save_log_to_database(event.card_id, "unknown", {"source": event.source}):
+        raise RuntimeError(f"Failed to write unknown card log of {event.card_id} to database")
+
+
+def store_unknown_card(event: UnknownCardSeen):
+    """Thêm / cập nhật thẻ lạ trong unknown_cards.json"""
+    from api.cards import card_service
+
+    success, message = card_service.add_unknown_card(event.card_id)
+    if not success:
+        raise RuntimeError(message)
+
+
+def register_scan_subscribers(bus: EventBus):
+    """Đăng ký các subscriber mặc định (gọi lại nhiều lần vẫn an toàn - cùng tên sẽ thay thế)"""
+    bus.subscribe(CardMoved, write_json_log, mode="async", name="scan.json_log")
+    bus.subscribe(CardMoved, write_db_log, mode="async", name="scan.db_log")
+    bus.subscribe(CardMoved, write_db_card, mode="async", name="scan.db_card")
+    bus.subscribe(UnknownCardSeen, log_unknown_card, mode="async", name="scan.unknown_log")
+    bus.subscribe(UnknownCardSeen, store_unknown_card, mode="async", name="scan.unknown_store")
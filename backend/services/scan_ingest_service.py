@@ -0,0 +1,236 @@
+"""
+Scan Ingest Service - Nhận lượt quẹt thẻ qua TCP/UDP (asyncio), chạy song song với Flask
+
+Chức năng chính:
+- Lắng nghe TCP và/hoặc UDP trên SCAN_INGEST_PORT
+- Giao thức theo dòng: "<UID> [IN|OUT]\\n" -> "<DECISION> <REASON>\\n"
+  (cùng mã kết quả với /api/cards/scan/lite), "PING" -> "PONG"
+- TCP giữ kết nối: 1 kết nối gửi được nhiều dòng, không phải bắt tay lại mỗi lượt quẹt
+- Gọi chung logic process_card_scan với HTTP, chạy trong app context của Flask
+- Event loop chạy trong background thread của chính process Flask
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+from typing import Optional, Dict, Any
+
+from config.config import (
+    SCAN_INGEST_HOST, SCAN_INGEST_PORT, SCAN_INGEST_PROTOCOL, SCAN_INGEST_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+# Độ dài tối đa 1 dòng lệnh (UID + direction), tránh client gửi rác
+MAX_LINE_LENGTH = 128
+
+
+class _UdpScanProtocol(asyncio.DatagramProtocol):
+    """Mỗi datagram là 1 lệnh, trả lời bằng 1 datagram về địa chỉ gửi"""
+
+    def __init__(self, server: "ScanIngestServer"):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.server.stats["udp_requests"] += 1
+        asyncio.ensure_future(self._reply(data, addr))
+
+    async def _reply(self, data: bytes, addr):
+        reply = await self.server.handle_line(data[:MAX_LINE_LENGTH].decode('ascii', errors='ignore'), addr[0])
+        if self.transport is not None:
+            self.transport.sendto((reply + "\n").encode('ascii'), addr)
+
+
+class ScanIngestServer:
+    """
+    Server asyncio nhận lệnh quẹt thẻ dạng text theo dòng
+
+    Business logic (đọc/ghi JSON, database) là blocking nên được chạy trong
+    ThreadPoolExecutor với Flask app context; mặc định 1 worker để các lượt
+    quẹt được xử lý tuần tự giống thứ tự đến.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._servers = []
+        self._ready = threading.Event()
+        self.stats: Dict[str, int] = {
+            "tcp_connections": 0,
+            "tcp_requests": 0,
+            "udp_requests": 0,
+            "errors": 0
+        }
+
+    def init_app(self, app):
+        """Gắn Flask app để xử lý scan trong app context"""
+        self.app = app
+
+    def _process_scan(self, uid: str, direction: str, reader: str) -> str:
+        """Chạy process_card_scan (blocking) và trả về "<DECISION> <REASON>" """
+        from api.cards import process_card_scan
+        from utils.latency import scan_latency
+
+        started = perf_counter_ns()
+        try:
+            with self.app.app_context():
+                result = process_card_scan(uid, direction, reader=reader)
+            return f"{result['decision'].upper()} {result['reason']}"
+        finally:
+            scan_latency.record("total_ingest", perf_counter_ns() - started)
+
+    async def handle_line(self, line: str, reader: str = '') -> str:
+        """
+        Xử lý 1 dòng lệnh
+
+        Args:
+            line: "<UID> [IN|OUT]" hoặc "PING"
+            reader: Địa chỉ IP của thiết bị gửi (key debounce)
+
+        Returns:
+            Dòng trả lời (không có newline)
+        """
+        from api.cards import SCAN_REASON_BAD_REQUEST, SCAN_REASON_ERROR
+
+        parts = line.replace(',', ' ').split()
+        if not parts:
+            return f"DENY {SCAN_REASON_BAD_REQUEST}"
+        if parts[0].upper() == "PING":
+            return "PONG"
+
+        uid = parts[0]
+        direction = parts[1].upper() if len(parts) > 1 else ''
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._process_scan, uid, direction, reader
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Scan ingest: error processing {uid}: {e}")
+            return f"ERROR {SCAN_REASON_ERROR}"
+
+    async def _handle_tcp_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """1 kết nối TCP: đọc từng dòng, trả lời ngay trên cùng kết nối"""
+        self.stats["tcp_connections"] += 1
+        peer = writer.get_extra_info('peername')
+        reader_id = peer[0] if peer else ''
+        try:
+            while True:
+                try:
+                    raw = await reader.readline()
+                except ValueError:
+                    # Dòng dài hơn giới hạn buffer -> đóng kết nối
+                    break
+                if not raw:
+                    break
+                self.stats["tcp_requests"] += 1
+                reply = await self.handle_line(raw[:MAX_LINE_LENGTH].decode('ascii', errors='ignore'), reader_id)
+                writer.write((reply + "\n").encode('ascii'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _start_listeners(self, host: str, port: int, protocol: str):
+        """Mở listener TCP và/hoặc UDP"""
+        if protocol in ("tcp", "both"):
+            server = await asyncio.start_server(self._handle_tcp_client, host, port, limit=1024)
+            self._servers.append(server)
+            logger.info(f"Scan ingest TCP listening on {host}:{port}")
+
+        if protocol in ("udp", "both"):
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: _UdpScanProtocol(self), local_addr=(host, port)
+            )
+            self._servers.append(transport)
+            logger.info(f"Scan ingest UDP listening on {host}:{port}")
+
+    def _run_loop(self, host: str, port: int, protocol: str):
+        """Thread chạy event loop"""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._start_listeners(host, port, protocol))
+        except OSError as e:
+            logger.error(f"Scan ingest: cannot bind {host}:{port} ({protocol}): {e}")
+            self._ready.set()
+            return
+        # Báo sẵn sàng khi loop đã thực sự chạy
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+        # Dọn dẹp khi loop dừng
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        self.loop.close()
+
+    def start(self, host: str = SCAN_INGEST_HOST, port: int = SCAN_INGEST_PORT,
+              protocol: str = SCAN_INGEST_PROTOCOL) -> bool:
+        """
+        Khởi động listener trong background thread
+
+        Args:
+            host: Địa chỉ bind
+            port: Cổng TCP/UDP
+            protocol: "tcp", "udp" hoặc "both"
+
+        Returns:
+            True nếu listener đang chạy
+        """
+        if self.app is None:
+            logger.warning("Scan ingest not started - no Flask app attached")
+            return False
+        if self.is_running():
+            logger.warning("Scan ingest already running")
+            return True
+
+        protocol = protocol.lower()
+        if protocol not in ("tcp", "udp", "both"):
+            logger.error(f"Scan ingest: invalid protocol {protocol}")
+            return False
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, SCAN_INGEST_WORKERS),
+                                           thread_name_prefix="scan-ingest")
+        self.loop = asyncio.new_event_loop()
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._run_loop, args=(host, port, protocol), daemon=True)
+        self.thread.start()
+        self._ready.wait(timeout=5)
+        return self.is_running()
+
+    def stop(self):
+        """Dừng listener"""
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.thread = None
+        logger.info("Scan ingest stopped")
+
+    def is_running(self) -> bool:
+        return (self.thread is not None and self.thread.is_alive()
+                and self.loop is not None and self.loop.is_running())
+
+    def get_status(self) -> Dict[str, Any]:
+        """Trạng thái listener cho monitoring"""
+        return {
+            "running": self.is_running(),
+            "host": SCAN_INGEST_HOST,
+            "port": SCAN_INGEST_PORT,
+            "protocol": SCAN_INGEST_PROTOCOL,
+            **self.stats
+        }
+
+
+# Global instance
+scan_ingest_server = ScanIngestServer()
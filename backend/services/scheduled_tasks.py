@@ -5,7 +5,10 @@ Chức năng chính:
 - Tự động backup dữ liệu mỗi giờ
 - Cleanup log cũ và temporary files
 - Health check ESP32 connection
-- Database maintenance tasks
+- Database maintenance tasks (retention log theo partition tháng, ANALYZE/vacuum SQLite)
+- Đối soát thẻ giữa cards.json và database
+- Self-check bộ đếm occupancy
+- Lưu time series cảm biến slot (bucket 1 phút / 1 giờ)
 - Performance monitoring
 - Error recovery và retry logic
 """
@@ -17,7 +20,15 @@ from typing import Optional
 
 from services.backup_service import BackupService
 from services.card_log_service import CardLogService
-from services.esp32_service import ESP32Service
+from services.esp32_poller import esp32_poller
+from services.db_maintenance_service import db_maintenance_service
+from services.card_reconciliation_service import card_reconciliation_service
+from services.occupancy_counter import occupancy_counter
+from services.slot_history_service import slot_history
+from services.slot_analytics_service import slot_analytics
+from config.config import (
+    DB_MAINTENANCE_INTERVAL, RECONCILE_INTERVAL, OCCUPANCY_CHECK_INTERVAL, SLOT_HISTORY_PERSIST_INTERVAL
+)
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +47,11 @@ class ScheduledTasks:
         """Khởi tạo scheduled tasks với các service dependencies"""
         self.backup_service = BackupService()
         self.log_service = CardLogService()
-        self.esp32_service = ESP32Service()
+        self.db_maintenance_service = db_maintenance_service
+        self.reconciliation_service = card_reconciliation_service
+        
+        # Flask app (cần app context cho các task truy cập database)
+        self.app = None
         
         # Quản lý thread
         self.scheduler_thread: Optional[threading.Thread] = None
@@ -46,14 +61,28 @@ class ScheduledTasks:
         self.backup_interval = 3600  # 1 giờ = 3600 giây
         self.cleanup_interval = 86400  # 1 ngày = 86400 giây  
         self.esp32_poll_interval = 1800  # 30 phút = 1800 giây
+        self.log_retention_interval = 86400  # 1 ngày = 86400 giây
+        self.db_maintenance_interval = DB_MAINTENANCE_INTERVAL  # Chỉ chạy trong khung giờ thấp điểm
+        self.reconcile_interval = RECONCILE_INTERVAL  # 1 giờ = 3600 giây
+        self.occupancy_check_interval = OCCUPANCY_CHECK_INTERVAL  # 10 phút = 600 giây
+        self.slot_history_persist_interval = SLOT_HISTORY_PERSIST_INTERVAL  # 5 phút = 300 giây
         
         # Timestamp lần chạy cuối của mỗi task
         self.last_backup_time = 0
         self.last_cleanup_time = 0
         self.last_esp32_poll_time = 0
+        self.last_log_retention_time = 0
+        self.last_db_maintenance_time = 0
+        self.last_reconcile_time = 0
+        self.last_occupancy_check_time = 0
+        self.last_slot_history_persist_time = 0
         
         logger.info("ScheduledTasks initialized")
     
+    def init_app(self, app):
+        """Gắn Flask app để các task database chạy trong app context"""
+        self.app = app
+    
     def start_scheduler(self):
         """Khởi động background scheduler thread"""
         if self.scheduler_thread and self.scheduler_thread.is_alive():
@@ -96,6 +125,32 @@ class ScheduledTasks:
                     self._run_daily_cleanup()
                     self.last_cleanup_time = current_time
                 
+                # Check if it's time for log partition retention
+                if current_time - self.last_log_retention_time >= self.log_retention_interval:
+                    self._run_log_retention()
+                    self.last_log_retention_time = current_time
+                
+                # Check if it's time for SQLite maintenance (off-peak only)
+                if (current_time - self.last_db_maintenance_time >= self.db_maintenance_interval
+                        and self.db_maintenance_service.is_off_peak()):
+                    self._run_db_maintenance()
+                    self.last_db_maintenance_time = current_time
+                
+                # Check if it's time for JSON <-> database card reconciliation
+                if current_time - self.last_reconcile_time >= self.reconcile_interval:
+                    self._run_card_reconciliation()
+                    self.last_reconcile_time = current_time
+                
+                # Check if it's time for occupancy counter self-check
+                if current_time - self.last_occupancy_check_time >= self.occupancy_check_interval:
+                    self._run_occupancy_check()
+                    self.last_occupancy_check_time = current_time
+                
+                # Check if it's time to persist slot sensor history
+                if current_time - self.last_slot_history_persist_time >= self.slot_history_persist_interval:
+                    self._run_slot_history_persist()
+                    self.last_slot_history_persist_time = current_time
+                
                 # Sleep for 60 seconds before next check
                 if not self.stop_scheduler.wait(60):
                     continue  # Continue loop if not stopped
@@ -126,10 +181,15 @@ class ScheduledTasks:
     def _run_esp32_polling(self):
         """Run ESP32 sensor data polling (every 30 minutes)"""
         try:
+            # Poller nền đã đọc ESP32 mỗi ESP32_POLL_INTERVAL giây - không đọc trùng
+            if esp32_poller.is_running():
+                logger.debug("ESP32 polling task skipped: background poller is running")
+                return
+            
             logger.info("Running ESP32 polling task (30-minute interval)")
             
-            # Poll ESP32 for current sensor data using correct method
-            success, raw_data, slots_data = self.esp32_service.get_parking_slots()
+            # Dùng chung ESP32Service (và SlotDetector) của poller: không phát lại SlotChanged trùng
+            success, raw_data, slots_data = esp32_poller.service.get_parking_slots()
             
             if success and slots_data:
                 logger.info(f"ESP32 polling successful: {slots_data.total_sensors} sensors, "
@@ -161,6 +221,82 @@ class ScheduledTasks:
         except Exception as e:
             logger.error(f"Daily cleanup task error: {e}")
     
+    def _run_log_retention(self):
+        """Xóa các partition log (card_logs_YYYYMM) quá hạn retention"""
+        if self.app is None:
+            logger.debug("Log retention skipped - no Flask app attached")
+            return
+        
+        try:
+            from services.log_partition_service import log_partition_router
+            
+            logger.info("Running log partition retention task")
+            
+            with self.app.app_context():
+                dropped = log_partition_router.apply_retention()
+            
+            if dropped:
+                logger.info(f"Log retention dropped {len(dropped)} partitions: {', '.join(dropped)}")
+            else:
+                logger.info("Log retention: no expired partitions")
+                
+        except Exception as e:
+            logger.error(f"Log retention task error: {e}")
+    
+    def _run_db_maintenance(self):
+        """Chạy ANALYZE/optimize, incremental vacuum và quick_check cho SQLite"""
+        if self.app is None:
+            logger.debug("Database maintenance skipped - no Flask app attached")
+            return
+        
+        try:
+            logger.info("Running database maintenance task")
+            
+            with self.app.app_context():
+                success, run = self.db_maintenance_service.run_maintenance()
+            
+            if not success:
+                logger.warning(f"Database maintenance failed: {run.get('error', 'Unknown error')}")
+                
+        except Exception as e:
+            logger.error(f"Database maintenance task error: {e}")
+    
+    def _run_card_reconciliation(self):
+        """Đối soát cards.json với bảng cards và sửa database nếu lệch"""
+        if self.app is None:
+            logger.debug("Card reconciliation skipped - no Flask app attached")
+            return
+        
+        try:
+            logger.info("Running card reconciliation task")
+            
+            with self.app.app_context():
+                success, report = self.reconciliation_service.reconcile(repair=True)
+            
+            if not success:
+                logger.warning(f"Card reconciliation failed: {report.get('error', 'Unknown error')}")
+                
+        except Exception as e:
+            logger.error(f"Card reconciliation task error: {e}")
+    
+    def _run_occupancy_check(self):
+        """So sánh bộ đếm occupancy với số đếm lại từ cards.json"""
+        try:
+            result = occupancy_counter.self_check()
+            if not result["drift"]:
+                logger.debug(f"Occupancy counter OK: {result['actual_inside']}/{result['actual_total']}")
+        except Exception as e:
+            logger.error(f"Occupancy check task error: {e}")
+    
+    def _run_slot_history_persist(self):
+        """Lưu bucket 1 phút / 1 giờ của time series slot ra file, chốt analytics các ngày đã kết thúc"""
+        try:
+            if not slot_history.persist():
+                logger.warning("Slot history persist failed")
+            slot_analytics.refresh_closed_days()
+        except Exception as e:
+            logger.error(f"Slot history persist task error: {e}")
+    
     def force_backup_now(self) -> tuple[bool, str]:
         """
         Force immediate backup (manual trigger)
@@ -189,6 +325,11 @@ class ScheduledTasks:
         next_backup = self.last_backup_time + self.backup_interval
         next_cleanup = self.last_cleanup_time + self.cleanup_interval
         next_esp32_poll = self.last_esp32_poll_time + self.esp32_poll_interval
+        next_log_retention = self.last_log_retention_time + self.log_retention_interval
+        next_db_maintenance = self.last_db_maintenance_time + self.db_maintenance_interval
+        next_reconcile = self.last_reconcile_time + self.reconcile_interval
+        next_occupancy_check = self.last_occupancy_check_time + self.occupancy_check_interval
+        next_slot_history_persist = self.last_slot_history_persist_time + self.slot_history_persist_interval
         
         status = {
             "scheduler_running": (
@@ -213,6 +354,37 @@ class ScheduledTasks:
                 "last_run": datetime.fromtimestamp(self.last_cleanup_time).isoformat() if self.last_cleanup_time > 0 else None,
                 "next_run": datetime.fromtimestamp(next_cleanup).isoformat() if self.last_cleanup_time > 0 else "Soon",
                 "seconds_until_next": max(0, next_cleanup - current_time) if self.last_cleanup_time > 0 else 0
+            },
+            "log_retention": {
+                "interval_hours": self.log_retention_interval / 3600,
+                "last_run": datetime.fromtimestamp(self.last_log_retention_time).isoformat() if self.last_log_retention_time > 0 else None,
+                "next_run": datetime.fromtimestamp(next_log_retention).isoformat() if self.last_log_retention_time > 0 else "Soon",
+                "seconds_until_next": max(0, next_log_retention - current_time) if self.last_log_retention_time > 0 else 0
+            },
+            "db_maintenance": {
+                "interval_hours": self.db_maintenance_interval / 3600,
+                "last_run": datetime.fromtimestamp(self.last_db_maintenance_time).isoformat() if self.last_db_maintenance_time > 0 else None,
+                "next_run": datetime.fromtimestamp(next_db_maintenance).isoformat() if self.last_db_maintenance_time > 0 else "Next off-peak window",
+                "seconds_until_next": max(0, next_db_maintenance - current_time) if self.last_db_maintenance_time > 0 else 0
+            },
+            "card_reconciliation": {
+                "interval_minutes": self.reconcile_interval / 60,
+                "last_run": datetime.fromtimestamp(self.last_reconcile_time).isoformat() if self.last_reconcile_time > 0 else None,
+                "next_run": datetime.fromtimestamp(next_reconcile).isoformat() if self.last_reconcile_time > 0 else "Soon",
+                "seconds_until_next": max(0, next_reconcile - current_time) if self.last_reconcile_time > 0 else 0
+            },
+            "occupancy_check": {
+                "interval_minutes": self.occupancy_check_interval / 60,
+                "last_run": datetime.fromtimestamp(self.last_occupancy_check_time).isoformat() if self.last_occupancy_check_time > 0 else None,
+                "next_run": datetime.fromtimestamp(next_occupancy_check).isoformat() if self.last_occupancy_check_time > 0 else "Soon",
+                "seconds_until_next": max(0, next_occupancy_check - current_time) if self.last_occupancy_check_time > 0 else 0,
+                "drift_count": occupancy_counter.drift_count
+            },
+            "slot_history_persist": {
+                "interval_minutes": self.slot_history_persist_interval / 60,
+                "last_run": datetime.fromtimestamp(self.last_slot_history_persist_time).isoformat() if self.last_slot_history_persist_time > 0 else None,
+                "next_run": datetime.fromtimestamp(next_slot_history_persist).isoformat() if self.last_slot_history_persist_time > 0 else "Soon",
+                "seconds_until_next": max(0, next_slot_history_persist - current_time) if self.last_slot_history_persist_time > 0 else 0
             }
         }
         
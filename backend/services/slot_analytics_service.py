@@ -0,0 +1,226 @@
+"""
+Slot Analytics Service - Tỉ lệ sử dụng, thời gian đỗ trung bình, turnover và đỉnh lấp đầy theo slot
+
+Chức năng chính:
+- Tính từ time series của slot_history (bucket 1m / 1h) bằng phép toán theo cột
+  (slice array + sum/map), không dựng dict cho từng mẫu
+- Cửa sổ bất kỳ được chia theo ngày (giờ máy chủ); số liệu mỗi ngày cộng dồn được
+  (samples, occupied, arrivals, occupied_seconds, observed_seconds) nên ghép nhiều ngày chỉ là phép cộng
+- Ngày đã kết thúc được cache vào slot_analytics.json: truy vấn nhiều tháng chỉ đọc cache,
+  và vẫn trả lời được khi bucket 1h (30 ngày) đã bị ghi đè
+- refresh_closed_days() chạy định kỳ (ScheduledTasks) để chốt ngày trước khi dữ liệu rời ring
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.slot_history_service import SlotHistoryService, slot_history
+from config.config import SLOT_ANALYTICS_CACHE_FILE, SLOT_ANALYTICS_CACHE_DAYS, SLOT_HISTORY_HOUR_CAPACITY
+from utils.file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+ADDITIVE_FIELDS = ("samples", "occupied", "arrivals", "occupied_seconds", "observed_seconds")
+
+# Tăng khi cách tính số liệu ngày thay đổi: cache phiên bản cũ bị bỏ và tính lại từ bucket
+CACHE_VERSION = 2
+
+
+def _day_start(day: date) -> float:
+    """Epoch giây của 00:00 ngày `day` theo giờ máy chủ"""
+    return datetime(day.year, day.month, day.day).timestamp()
+
+
+class SlotAnalyticsService:
+    """Analytics trên lịch sử slot, cache theo ngày đã kết thúc"""
+
+    def __init__(self, history: Optional[SlotHistoryService] = None, cache_file=SLOT_ANALYTICS_CACHE_FILE,
+                 cache_days: int = SLOT_ANALYTICS_CACHE_DAYS):
+        self.history = history or slot_history
+        self.cache_file = str(cache_file)
+        self.cache_days = cache_days
+        self.file_manager = FileManager()
+        self._days: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.stats = {
+            "queries": 0,
+            "cache_hits": 0,
+            "days_computed": 0,
+            "last_query_ms": None
+        }
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.file_manager.file_exists(self.cache_file):
+            return
+        success, data = self.file_manager.read_json(self.cache_file, default_value={})
+        if success and isinstance(data, dict):
+            if data.get("version") != CACHE_VERSION:
+                logger.info(f"Slot analytics: discarding cache version {data.get('version')}")
+                return
+            self._days = data.get("days", {})
+
+    def _save(self):
+        cutoff = (date.today() - timedelta(days=self.cache_days)).isoformat()
+        with self._lock:
+            self._days = {day: value for day, value in self._days.items() if day >= cutoff}
+            data = {"version": CACHE_VERSION, "saved_at": time.time(), "days": self._days}
+        success, message = self.file_manager.write_json(self.cache_file, data, create_backup=False)
+        if not success:
+            logger.error(f"Slot analytics: failed to save cache: {message}")
+
+    def _aggregate(self, start: float, end: float) -> Dict[str, Any]:
+        """Số liệu 1 đoạn thời gian; key slot là str để giống dữ liệu đọc từ cache JSON"""
+        result = self.history.aggregate(start, end)
+        result["slots"] = {str(slot_id): values for slot_id, values in result["slots"].items()}
+        return result
+
+    def _closed_day(self, day: date) -> Tuple[Dict[str, Any], bool]:
+        """
+        Số liệu 1 ngày đã kết thúc: từ cache, hoặc tính rồi cache (ngày có dữ liệu)
+
+        Returns:
+            Tuple of (số liệu, True nếu lấy từ cache)
+        """
+        key = day.isoformat()
+        with self._lock:
+            self._ensure_loaded()
+            cached = self._days.get(key)
+        if cached is not None:
+            return cached, True
+
+        result = self._aggregate(_day_start(day), _day_start(day + timedelta(days=1)))
+        self.stats["days_computed"] += 1
+        if result["slots"]:
+            with self._lock:
+                self._days[key] = result
+        return result, False
+
+    def refresh_closed_days(self) -> int:
+        """
+        Chốt các ngày đã kết thúc còn nằm trong bucket 1h nhưng chưa có trong cache
+
+        Returns:
+            Số ngày mới được cache
+        """
+        today = date.today()
+        with self._lock:
+            self._ensure_loaded()
+            cached_days = set(self._days)
+        added = 0
+        for offset in range(1, SLOT_HISTORY_HOUR_CAPACITY // 24 + 1):
+            day = today - timedelta(days=offset)
+            if day.isoformat() in cached_days:
+                continue
+            result, _ = self._closed_day(day)
+            added += 1 if result["slots"] else 0
+        if added:
+            self._save()
+            logger.info(f"Slot analytics: cached {added} closed days")
+        return added
+
+    def compute(self, start: float, end: float) -> Dict[str, Any]:
+        """
+        Analytics cho cửa sổ [start, end) (epoch giây)
+
+        Ngày nằm trọn trong cửa sổ và đã kết thúc lấy từ cache; phần ngày lẻ ở 2 đầu
+        và ngày hôm nay tính trực tiếp từ slot_history.
+        """
+        started = time.perf_counter()
+        now = time.time()
+        segments: List[Tuple[str, float, Dict[str, Any], bool]] = []
+        computed_closed = False
+
+        day = datetime.fromtimestamp(start).date()
+        while _day_start(day) < end:
+            day_start, day_end = _day_start(day), _day_start(day + timedelta(days=1))
+            segment_start, segment_end = max(start, day_start), min(end, day_end)
+            if segment_start >= now:
+                break
+            if segment_start == day_start and segment_end == day_end and day_end <= now:
+                result, cached = self._closed_day(day)
+                computed_closed |= not cached and bool(result["slots"])
+                self.stats["cache_hits"] += 1 if cached else 0
+            else:
+                result, cached = self._aggregate(segment_start, min(segment_end, now)), False
+            segments.append((day.isoformat(), (min(segment_end, now) - segment_start) / 86400, result, cached))
+            day += timedelta(days=1)
+
+        if computed_closed:
+            self._save()
+
+        totals: Dict[str, Dict[str, float]] = {}
+        peak, peak_at = None, None
+        daily = []
+        for day_key, segment_days, result, cached in segments:
+            day_totals = dict.fromkeys(ADDITIVE_FIELDS, 0)
+            for slot_id, values in result["slots"].items():
+                slot_totals = totals.setdefault(slot_id, dict.fromkeys(ADDITIVE_FIELDS, 0))
+                for name in ADDITIVE_FIELDS:
+                    slot_totals[name] += values[name]
+                    day_totals[name] += values[name]
+            if result["peak_occupied"] is not None and (peak is None or result["peak_occupied"] > peak):
+                peak, peak_at = result["peak_occupied"], result["peak_at"]
+            daily.append(dict(self._metrics(day_totals, segment_days, len(result["slots"])),
+                              date=day_key, resolution=result["resolution"], cached=cached,
+                              peak_occupied=result["peak_occupied"],
+                              peak_at=datetime.fromtimestamp(result["peak_at"]).isoformat()
+                              if result["peak_at"] is not None else None))
+
+        days = max((min(end, now) - start) / 86400, 1 / 24)
+        overall = dict.fromkeys(ADDITIVE_FIELDS, 0)
+        for slot_totals in totals.values():
+            for name in ADDITIVE_FIELDS:
+                overall[name] += slot_totals[name]
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.stats["queries"] += 1
+        self.stats["last_query_ms"] = elapsed_ms
+        return {
+            "from": datetime.fromtimestamp(start).isoformat(),
+            "to": datetime.fromtimestamp(end).isoformat(),
+            "days": round(days, 2),
+            "summary": dict(
+                self._metrics(overall, days, len(totals)),
+                slots=len(totals),
+                peak_occupied=peak,
+                peak_rate=round(peak / len(totals) * 100, 1) if peak is not None and totals else None,
+                peak_at=datetime.fromtimestamp(peak_at).isoformat() if peak_at is not None else None
+            ),
+            "slots": {slot_id: self._metrics(values, days, 1)
+                      for slot_id, values in sorted(totals.items(), key=lambda item: int(item[0]))},
+            "daily": daily,
+            "cached_days": sum(1 for _, _, _, cached in segments if cached),
+            "compute_ms": elapsed_ms
+        }
+
+    @staticmethod
+    def _metrics(values: Dict[str, float], days: float, slot_count: int) -> Dict[str, Any]:
+        """
+        utilization: % thời gian có xe trên thời gian đã biết trạng thái (giữ trạng thái cuối qua khoảng không có mẫu)
+        avg_dwell_minutes: thời gian có xe / số lượt xe vào
+        turnover_per_day: lượt xe vào mỗi slot mỗi ngày
+        """
+        observed = values["observed_seconds"]
+        arrivals = values["arrivals"]
+        return {
+            "utilization": round(values["occupied_seconds"] / observed * 100, 1) if observed else None,
+            "avg_dwell_minutes": round(values["occupied_seconds"] / arrivals / 60, 1) if arrivals else None,
+            "turnover_per_day": round(arrivals / days / slot_count, 2) if slot_count else None,
+            "arrivals": arrivals,
+            "observed_hours": round(observed / 3600, 2)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached_days = len(self._days)
+        return dict(self.stats, cached_days=cached_days, cache_retention_days=self.cache_days)
+
+
+# Global instance - dùng cho /api/parking-slots/analytics và ScheduledTasks
+slot_analytics = SlotAnalyticsService()
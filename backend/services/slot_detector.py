@@ -0,0 +1,135 @@
+"""
+Slot Detector - Hysteresis + debounce N mẫu cho trạng thái slot
+
+Chức năng chính:
+- Nhận distance thô (cm) hoặc status 0/1 đã ngưỡng hóa bởi firmware
+- Ngưỡng riêng từng slot (SLOT_CALIBRATION), hysteresis: có xe khi distance <= occupied_below,
+  trống khi distance >= vacant_above, ở giữa giữ nguyên trạng thái hiện tại
+- Debounce: trạng thái mới phải lặp lại N mẫu liên tiếp mới được xác nhận
+- Chỉ trả về transition thật sự -> event / ghi database chỉ khi slot đổi trạng thái,
+  kèm last_changed của từng slot
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from config.config import SLOT_OCCUPIED_BELOW_CM, SLOT_HYSTERESIS_CM, SLOT_DEBOUNCE_SAMPLES, SLOT_CALIBRATION
+
+
+class _SlotState:
+    __slots__ = ("status", "candidate", "candidate_count", "last_changed", "distance")
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.candidate: Optional[int] = None
+        self.candidate_count = 0
+        self.last_changed: Optional[str] = None
+        self.distance: Optional[float] = None
+
+
+class SlotDetector:
+    """
+    Bộ phát hiện trạng thái cho các slot của 1 board
+
+    Slot trong detector là slot của board (1..N); ngưỡng tra theo slot toàn cục (slot_offset + slot_id).
+    """
+
+    def __init__(self, slot_offset: int = 0, debounce_samples: int = SLOT_DEBOUNCE_SAMPLES):
+        self.slot_offset = slot_offset
+        self.debounce_samples = max(1, debounce_samples)
+        self._states: Dict[int, _SlotState] = {}
+        self._lock = threading.Lock()
+        self.transitions = 0
+        self.suppressed = 0  # mẫu khác trạng thái nhưng chưa đủ N lần (flapping bị chặn)
+
+    def thresholds(self, slot_id: int) -> Tuple[float, float]:
+        """(occupied_below, vacant_above) cm của 1 slot; vacant_above luôn lớn hơn occupied_below"""
+        calibration = SLOT_CALIBRATION.get(str(self.slot_offset + slot_id), {})
+        occupied_below = calibration.get("occupied_below", SLOT_OCCUPIED_BELOW_CM)
+        vacant_above = calibration.get("vacant_above", occupied_below + SLOT_HYSTERESIS_CM)
+        if vacant_above <= occupied_below:
+            # Calibration sai (ngưỡng trống <= ngưỡng có xe) -> dùng hysteresis mặc định
+            vacant_above = occupied_below + SLOT_HYSTERESIS_CM
+        return occupied_below, vacant_above
+
+    def observe(self, slot_id: int, status: Optional[int] = None, distance: Optional[float] = None,
+                samples_required: Optional[int] = None) -> Optional[Tuple[Optional[int], int, str]]:
+        """
+        Đưa 1 mẫu vào detector
+
+        Args:
+            slot_id: Slot của board
+            status: 0/1 do firmware báo (dùng khi không có distance)
+            distance: Khoảng cách thô (cm), ưu tiên hơn status
+            samples_required: Ghi đè N (ví dụ 1 cho reading đẩy lên theo sự kiện)
+
+        Returns:
+            (old_status, new_status, last_changed) khi trạng thái được xác nhận thay đổi, ngược lại None
+        """
+        required = self.debounce_samples if samples_required is None else max(1, samples_required)
+        with self._lock:
+            state = self._states.get(slot_id)
+            if state is None:
+                state = self._states[slot_id] = _SlotState()
+
+            if distance is not None:
+                state.distance = distance
+                occupied_below, vacant_above = self.thresholds(slot_id)
+                if distance <= occupied_below:
+                    reading = 1
+                elif distance >= vacant_above:
+                    reading = 0
+                else:
+                    reading = state.status  # vùng hysteresis: giữ trạng thái hiện tại
+            else:
+                reading = status
+
+            if reading is None:
+                return None
+
+            # Mẫu đầu tiên của slot: nhận luôn trạng thái
+            if state.status is None:
+                return self._commit(state, reading)
+
+            if reading == state.status:
+                state.candidate, state.candidate_count = None, 0
+                return None
+
+            if reading == state.candidate:
+                state.candidate_count += 1
+            else:
+                state.candidate, state.candidate_count = reading, 1
+
+            if state.candidate_count >= required:
+                return self._commit(state, reading)
+            self.suppressed += 1
+            return None
+
+    def _commit(self, state: _SlotState, status: int) -> Tuple[Optional[int], int, str]:
+        old_status = state.status
+        state.status = status
+        state.candidate, state.candidate_count = None, 0
+        state.last_changed = datetime.now(timezone.utc).isoformat()
+        self.transitions += 1
+        return old_status, status, state.last_changed
+
+    def get_state(self, slot_id: int) -> Dict[str, Any]:
+        with self._lock:
+            state = self._states.get(slot_id)
+            if state is None:
+                return {}
+            return {
+                "status": state.status,
+                "last_changed": state.last_changed,
+                "distance": state.distance,
+                "pending": state.candidate,
+                "pending_samples": state.candidate_count
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "slots": len(self._states),
+            "debounce_samples": self.debounce_samples,
+            "transitions": self.transitions,
+            "suppressed": self.suppressed
+        }
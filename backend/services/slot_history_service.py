@@ -0,0 +1,481 @@
+"""
+Slot History Service - Time series cảm biến từng slot, bộ nhớ cố định
+
+Chức năng chính:
+- Ring buffer dạng array cho mỗi slot: (ts, status, distance) mẫu thô, ghi đè mẫu cũ nhất khi đầy
+- Downsample tăng dần vào bucket 1 phút và 1 giờ (số mẫu, tỉ lệ có xe, distance min/avg/max)
+- Bucket 1 phút / 1 giờ được lưu định kỳ ra slot_history.json (ScheduledTasks) và nạp lại khi khởi động;
+  mẫu thô chỉ giữ trong bộ nhớ
+- Truy vấn theo cửa sổ thời gian (epoch ms) bằng binary search, kết quả luôn bị chặn bởi dung lượng ring
+- aggregate(): tổng hợp cửa sổ theo cột (slice array + sum/map) cho analytics (services/slot_analytics_service.py)
+
+Nguồn mẫu: snapshot của ESP32 poller (status) và batch do board đẩy lên (status + sensor_value).
+"""
+import atexit
+import logging
+import threading
+import time
+from array import array
+from operator import add
+from typing import Dict, Any, List, Optional
+
+from config.config import (
+    SLOT_HISTORY_FILE, SLOT_HISTORY_RAW_CAPACITY, SLOT_HISTORY_MINUTE_CAPACITY,
+    SLOT_HISTORY_HOUR_CAPACITY, SLOT_HISTORY_MAX_SLOTS
+)
+from utils.file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+# distance không xác định (ESP32 /data chỉ trả status)
+NO_DISTANCE = -1
+
+RESOLUTIONS = {"1m": 60, "1h": 3600}
+
+
+class _Ring:
+    """Ring buffer nhiều cột array cùng dung lượng; index logic 0 = phần tử cũ nhất"""
+
+    def __init__(self, capacity: int, columns: Dict[str, str]):
+        self.capacity = max(1, capacity)
+        self.columns = {name: array(typecode, [0]) * self.capacity for name, typecode in columns.items()}
+        self.head = 0  # vị trí ghi tiếp theo
+        self.size = 0
+
+    def _physical(self, index: int) -> int:
+        return (self.head - self.size + index) % self.capacity
+
+    def append(self, **values) -> int:
+        """Ghi 1 phần tử (ghi đè phần tử cũ nhất khi đầy), trả về vị trí vật lý"""
+        position = self.head
+        for name, column in self.columns.items():
+            column[position] = values[name]
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+        return position
+
+    def last(self) -> Optional[int]:
+        """Vị trí vật lý của phần tử mới nhất"""
+        return (self.head - 1) % self.capacity if self.size else None
+
+    def bisect_left(self, ts: float) -> int:
+        """Index logic đầu tiên có ts >= ts (cột ts tăng dần)"""
+        timestamps = self.columns["ts"]
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if timestamps[self._physical(middle)] < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def slice(self, name: str, first: int, last: int) -> array:
+        """Cột name của các index logic [first, last) - tối đa 2 lát cắt array liền nhau"""
+        column = self.columns[name]
+        if first >= last:
+            return column[:0]
+        begin = self._physical(first)
+        end = begin + (last - first)
+        if end <= self.capacity:
+            return column[begin:end]
+        return column[begin:] + column[:end - self.capacity]
+
+    def range(self, start: float, end: float):
+        """Vị trí vật lý các phần tử có start <= ts < end, theo thứ tự thời gian"""
+        first = self.bisect_left(start)
+        last = self.bisect_left(end)
+        return (self._physical(index) for index in range(first, last))
+
+    def dump(self) -> Dict[str, list]:
+        """Các phần tử hợp lệ theo thứ tự thời gian (để lưu file)"""
+        positions = [self._physical(index) for index in range(self.size)]
+        return {name: [column[position] for position in positions] for name, column in self.columns.items()}
+
+
+class _BucketSeries:
+    """Bucket downsample cố định độ rộng (60s / 3600s)"""
+
+    COLUMNS = {
+        "ts": "d",           # thời điểm bắt đầu bucket (epoch giây)
+        "samples": "I",
+        "occupied": "I",     # số mẫu có xe
+        "dist_sum": "d",
+        "dist_count": "I",
+        "dist_min": "i",
+        "dist_max": "i",
+        "status": "b",       # status mẫu cuối của bucket
+        "arrivals": "I"      # số lần slot chuyển trống -> có xe trong bucket
+    }
+
+    def __init__(self, width: int, capacity: int):
+        self.width = width
+        self.ring = _Ring(capacity, self.COLUMNS)
+
+    def add(self, ts: float, status: int, distance: int, arrival: bool = False):
+        start = ts - ts % self.width
+        ring = self.ring
+        position = ring.last()
+        columns = ring.columns
+        if position is None or columns["ts"][position] < start:
+            position = ring.append(ts=start, samples=0, occupied=0, dist_sum=0.0, dist_count=0,
+                                   dist_min=NO_DISTANCE, dist_max=NO_DISTANCE, status=status, arrivals=0)
+        elif columns["ts"][position] > start:
+            return  # mẫu cũ hơn bucket mới nhất - bỏ qua (ts luôn là thời gian server nên hiếm gặp)
+
+        columns["samples"][position] += 1
+        columns["occupied"][position] += 1 if status == 1 else 0
+        columns["status"][position] = status
+        if arrival:
+            columns["arrivals"][position] += 1
+        if distance != NO_DISTANCE:
+            columns["dist_sum"][position] += distance
+            columns["dist_count"][position] += 1
+            if columns["dist_min"][position] == NO_DISTANCE or distance < columns["dist_min"][position]:
+                columns["dist_min"][position] = distance
+            if distance > columns["dist_max"][position]:
+                columns["dist_max"][position] = distance
+
+    def query(self, start: float, end: float) -> List[Dict[str, Any]]:
+        columns = self.ring.columns
+        points = []
+        # Bucket bắt đầu trước start nhưng còn phủ start cũng được lấy
+        for position in self.ring.range(start - self.width + 1, end):
+            samples = columns["samples"][position]
+            dist_count = columns["dist_count"][position]
+            points.append({
+                "ts": int(columns["ts"][position] * 1000),
+                "samples": samples,
+                "occupancy": round(columns["occupied"][position] / samples, 3) if samples else None,
+                "status": columns["status"][position],
+                "distance_avg": round(columns["dist_sum"][position] / dist_count, 1) if dist_count else None,
+                "distance_min": columns["dist_min"][position] if dist_count else None,
+                "distance_max": columns["dist_max"][position] if dist_count else None
+            })
+        return points
+
+    def step(self, grid_start: float, end: float, cells: int):
+        """
+        Trạng thái có xe theo từng ô của lưới [grid_start, grid_start + cells * width) dạng hàm bậc thang
+
+        Ô có bucket = tỉ lệ mẫu có xe; ô không có mẫu giữ status cuối của bucket gần nhất phía trước
+        (kể cả bucket trước grid_start); trước trạng thái đầu tiên đã biết = chưa quan sát.
+
+        Returns:
+            (occupancy theo ô, index ô đầu tiên đã biết trạng thái, {samples, occupied, arrivals})
+            hoặc None nếu slot chưa có trạng thái nào trong cửa sổ
+        """
+        ring = self.ring
+        columns = ring.columns
+        first, last = ring.bisect_left(grid_start), ring.bisect_left(end)
+        carry = columns["status"][ring._physical(first - 1)] if first > 0 else None
+        if first >= last and carry is None:
+            return None
+
+        occupancy = array("d", [0.0]) * cells
+        cursor = 0
+        first_known = 0 if carry is not None else None
+        timestamps = ring.slice("ts", first, last)
+        samples = ring.slice("samples", first, last)
+        occupied = ring.slice("occupied", first, last)
+        for ts, sample_count, occupied_count, status in zip(timestamps, samples, occupied,
+                                                            ring.slice("status", first, last)):
+            index = int((ts - grid_start) // self.width)
+            if carry == 1 and index > cursor:
+                occupancy[cursor:index] = array("d", [1.0]) * (index - cursor)
+            if first_known is None:
+                first_known = index
+            occupancy[index] = occupied_count / sample_count if sample_count else float(status)
+            carry, cursor = status, index + 1
+        if carry == 1 and cursor < cells:
+            occupancy[cursor:] = array("d", [1.0]) * (cells - cursor)
+
+        return occupancy, first_known, {
+            "samples": sum(samples),
+            "occupied": sum(occupied),
+            "arrivals": sum(ring.slice("arrivals", first, last))
+        }
+
+    def load(self, data: Dict[str, list]):
+        # Cột thêm sau (arrivals) không có trong file cũ -> 0
+        length = len(data["ts"])
+        columns = [data.get(name) or [0] * length for name in self.COLUMNS]
+        for values in zip(*columns):
+            self.ring.append(**dict(zip(self.COLUMNS, values)))
+
+
+class SlotSeries:
+    """Toàn bộ lịch sử của 1 slot"""
+
+    RAW_COLUMNS = {"ts": "d", "status": "b", "distance": "i"}
+
+    def __init__(self, raw_capacity: int, minute_capacity: int, hour_capacity: int):
+        self.raw = _Ring(raw_capacity, self.RAW_COLUMNS)
+        self.buckets = {
+            "1m": _BucketSeries(RESOLUTIONS["1m"], minute_capacity),
+            "1h": _BucketSeries(RESOLUTIONS["1h"], hour_capacity)
+        }
+
+    def add(self, ts: float, status: int, distance: int):
+        last = self.raw.last()
+        if last is not None and ts < self.raw.columns["ts"][last]:
+            ts = self.raw.columns["ts"][last]  # giữ cột ts tăng dần cho binary search
+        arrival = last is not None and status == 1 and self.raw.columns["status"][last] == 0
+        self.raw.append(ts=ts, status=status, distance=distance)
+        for series in self.buckets.values():
+            series.add(ts, status, distance, arrival)
+
+    def query_raw(self, start: float, end: float) -> List[Dict[str, Any]]:
+        columns = self.raw.columns
+        return [{
+            "ts": int(columns["ts"][position] * 1000),
+            "status": columns["status"][position],
+            "distance": columns["distance"][position] if columns["distance"][position] != NO_DISTANCE else None
+        } for position in self.raw.range(start, end)]
+
+    def oldest_raw_ts(self) -> Optional[float]:
+        return self.raw.columns["ts"][self.raw._physical(0)] if self.raw.size else None
+
+    def raw_covers(self, start: float) -> bool:
+        """Ring thô có đủ dữ liệu cho cửa sổ bắt đầu từ start không"""
+        oldest_raw = self.oldest_raw_ts()
+        if oldest_raw is not None and oldest_raw <= start:
+            return True
+        # Chưa phủ start: chỉ dùng raw khi không có bucket nào cũ hơn mẫu thô đầu tiên
+        # (sau restart ring thô rỗng nhưng bucket 1m / 1h đã nạp lại từ file)
+        for series in self.buckets.values():
+            ring = series.ring
+            if not ring.size:
+                continue
+            oldest_bucket = ring.columns["ts"][ring._physical(0)]
+            if oldest_raw is None or oldest_bucket < oldest_raw - oldest_raw % series.width:
+                return False
+        return True
+
+
+class SlotHistoryService:
+    """
+    Kho time series của mọi slot
+
+    Bộ nhớ tối đa ~ max_slots x (raw + 1m + 1h capacity); slot mới vượt max_slots bị bỏ qua.
+    """
+
+    def __init__(self, file_path=SLOT_HISTORY_FILE, raw_capacity: int = SLOT_HISTORY_RAW_CAPACITY,
+                 minute_capacity: int = SLOT_HISTORY_MINUTE_CAPACITY, hour_capacity: int = SLOT_HISTORY_HOUR_CAPACITY,
+                 max_slots: int = SLOT_HISTORY_MAX_SLOTS):
+        self.file_path = str(file_path)
+        self.file_manager = FileManager()
+        self.raw_capacity = raw_capacity
+        self.minute_capacity = minute_capacity
+        self.hour_capacity = hour_capacity
+        self.max_slots = max_slots
+        self._series: Dict[int, SlotSeries] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self.samples = 0
+        self.dropped_slots = 0
+        self.last_persist: Optional[Dict[str, Any]] = None
+
+    def _ensure_loaded(self):
+        """Nạp bucket 1m / 1h đã lưu (gọi khi đang giữ lock)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.file_manager.file_exists(self.file_path):
+            return
+        success, data = self.file_manager.read_json(self.file_path, default_value={})
+        if not success or not isinstance(data, dict):
+            return
+        for slot_id, resolutions in data.get("slots", {}).items():
+            series = self._get_series(int(slot_id))
+            if series is None:
+                break
+            for resolution, columns in resolutions.items():
+                try:
+                    series.buckets[resolution].load(columns)
+                except (KeyError, TypeError, ValueError, OverflowError) as e:
+                    logger.warning(f"Slot history: skip {resolution} of slot {slot_id}: {e}")
+
+    def _get_series(self, slot_id: int) -> Optional[SlotSeries]:
+        series = self._series.get(slot_id)
+        if series is None:
+            if len(self._series) >= self.max_slots:
+                self.dropped_slots += 1
+                return None
+            series = SlotSeries(self.raw_capacity, self.minute_capacity, self.hour_capacity)
+            self._series[slot_id] = series
+        return series
+
+    def record(self, slot_id: int, status: int, distance: Optional[int] = None, ts: Optional[float] = None):
+        """Ghi 1 mẫu (ts mặc định = bây giờ, epoch giây)"""
+        self.record_many([(slot_id, status, distance)], ts)
+
+    def record_many(self, readings, ts: Optional[float] = None):
+        """
+        Ghi nhiều mẫu cùng thời điểm
+
+        Args:
+            readings: Iterable (slot_id, status, distance hoặc None)
+            ts: Epoch giây (mặc định bây giờ)
+        """
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._ensure_loaded()
+            for slot_id, status, distance in readings:
+                series = self._get_series(slot_id)
+                if series is None:
+                    continue
+                series.add(ts, status, NO_DISTANCE if distance is None else int(distance))
+                self.samples += 1
+            self._dirty = True
+
+    def record_snapshot(self, slots_data, ts: Optional[float] = None):
+        """Ghi status mọi slot của 1 ParkingSlotsData"""
+        self.record_many(((slot.slot_id, slot.status, None) for slot in slots_data.slots), ts)
+
+    def query(self, start_ms: int, end_ms: int, slot_id: Optional[int] = None,
+              resolution: str = "auto") -> Dict[str, Any]:
+        """
+        Lịch sử trong cửa sổ [start_ms, end_ms)
+
+        Args:
+            start_ms / end_ms: Epoch milliseconds
+            slot_id: 1 slot (None = mọi slot)
+            resolution: "raw", "1m", "1h" hoặc "auto" (raw nếu ring thô phủ cửa sổ, rồi 1m, rồi 1h)
+
+        Returns:
+            Dict resolution + points theo slot
+        """
+        start, end = start_ms / 1000, end_ms / 1000
+        with self._lock:
+            self._ensure_loaded()
+            slot_ids = [slot_id] if slot_id is not None else sorted(self._series)
+            series_list = [(sid, self._series[sid]) for sid in slot_ids if sid in self._series]
+
+            if resolution == "auto":
+                # raw khi ring thô phủ cả cửa sổ, hoặc không có bucket nào cũ hơn dữ liệu thô
+                if series_list and all(series.raw_covers(start) for _, series in series_list):
+                    resolution = "raw"
+                elif end - start <= self.minute_capacity * RESOLUTIONS["1m"]:
+                    resolution = "1m"
+                else:
+                    resolution = "1h"
+
+            slots = {}
+            for sid, series in series_list:
+                if resolution == "raw":
+                    slots[sid] = series.query_raw(start, end)
+                else:
+                    slots[sid] = series.buckets[resolution].query(start, end)
+
+        return {
+            "resolution": resolution,
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "slots": slots
+        }
+
+    def aggregate(self, start: float, end: float) -> Dict[str, Any]:
+        """
+        Tổng hợp cửa sổ [start, end) (epoch giây) cho analytics, tính theo cột trên bucket 1m
+        (nếu ring 1m còn phủ start) hoặc 1h
+
+        Trạng thái slot là hàm bậc thang: bucket có mẫu đóng góp tỉ lệ có xe của nó, bucket trống
+        giữ trạng thái cuối đã biết (kể cả từ bucket trước start) - kết quả không phụ thuộc tần suất lấy mẫu.
+
+        Returns:
+            Dict resolution, width, slots (số liệu cộng dồn được theo từng slot: samples, occupied,
+            arrivals, occupied_seconds, observed_seconds), peak_occupied / peak_at (số slot có xe
+            đồng thời lớn nhất và thời điểm bắt đầu bucket tương ứng)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            minute_covers = all(
+                series.buckets["1m"].ring.size < series.buckets["1m"].ring.capacity
+                or series.buckets["1m"].ring.columns["ts"][series.buckets["1m"].ring._physical(0)] <= start
+                for series in self._series.values()
+            )
+            resolution = "1m" if minute_covers else "1h"
+            width = RESOLUTIONS[resolution]
+            # Lưới bucket căn theo ranh giới bucket; ô đầu / cuối có thể chỉ nằm 1 phần trong cửa sổ
+            grid_start = start - start % width
+            cells = max(1, int(-(-(end - grid_start) // width)))
+            head_cut = start - grid_start
+            tail_cut = grid_start + cells * width - end
+            concurrent = array("d", [0.0]) * cells
+
+            slots = {}
+            for slot_id, series in self._series.items():
+                step = series.buckets[resolution].step(grid_start, end, cells)
+                if step is None:
+                    continue
+                occupancy, first_known, totals = step
+                concurrent = array("d", map(add, concurrent, occupancy))
+                occupied_seconds = (sum(occupancy) * width - occupancy[0] * head_cut
+                                    - occupancy[-1] * tail_cut)
+                slots[slot_id] = dict(
+                    totals,
+                    occupied_seconds=round(max(0.0, occupied_seconds), 1),
+                    observed_seconds=round(end - max(start, grid_start + first_known * width), 1)
+                )
+
+        peak_index = max(range(cells), key=concurrent.__getitem__) if slots else None
+        return {
+            "resolution": resolution,
+            "width": width,
+            "slots": slots,
+            "peak_occupied": round(concurrent[peak_index], 2) if peak_index is not None else None,
+            "peak_at": grid_start + peak_index * width if peak_index is not None else None
+        }
+
+    def persist(self) -> bool:
+        """Lưu bucket 1m / 1h ra file (chỉ khi có mẫu mới)"""
+        with self._lock:
+            if not self._dirty:
+                return True
+            started = time.perf_counter()
+            data = {
+                "version": 1,
+                "saved_at": time.time(),
+                "slots": {
+                    str(slot_id): {name: series.buckets[name].ring.dump() for name in RESOLUTIONS}
+                    for slot_id, series in self._series.items()
+                }
+            }
+            self._dirty = False
+
+        success, message = self.file_manager.write_json(self.file_path, data, create_backup=False)
+        if not success:
+            self._dirty = True
+            logger.error(f"Slot history persist failed: {message}")
+        self.last_persist = {
+            "at": time.time(),
+            "success": success,
+            "slots": len(data["slots"]),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        return success
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slots": len(self._series),
+                "max_slots": self.max_slots,
+                "samples": self.samples,
+                "dropped_slots": self.dropped_slots,
+                "capacity": {
+                    "raw": self.raw_capacity,
+                    "1m": self.minute_capacity,
+                    "1h": self.hour_capacity
+                },
+                "last_persist": self.last_persist
+            }
+
+
+# Global instance - dùng chung cho ESP32 poller, slot state service và Parking Slots API
+slot_history = SlotHistoryService()
+
+# Lưu bucket còn lại khi process thoát
+atexit.register(slot_history.persist)
@@ -0,0 +1,237 @@
+"""
+Slot State Service - Lưu trạng thái slot do board ESP32 đẩy lên vào bảng parking_slots
+
+Chức năng chính:
+- Nhận 1 batch reading (nhiều slot) của 1 controller, kiểm tra slot theo registry (esp32_fleet)
+  thay vì dải cố định 0-10
+- Reading có thể là occupied (firmware đã ngưỡng hóa) hoặc distance_cm thô; mọi reading đi qua
+  detector của board (hysteresis + debounce, xem services/slot_detector.py)
+- Chỉ slot đổi trạng thái thật sự, chưa có dòng trong bảng hoặc có status trong database khác trạng thái
+  detector mới được ghi database, trong 1 transaction: 1 SELECT các slot liên quan + bulk INSERT / executemany UPDATE.
+  Ghi lỗi sau khi detector đã nhận transition -> batch sau (kể cả reading giống hệt) tự ghi bù
+- Slot 'reserved' giữ nguyên khi cảm biến báo trống
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.esp32_fleet import ESP32Fleet, esp32_fleet
+from services.slot_history_service import slot_history
+from config.config import ESP32_SLOT_BATCH_MAX
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_reading_time(value: Any) -> datetime:
+    """Timestamp ISO do board gửi -> datetime UTC (naive, như các cột DateTime khác); lỗi -> bây giờ"""
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class SlotStateService:
+    """Ghi batch trạng thái slot vào database"""
+
+    def __init__(self, fleet: Optional[ESP32Fleet] = None, max_batch: int = ESP32_SLOT_BATCH_MAX):
+        self.fleet = fleet or esp32_fleet
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self.stats = {
+            "batches": 0,
+            "readings": 0,
+            "rejected": 0,
+            "status_changes": 0,
+            "skipped_writes": 0,
+            "last_write_ms": None
+        }
+
+    def apply_batch(self, controller_id: Optional[str], readings: List[Any]) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Áp dụng 1 batch reading của 1 controller
+
+        Args:
+            controller_id: Id trong ESP32_CONTROLLERS (None = board chính)
+            readings: List {"slot_id": int (1..N của board), "occupied": bool và/hoặc "distance_cm": số,
+                            "sensor_value": int (tùy chọn), "timestamp": ISO (tùy chọn)}
+                      Reading chỉ có occupied được nhận ngay; reading có distance_cm phải qua debounce N mẫu
+
+        Returns:
+            Tuple of (success, result); success=False khi không có reading hợp lệ nào hoặc ghi lỗi
+        """
+        controller = self.fleet.get_controller(controller_id) if controller_id else self.fleet.primary
+        if controller is None:
+            return False, {"error": "Unknown controller", "message": f"Controller không tồn tại: {controller_id}"}
+        if not isinstance(readings, list) or not readings:
+            return False, {"error": "No readings", "message": "readings phải là list không rỗng"}
+        if len(readings) > self.max_batch:
+            return False, {"error": "Batch too large",
+                           "message": f"Tối đa {self.max_batch} reading mỗi batch, nhận được {len(readings)}"}
+
+        accepted: Dict[int, Dict[str, Any]] = {}
+        rejected = []
+        for index, reading in enumerate(readings):
+            if not isinstance(reading, dict):
+                rejected.append({"index": index, "error": "Reading must be an object"})
+                continue
+            slot_id = reading.get("slot_id")
+            occupied = reading.get("occupied")
+            distance = reading.get("distance_cm")
+            if distance is not None and (not isinstance(distance, (int, float)) or isinstance(distance, bool)
+                                         or distance < 0):
+                rejected.append({"index": index, "slot_id": slot_id,
+                                 "error": f"distance_cm must be a non-negative number, got: {distance}"})
+                continue
+            if not isinstance(occupied, bool) and not (occupied is None and distance is not None):
+                rejected.append({"index": index, "slot_id": slot_id,
+                                 "error": f"occupied must be boolean, got: {type(occupied).__name__}"})
+                continue
+            global_slot, error = self.fleet.resolve_slot(controller.id, slot_id)
+            if global_slot is None:
+                rejected.append({"index": index, "slot_id": slot_id, "error": error})
+                continue
+            sensor_value = reading.get("sensor_value")
+            # Cùng slot xuất hiện nhiều lần trong batch: lấy reading sau cùng
+            accepted[global_slot] = {
+                "local_slot": slot_id,
+                "status": None if occupied is None else (1 if occupied else 0),
+                "distance": distance,
+                "sensor_value": sensor_value if isinstance(sensor_value, int) and not isinstance(sensor_value, bool) else None,
+                "reading_at": _parse_reading_time(reading.get("timestamp"))
+            }
+
+        result = {
+            "controller_id": controller.id,
+            "received": len(readings),
+            "accepted": len(accepted),
+            "rejected": rejected
+        }
+        if not accepted:
+            return False, dict(result, error="No valid readings", message="Không có reading hợp lệ")
+
+        # Detector của board: cập nhật cache + phát SlotChanged khi có transition;
+        # status của reading thay bằng trạng thái đã xác nhận
+        transitions = set()
+        for global_slot, reading in sorted(accepted.items()):
+            samples_required = 1 if reading["distance"] is None else None
+            if controller.service.observe_slot(reading["local_slot"], reading["status"], reading["distance"],
+                                               samples_required) is not None:
+                transitions.add(global_slot)
+            reading["status"] = controller.service.detector.get_state(reading["local_slot"]).get("status")
+        slot_history.record_many((global_slot, reading["status"],
+                                  reading["distance"] if reading["distance"] is not None else reading["sensor_value"])
+                                 for global_slot, reading in accepted.items() if reading["status"] is not None)
+
+        try:
+            changed, written, write_ms = self._write(controller.id, accepted, transitions)
+        except Exception as e:
+            logger.error(f"Slot state: failed to write batch from {controller.id}: {e}")
+            try:
+                from app import db
+                db.session.rollback()
+            except Exception:
+                pass
+            return False, dict(result, error="Database error", message=str(e))
+
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["readings"] += len(accepted)
+            self.stats["rejected"] += len(rejected)
+            self.stats["status_changes"] += len(changed)
+            self.stats["skipped_writes"] += len(accepted) - written
+            if written:
+                self.stats["last_write_ms"] = write_ms
+
+        result.update({
+            "changed": changed,
+            "transitions": sorted(transitions),
+            "written": written,
+            "write_ms": write_ms,
+            "slots": {global_slot: controller.service.detector.get_state(reading["local_slot"])
+                      for global_slot, reading in accepted.items()}
+        })
+        return True, result
+
+    def _write(self, controller_id: str, accepted: Dict[int, Dict[str, Any]],
+               transitions: set) -> Tuple[List[int], int, float]:
+        """
+        Ghi batch trong 1 transaction: slot có transition, slot chưa có dòng trong bảng
+        và slot có status trong database lệch với detector (lần ghi trước bị lỗi)
+
+        Returns:
+            Tuple of (slot toàn cục đổi trạng thái trong database, số dòng ghi, thời gian ghi ms)
+        """
+        from sqlalchemy import select, bindparam
+        from app import db
+        from models.models_cache import get_sqlalchemy_models
+
+        started = time.perf_counter()
+        _, _, _, ParkingSlotModel, _, _ = get_sqlalchemy_models()
+        table = ParkingSlotModel.__table__
+
+        slot_numbers = [str(global_slot) for global_slot in accepted]
+        existing = dict(db.session.execute(
+            select(table.c.slot_number, table.c.status).where(table.c.slot_number.in_(slot_numbers))
+        ).all())
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        inserts, updates, changed = [], [], []
+        for global_slot, reading in sorted(accepted.items()):
+            slot_number = str(global_slot)
+            if reading["status"] is None:
+                continue
+            old_status = existing.get(slot_number)
+            if reading["status"] == 1:
+                status = "occupied"
+            else:
+                status = "reserved" if old_status == "reserved" else "empty"
+            if global_slot not in transitions and slot_number in existing and old_status == status:
+                continue
+            if old_status != status:
+                changed.append(global_slot)
+
+            values = {
+                "status": status,
+                "controller_id": controller_id,
+                "sensor_value": reading["sensor_value"],
+                "last_reading_at": reading["reading_at"]
+            }
+            if slot_number in existing:
+                updates.append(dict({f"b_{key}": value for key, value in values.items()},
+                                    b_slot_number=slot_number, b_updated_at=now))
+            else:
+                inserts.append(dict(values, slot_number=slot_number, created_at=now, updated_at=now))
+
+        if not inserts and not updates:
+            db.session.rollback()  # chỉ có SELECT - đóng transaction đọc
+            return changed, 0, round((time.perf_counter() - started) * 1000, 2)
+        if inserts:
+            db.session.execute(table.insert(), inserts)
+        if updates:
+            db.session.execute(
+                table.update()
+                .where(table.c.slot_number == bindparam("b_slot_number"))
+                .values(status=bindparam("b_status"),
+                        controller_id=bindparam("b_controller_id"),
+                        sensor_value=bindparam("b_sensor_value"),
+                        last_reading_at=bindparam("b_last_reading_at"),
+                        updated_at=bindparam("b_updated_at")),
+                updates
+            )
+        db.session.commit()
+        return changed, len(inserts) + len(updates), round((time.perf_counter() - started) * 1000, 2)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, max_batch=self.max_batch)
+
+
+# Global instance - dùng cho /api/parking-slots/update và /batch
+slot_state_service = SlotStateService()
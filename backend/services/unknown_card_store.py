@@ -0,0 +1,209 @@
+"""
+Unknown Card Store - Lưu thẻ lạ trong bộ nhớ, index theo UID, ghi file gộp
+
+Chức năng chính:
+- Index dict theo UID: kiểm tra / cập nhật thẻ lạ O(1), không quét list
+- Mỗi UID 1 entry với first_seen, last_seen, count thay vì nhiều entry trùng
+- Giới hạn UNKNOWN_CARDS_MAX entry, loại thẻ lâu không thấy nhất (LRU)
+- Ghi unknown_cards.json gộp: nhiều thay đổi liên tiếp -> 1 lần ghi sau
+  UNKNOWN_CARDS_FLUSH_DELAY giây (reader lỗi / thử clone thẻ không làm nghẽn disk)
+"""
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+
+from config.config import UNKNOWN_CARDS_FILE, UNKNOWN_CARDS_MAX, UNKNOWN_CARDS_FLUSH_DELAY
+from utils.file_manager import FileManager
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownCardStore:
+    """
+    Kho thẻ lạ dạng OrderedDict {uid: entry}, thứ tự = thời điểm thấy gần nhất
+
+    Format file giữ tương thích: {"unknown_cards": [entry, ...]}, mỗi entry vẫn có
+    "uid" và "timestamp" (lần thấy đầu tiên) như trước, thêm first_seen/last_seen/count.
+    """
+
+    def __init__(self, max_entries: int = UNKNOWN_CARDS_MAX,
+                 flush_delay: float = UNKNOWN_CARDS_FLUSH_DELAY):
+        self.max_entries = max(1, max_entries)
+        self.flush_delay = flush_delay
+        self.file_manager = FileManager()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._loaded = False
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self.evicted = 0
+        self.flushes = 0
+
+    def _ensure_loaded(self):
+        """Đọc file 1 lần; gộp entry trùng UID của format cũ (gọi khi đang giữ lock)"""
+        if self._loaded:
+            return
+        success, data = self.file_manager.read_json(UNKNOWN_CARDS_FILE, default_value={"unknown_cards": []})
+        cards = data.get("unknown_cards", []) if success and isinstance(data, dict) else []
+
+        entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        for card in cards:
+            if not isinstance(card, dict) or not card.get("uid"):
+                continue
+            uid = str(card["uid"]).upper().strip()
+            seen = card.get("last_seen") or card.get("timestamp")
+            existing = entries.get(uid)
+            if existing is None:
+                entry = dict(card)
+                entry["uid"] = uid
+                entry.setdefault("first_seen", card.get("timestamp") or seen)
+                entry.setdefault("timestamp", entry["first_seen"])
+                entry["last_seen"] = seen
+                entry["count"] = int(card.get("count", 1))
+                entries[uid] = entry
+            else:
+                existing["count"] += int(card.get("count", 1))
+                if seen and (not existing["last_seen"] or seen > existing["last_seen"]):
+                    existing["last_seen"] = seen
+
+        # Sắp theo last_seen để LRU đúng cả với file cũ
+        self._entries = OrderedDict(sorted(entries.items(), key=lambda item: item[1].get("last_seen") or ""))
+        self._loaded = True
+        if len(self._entries) > self.max_entries:
+            self._evict()
+            self._schedule_flush()
+
+    def _evict(self):
+        """Loại thẻ lâu không thấy nhất khi vượt giới hạn (gọi khi đang giữ lock)"""
+        while len(self._entries) > self.max_entries:
+            uid, _ = self._entries.popitem(last=False)
+            self.evicted += 1
+            logger.debug(f"Unknown card evicted (LRU): {uid}")
+
+    def record(self, uid: str, metadata: Dict[str, Any] = None) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Ghi nhận 1 lần thấy thẻ lạ
+
+        Args:
+            uid: UID thẻ
+            metadata: Thông tin bổ sung (chỉ lưu ở lần thấy đầu tiên)
+
+        Returns:
+            Tuple of (is_new, entry)
+        """
+        normalized_uid = uid.upper().strip()
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(normalized_uid)
+            is_new = entry is None
+            if is_new:
+                entry = {
+                    "uid": normalized_uid,
+                    "timestamp": now,
+                    **(metadata or {}),
+                    "first_seen": now,
+                    "last_seen": now,
+                    "count": 1
+                }
+                self._entries[normalized_uid] = entry
+                self._evict()
+            else:
+                entry["last_seen"] = now
+                entry["count"] += 1
+                self._entries.move_to_end(normalized_uid)
+            self._schedule_flush()
+            entry = dict(entry)
+        self._flush_if_immediate()
+        return is_new, entry
+
+    def contains(self, uid: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            return uid.upper().strip() in self._entries
+
+    def remove(self, uid: str) -> bool:
+        """Xóa 1 thẻ lạ, trả về False nếu không có trong danh sách"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._entries.pop(uid.upper().strip(), None) is None:
+                return False
+            self._schedule_flush()
+        self._flush_if_immediate()
+        return True
+
+    def clear(self) -> int:
+        """Xóa toàn bộ, trả về số thẻ đã xóa"""
+        with self._lock:
+            self._ensure_loaded()
+            count = len(self._entries)
+            self._entries.clear()
+            self._schedule_flush()
+        self._flush_if_immediate()
+        return count
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Danh sách thẻ lạ (thấy gần nhất ở cuối)"""
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(entry) for entry in self._entries.values()]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    def _schedule_flush(self):
+        """Đánh dấu cần ghi; chỉ tạo 1 timer cho cả loạt thay đổi (gọi khi đang giữ lock)"""
+        self._dirty = True
+        if self.flush_delay <= 0:
+            return
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_if_immediate(self):
+        """Không bật ghi gộp (flush_delay <= 0) -> ghi ngay sau mỗi thay đổi"""
+        if self.flush_delay <= 0:
+            self.flush()
+
+    def flush(self) -> Tuple[bool, str]:
+        """Ghi unknown_cards.json nếu có thay đổi chưa lưu"""
+        with self._write_lock:
+            with self._lock:
+                self._flush_timer = None
+                if not self._dirty:
+                    return True, "Unknown cards up to date"
+                data = {"unknown_cards": [dict(entry) for entry in self._entries.values()]}
+                self._dirty = False
+
+            success, message = self.file_manager.write_json(UNKNOWN_CARDS_FILE, data, max_backups=5)
+            if success:
+                self.flushes += 1
+            else:
+                with self._lock:
+                    self._dirty = True
+                logger.error(f"Failed to save unknown cards: {message}")
+            return success, message
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries) if self._loaded else None,
+                "max_entries": self.max_entries,
+                "evicted": self.evicted,
+                "flushes": self.flushes,
+                "pending_write": self._dirty
+            }
+
+
+# Global instance - dùng chung cho mọi CardService (api/cards.py, api/system.py)
+unknown_card_store = UnknownCardStore()
+
+# Ghi nốt thay đổi còn chờ khi process thoát
+atexit.register(unknown_card_store.flush)
@@ -0,0 +1,9 @@
+"""
+Cấu hình pytest cho backend - chạy từ thư mục backend: python -m pytest -q tests
+
+Các test chỉ dùng service / model trực tiếp (không khởi động app, không ghi vào backend/data).
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,89 @@
+"""
+Test ESP32Fleet (services/esp32_fleet.py) - không gọi board thật, dữ liệu đọc được gán thẳng vào cache
+- merged(): slot toàn cục = slot_offset + slot của board, slot_count giới hạn số slot lấy từ board
+- resolve_slot(): slot do board đẩy lên phải nằm trong dải của board
+"""
+import pytest
+
+from config.config import ESP32_DEFAULT_SLOT_COUNT
+from models.parking_slot import ParkingSlotsData
+from services.esp32_fleet import ESP32Fleet
+
+
+def board_data(statuses):
+    return ParkingSlotsData({"success": True, "esp32_data": {
+        "soIC": 1, "totalSensors": len(statuses), "timestamp": 1000, "data": list(statuses)}})
+
+
+@pytest.fixture
+def fleet():
+    return ESP32Fleet([
+        {"id": "zone-a", "ip": "10.255.0.1", "slot_count": 4},
+        {"id": "zone-b", "ip": "10.255.0.2", "slot_offset": 4},
+        {"id": "zone-c", "ip": "10.255.0.3", "slot_offset": 10}
+    ])
+
+
+def test_merged_none_without_data(fleet):
+    assert fleet.merged() is None
+
+
+def test_merged_maps_slots_to_global_ids(fleet):
+    # zone-a báo 6 slot nhưng slot_count = 4: 2 slot cuối bị bỏ
+    fleet.get_controller("zone-a").service.last_data = board_data([1, 0, 0, 1, 1, 1])
+    fleet.get_controller("zone-b").service.last_data = board_data([0, 1, 0])
+
+    merged = fleet.merged()
+    assert [slot.slot_id for slot in merged.slots] == [1, 2, 3, 4, 5, 6, 7]
+    assert [slot.status for slot in merged.slots] == [1, 0, 0, 1, 0, 1, 0]
+    assert [slot.controller_id for slot in merged.slots] == ["zone-a"] * 4 + ["zone-b"] * 3
+    assert merged.total_sensors == 7
+    assert merged.summary == {"total_slots": 7, "occupied": 3, "available": 4, "occupancy_rate": 42.9}
+
+
+def test_merged_skips_boards_without_data(fleet):
+    fleet.get_controller("zone-c").service.last_data = board_data([1, 1])
+    assert [slot.slot_id for slot in fleet.merged().slots] == [11, 12]
+
+
+def test_primary_is_first_controller(fleet):
+    assert fleet.primary.id == "zone-a"
+
+
+def test_duplicate_controller_id_rejected():
+    with pytest.raises(ValueError):
+        ESP32Fleet([{"id": "x", "ip": "10.255.0.1"}, {"id": "x", "ip": "10.255.0.2"}])
+
+
+def test_resolve_slot_uses_slot_count(fleet):
+    assert fleet.resolve_slot("zone-a", 4) == (4, '')
+    global_slot, error = fleet.resolve_slot("zone-a", 5)
+    assert global_slot is None and "1-4" in error
+
+
+def test_resolve_slot_gap_to_next_board(fleet):
+    # Chưa đọc được zone-b: dải = khoảng cách tới slot_offset của zone-c
+    assert fleet.resolve_slot("zone-b", 6) == (10, '')
+    assert fleet.resolve_slot("zone-b", 7)[0] is None
+
+
+def test_resolve_slot_uses_last_reading(fleet):
+    fleet.get_controller("zone-b").service.last_data = board_data([0, 0, 0])
+    assert fleet.resolve_slot("zone-b", 3) == (7, '')
+    assert fleet.resolve_slot("zone-b", 4)[0] is None
+
+
+def test_resolve_slot_default_range_before_first_poll(fleet):
+    # Board cuối, không slot_count, chưa đọc lần nào: dải mặc định thay vì từ chối mọi reading
+    assert fleet.resolve_slot("zone-c", ESP32_DEFAULT_SLOT_COUNT) == (10 + ESP32_DEFAULT_SLOT_COUNT, '')
+    assert fleet.resolve_slot("zone-c", ESP32_DEFAULT_SLOT_COUNT + 1)[0] is None
+
+
+@pytest.mark.parametrize("slot_id", [0, -1, "3", True, None])
+def test_resolve_slot_rejects_invalid_ids(fleet, slot_id):
+    assert fleet.resolve_slot("zone-a", slot_id)[0] is None
+
+
+def test_resolve_slot_unknown_controller(fleet):
+    global_slot, error = fleet.resolve_slot("zone-z", 1)
+    assert global_slot is None and "zone-z" in error
@@ -0,0 +1,123 @@
+"""
+Test EventStream (services/event_stream.py) - event đi qua EventBus riêng (handler sync), không mở HTTP
+- Kết nối lại với Last-Event-ID nhận nốt event bị lỡ từ replay buffer, không trùng / không mất
+- Id của process khác hoặc đã rời replay buffer -> event "reset"
+- Client không đọc kịp làm đầy buffer -> bị ngắt, publisher không bị chặn
+"""
+import json
+
+import pytest
+
+from services.event_bus import EventBus, SlotChanged, CardEntered
+from services.event_stream import EventStream
+
+
+def parse(message):
+    """Message SSE -> (id, event, data)"""
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["id"], fields["event"], json.loads(fields["data"])
+
+
+@pytest.fixture
+def hub():
+    return EventStream(max_clients=2, buffer_size=3, replay_size=5, heartbeat=0.05)
+
+
+@pytest.fixture
+def bus(hub):
+    bus = EventBus()
+    hub.init_bus(bus)
+    return bus
+
+
+def publish_slots(bus, count, start=1):
+    for slot_id in range(start, start + count):
+        bus.publish(SlotChanged(slot_id=slot_id, old_status=0, new_status=1))
+
+
+def test_event_delivered_with_payload(hub, bus):
+    client, backlog = hub.connect()
+    assert backlog == []
+    bus.publish(CardEntered(card_id="A1B2C3D4", card_name="Xe 1", direction="IN"))
+
+    event_id, event, data = parse(client.queue.get_nowait())
+    assert event_id == f"{hub.epoch}-1"
+    assert event == "CardEntered"
+    assert data["card_id"] == "A1B2C3D4" and data["direction"] == "IN"
+
+
+def test_last_event_id_replays_missed_events(hub, bus):
+    publish_slots(bus, 4)
+
+    _, backlog = hub.connect(last_event_id=f"{hub.epoch}-2")
+    assert [parse(message)[0] for message in backlog] == [f"{hub.epoch}-3", f"{hub.epoch}-4"]
+    assert [parse(message)[2]["slot_id"] for message in backlog] == [3, 4]
+    assert hub.stats["resumed"] == 1
+
+
+def test_up_to_date_client_gets_empty_backlog(hub, bus):
+    publish_slots(bus, 2)
+    _, backlog = hub.connect(last_event_id=f"{hub.epoch}-2")
+    assert backlog == []
+
+
+def test_replay_then_live_events_without_gap(hub, bus):
+    publish_slots(bus, 2)
+    client, backlog = hub.connect(last_event_id=f"{hub.epoch}-1")
+    publish_slots(bus, 1, start=3)
+
+    ids = [parse(message)[0] for message in backlog] + [parse(client.queue.get_nowait())[0]]
+    assert ids == [f"{hub.epoch}-2", f"{hub.epoch}-3"]
+
+
+@pytest.mark.parametrize("last_event_id", ["0-1", "garbage", "{epoch}-99"])
+def test_unknown_last_event_id_sends_reset(hub, bus, last_event_id):
+    publish_slots(bus, 2)
+    _, backlog = hub.connect(last_event_id=last_event_id.format(epoch=hub.epoch))
+    assert len(backlog) == 1
+    _, event, data = parse(backlog[0])
+    assert event == "reset"
+    assert hub.stats["resets"] == 1
+
+
+def test_id_evicted_from_replay_buffer_sends_reset(hub, bus):
+    publish_slots(bus, 8)  # replay_size = 5: còn event 4..8
+    _, backlog = hub.connect(last_event_id=f"{hub.epoch}-2")
+    assert parse(backlog[0])[1] == "reset"
+
+    # Event ngay trước phần còn trong buffer vẫn resume được
+    _, backlog = hub.connect(last_event_id=f"{hub.epoch}-3")
+    assert [parse(message)[2]["slot_id"] for message in backlog] == [4, 5, 6, 7, 8]
+
+
+def test_slow_client_disconnected_on_overflow(hub, bus):
+    slow, _ = hub.connect()
+    fast, _ = hub.connect()
+
+    publish_slots(bus, 1)
+    last_received = parse(slow.queue.get_nowait())[0]
+    fast.queue.get_nowait()
+    for slot_id in range(2, 6):  # slow: 4 event > buffer 3, publisher không bị chặn
+        publish_slots(bus, 1, start=slot_id)
+        fast.queue.get_nowait()
+
+    assert slow.overflowed
+    assert not fast.overflowed
+    assert hub.stats["overflow_disconnects"] == 1
+
+    # Generator của client bị tràn kết thúc ngay và tự hủy đăng ký
+    output = list(hub.stream(slow, []))
+    assert len(output) == 1 and output[0].startswith("retry: ")
+    assert slow.closed
+    assert hub.get_stats()["clients"] == 1
+
+    # Client kết nối lại với event cuối đã nhận -> nhận nốt mọi event bị rớt
+    _, backlog = hub.connect(last_event_id=last_received)
+    assert [parse(message)[2]["slot_id"] for message in backlog] == [2, 3, 4, 5]
+
+
+def test_max_clients_rejected(hub):
+    assert hub.connect() is not None
+    assert hub.connect() is not None
+    assert hub.connect() is None
+    assert hub.stats["rejected_connections"] == 1
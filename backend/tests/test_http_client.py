@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test ResilientHTTPClient circuit breaker (utils/http_client.py)
+- Half-open probe lỗi ngoài ConnectionError/Timeout (ChunkedEncodingError...) phải mở lại breaker,
+  không được kẹt ở half_open
+- Probe thành công đóng breaker
+Không cần server: session được thay bằng fake
+"""
+import time
+
+import requests
+
+from utils.http_client import ResilientHTTPClient, CircuitOpenError
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Trả lần lượt các kết quả trong outcomes (exception thì raise)"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def request(self, method, url, **kwargs):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+def make_client(outcomes):
+    client = ResilientHTTPClient("test", retries=0, failure_threshold=1, reset_timeout=0.05)
+    client.session = FakeSession(outcomes)
+    return client
+
+
+def wait_half_open(client):
+    time.sleep(0.06)
+    assert client.breaker.state == "half_open"
+
+
+def test_half_open_probe_chunked_encoding_error_reopens():
+    """TEST 1: probe raise ChunkedEncodingError -> breaker open lại, probe sau vẫn được gửi"""
+    client = make_client([
+        requests.exceptions.ConnectionError("down"),
+        requests.exceptions.ChunkedEncodingError("connection cut mid-body"),
+        200
+    ])
+
+    try:
+        client.get("http://board/data")
+    except requests.exceptions.ConnectionError:
+        pass
+    assert client.breaker.state == "open"
+
+    wait_half_open(client)
+    try:
+        client.get("http://board/data")
+        assert False, "ChunkedEncodingError expected"
+    except requests.exceptions.ChunkedEncodingError:
+        pass
+    assert client.breaker.state == "open"
+
+    wait_half_open(client)
+    assert client.get("http://board/data").status_code == 200
+    assert client.breaker.state == "closed"
+
+
+def test_half_open_probe_invalid_url_not_stuck():
+    """TEST 2: probe raise InvalidURL -> không kẹt, request sau không bị CircuitOpenError mãi"""
+    client = make_client([
+        requests.exceptions.Timeout("slow"),
+        requests.exceptions.InvalidURL("bad url"),
+        200
+    ])
+
+    try:
+        client.get("http://board/data")
+    except requests.exceptions.Timeout:
+        pass
+
+    wait_half_open(client)
+    try:
+        client.get("http://board/data")
+    except requests.exceptions.InvalidURL:
+        pass
+
+    wait_half_open(client)
+    try:
+        assert client.get("http://board/data").status_code == 200
+    except CircuitOpenError:
+        assert False, "breaker stuck in half_open"
+    assert client.breaker.state == "closed"
+
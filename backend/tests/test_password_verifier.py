@@ -0,0 +1,84 @@
+"""
+Test PasswordVerifier (services/password_verifier.py) - hash giả bị chặn bằng Event thay cho bcrypt
+- Quá AUTH_HASH_MAX_PENDING verify đang chạy -> PasswordVerifierUnavailable ngay, không xếp hàng
+- POST /api/auth/login khi pool bận -> 503 + Retry-After (blueprint thật, User giả, không database)
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import api.auth as auth_module
+import services.password_verifier as password_verifier_module
+from services.password_verifier import PasswordVerifier, PasswordVerifierUnavailable
+
+
+@pytest.fixture
+def release(monkeypatch):
+    """Hash giả: chờ tới khi test nhả Event"""
+    event = threading.Event()
+    started = threading.Semaphore(0)
+
+    def check_password(password, password_hash):
+        started.release()
+        event.wait(5)
+        return password == password_hash, 1000
+
+    monkeypatch.setattr(password_verifier_module, "_check_password", check_password)
+    event.started = started
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def verifier():
+    verifier = PasswordVerifier(workers=1, max_pending=1, timeout=5, mode='thread')
+    yield verifier
+    verifier.shutdown()
+
+
+def saturate(verifier, release):
+    """Chiếm slot duy nhất bằng 1 verify chạy nền, chờ tới khi nó đang hash"""
+    results = []
+    worker = threading.Thread(target=lambda: results.append(verifier.verify("secret", "secret")))
+    worker.start()
+    assert release.started.acquire(timeout=5)
+    return worker, results
+
+
+def test_verify_rejected_when_saturated(verifier, release):
+    worker, results = saturate(verifier, release)
+
+    with pytest.raises(PasswordVerifierUnavailable):
+        verifier.verify("secret", "secret")
+    assert verifier.stats["rejected"] == 1
+    assert verifier.get_stats()["in_flight"] == 1
+
+    release.set()
+    worker.join(5)
+    assert results == [True]
+
+    # Slot được trả lại khi task xong: verify tiếp theo chạy bình thường
+    assert verifier.verify("secret", "wrong") is False
+    assert verifier.stats["completed"] == 2
+
+
+def test_login_returns_503_when_saturated(verifier, release, monkeypatch):
+    user = SimpleNamespace(id=1, username="admin", password_hash="secret")
+    query = SimpleNamespace(filter_by=lambda **kwargs: SimpleNamespace(first=lambda: user))
+    monkeypatch.setattr(auth_module, "get_user_model", lambda: SimpleNamespace(query=query))
+    monkeypatch.setattr(auth_module, "get_db", lambda: None)
+    monkeypatch.setattr(auth_module, "password_verifier", verifier)
+
+    app = Flask(__name__)
+    app.register_blueprint(auth_module.auth_bp)
+    worker, _ = saturate(verifier, release)
+
+    response = app.test_client().post("/api/auth/login", json={"username": "admin", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.get_json()["message"] == "Login is busy, please try again"
+
+    release.set()
+    worker.join(5)
@@ -0,0 +1,113 @@
+"""
+Test PrincipalCache / TokenCache (services/principal_cache.py) - user lấy từ dict giả thay cho database
+- token_version tăng (đổi mật khẩu / role, khóa tài khoản) + invalidate() -> token cũ bị từ chối ngay
+- Không invalidate: thay đổi có hiệu lực sau TTL
+"""
+import time
+
+import jwt
+import pytest
+
+import services.principal_cache as principal_cache_module
+from services.principal_cache import PrincipalCache, TokenCache, check_principal
+
+SECRET = "test-secret-0123456789abcdef-0123456789"
+
+
+@pytest.fixture
+def users():
+    return {7: {"id": 7, "username": "guard", "role": "user", "is_active": True, "token_version": 0}}
+
+
+@pytest.fixture
+def cache(users, monkeypatch):
+    principal_cache = PrincipalCache(ttl=60, max_size=10)
+    loads = []
+
+    def load(user_id):
+        loads.append(user_id)
+        user = users.get(user_id)
+        return dict(user) if user else None
+
+    monkeypatch.setattr(principal_cache, "_load", load)
+    principal_cache.loads = loads
+    return principal_cache
+
+
+def test_principal_cached_between_requests(cache):
+    assert cache.get("7")["role"] == "user"
+    assert cache.get(7)["role"] == "user"
+    assert cache.loads == [7]
+    assert cache.stats["hits"] == 1
+
+
+def test_token_version_bump_revokes_after_invalidate(cache, users):
+    claims = {"sub": "7", "ver": 0}
+    assert check_principal(claims, cache.get(7)) is None
+
+    users[7]["token_version"] = 1  # đổi mật khẩu
+    cache.invalidate(7)
+
+    assert check_principal(claims, cache.get(7)) == "Token has been revoked"
+    assert check_principal({"sub": "7", "ver": 1}, cache.get(7)) is None
+    assert cache.loads == [7, 7]
+
+
+def test_deactivate_rejected_after_invalidate(cache, users):
+    cache.get(7)
+    users[7]["is_active"] = False
+    cache.invalidate("7")
+    assert check_principal({"ver": 0}, cache.get(7)) == "User account is inactive"
+
+
+def test_without_invalidate_change_applies_after_ttl(users, monkeypatch):
+    cache = PrincipalCache(ttl=0.05)
+    monkeypatch.setattr(cache, "_load", lambda user_id: dict(users[user_id]))
+    cache.get(7)
+    users[7]["token_version"] = 3
+    assert cache.get(7)["token_version"] == 0  # còn trong TTL
+    time.sleep(0.06)
+    assert cache.get(7)["token_version"] == 3
+
+
+def test_missing_user_not_cached(cache, users):
+    assert cache.get(99) is None
+    assert check_principal({}, None) == "User not found"
+    users[99] = dict(users[7], id=99)
+    assert cache.get(99)["id"] == 99
+
+
+def test_invalid_user_id_ignored(cache):
+    assert cache.get("abc") is None
+    cache.invalidate(None)
+    assert cache.loads == []
+
+
+def test_token_cache_reuses_verified_claims():
+    tokens = TokenCache(max_size=2)
+    token = jwt.encode({"sub": "7", "exp": time.time() + 60}, SECRET, algorithm="HS256")
+    assert tokens.decode(token, SECRET)["sub"] == "7"
+    assert tokens.decode(token, SECRET)["sub"] == "7"
+    assert tokens.stats == {"hits": 1, "misses": 1, "evictions": 0}
+
+    # Secret khác -> không dùng claims đã cache
+    with pytest.raises(jwt.InvalidSignatureError):
+        tokens.decode(token, "other-secret-0123456789abcdef-0123456789")
+
+
+def test_token_cache_checks_expiry_on_hit(monkeypatch):
+    tokens = TokenCache()
+    exp = int(time.time()) + 60
+    token = jwt.encode({"sub": "7", "exp": exp}, SECRET, algorithm="HS256")
+    tokens.decode(token, SECRET)
+
+    class FakeClock:
+        @staticmethod
+        def time():
+            return exp + 1
+
+    # Token hết hạn khi đang nằm trong cache: vẫn phải bị từ chối và bị bỏ khỏi cache
+    monkeypatch.setattr(principal_cache_module, "time", FakeClock)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        tokens.decode(token, SECRET)
+    assert tokens.get_stats()["size"] == 0
@@ -0,0 +1,78 @@
+"""
+Test SlotDetector (services/slot_detector.py)
+- Hysteresis: có xe khi <= occupied_below (15 cm, khớp firmware), trống khi >= vacant_above,
+  vùng giữa giữ trạng thái hiện tại
+- Debounce: trạng thái mới phải lặp lại N mẫu liên tiếp, mẫu nhiễu xen giữa làm lại từ đầu
+"""
+import services.slot_detector as slot_detector_module
+from services.slot_detector import SlotDetector
+
+
+def test_default_thresholds_match_firmware():
+    occupied_below, vacant_above = SlotDetector().thresholds(1)
+    assert occupied_below == 15
+    assert vacant_above > occupied_below
+
+
+def test_hysteresis_band_keeps_current_status():
+    detector = SlotDetector(debounce_samples=1)
+    assert detector.observe(1, distance=40)[1] == 0
+
+    # 11-15 cm: firmware báo có xe -> detector cũng phải nhận có xe
+    assert detector.observe(1, distance=12)[:2] == (0, 1)
+    # Vùng hysteresis (16-19 cm): giữ có xe
+    assert detector.observe(1, distance=18) is None
+    assert detector.get_state(1)["status"] == 1
+    # Vượt ngưỡng trống mới nhả slot
+    assert detector.observe(1, distance=20)[:2] == (1, 0)
+    # Vùng hysteresis khi đang trống: giữ trống
+    assert detector.observe(1, distance=17) is None
+    assert detector.get_state(1)["status"] == 0
+
+
+def test_first_sample_accepted_immediately():
+    detector = SlotDetector(debounce_samples=3)
+    assert detector.observe(2, status=1) == (None, 1, detector.get_state(2)["last_changed"])
+
+
+def test_debounce_requires_consecutive_samples():
+    detector = SlotDetector(debounce_samples=3)
+    detector.observe(1, status=0)
+
+    assert detector.observe(1, status=1) is None
+    assert detector.observe(1, status=1) is None
+    assert detector.get_state(1)["pending_samples"] == 2
+    transition = detector.observe(1, status=1)
+    assert transition is not None and transition[:2] == (0, 1)
+    assert detector.transitions == 2
+
+
+def test_flapping_is_suppressed():
+    detector = SlotDetector(debounce_samples=3)
+    detector.observe(1, status=0)
+
+    for _ in range(5):
+        assert detector.observe(1, status=1) is None
+        # Mẫu trùng trạng thái hiện tại xóa ứng viên đang đếm
+        assert detector.observe(1, status=0) is None
+    assert detector.get_state(1)["status"] == 0
+    assert detector.suppressed == 5
+
+
+def test_samples_required_override():
+    detector = SlotDetector(debounce_samples=3)
+    detector.observe(1, status=0)
+    assert detector.observe(1, status=1, samples_required=1)[:2] == (0, 1)
+
+
+def test_calibration_per_global_slot(monkeypatch):
+    monkeypatch.setattr(slot_detector_module, "SLOT_CALIBRATION", {
+        "8": {"occupied_below": 8, "vacant_above": 14},
+        "9": {"occupied_below": 10, "vacant_above": 6}
+    })
+    detector = SlotDetector(slot_offset=6)
+    assert detector.thresholds(2) == (8, 14)
+    # vacant_above không lớn hơn occupied_below -> dùng hysteresis mặc định
+    occupied_below, vacant_above = detector.thresholds(3)
+    assert occupied_below == 10 and vacant_above > occupied_below
+    assert detector.thresholds(1)[0] == 15
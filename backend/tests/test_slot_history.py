@@ -0,0 +1,124 @@
+"""
+Test SlotHistoryService (services/slot_history_service.py)
+- Ring buffer ghi đè mẫu cũ nhất khi đầy, truy vấn theo cửa sổ chỉ thấy phần còn trong ring
+- Bucket 1m / 1h lưu ra file và nạp lại khi khởi động (mẫu thô không lưu)
+- aggregate() không phụ thuộc tần suất lấy mẫu / độ phân giải bucket
+"""
+from services.slot_history_service import SlotHistoryService
+
+T0 = 1_700_000_000 - 1_700_000_000 % 86400  # 00:00 UTC
+
+
+def make_history(tmp_path, **capacities) -> SlotHistoryService:
+    options = dict(raw_capacity=5, minute_capacity=3, hour_capacity=2)
+    options.update(capacities)
+    return SlotHistoryService(file_path=tmp_path / "slot_history.json", **options)
+
+
+def test_raw_ring_rollover_keeps_newest(tmp_path):
+    history = make_history(tmp_path)
+    for index in range(8):
+        history.record(1, index % 2, distance=index, ts=T0 + index)
+
+    series = history._series[1]
+    assert series.raw.size == 5
+    assert series.oldest_raw_ts() == T0 + 3
+
+    points = history.query(T0 * 1000, (T0 + 60) * 1000, slot_id=1, resolution="raw")["slots"][1]
+    assert [point["ts"] for point in points] == [(T0 + index) * 1000 for index in range(3, 8)]
+    assert [point["distance"] for point in points] == [3, 4, 5, 6, 7]
+
+
+def test_minute_buckets_rollover_and_downsample(tmp_path):
+    history = make_history(tmp_path)
+    # 5 phút, mỗi phút 2 mẫu: 1 có xe + 1 trống
+    for minute in range(5):
+        history.record(1, 1, ts=T0 + minute * 60)
+        history.record(1, 0, ts=T0 + minute * 60 + 30)
+
+    points = history.query(T0 * 1000, (T0 + 600) * 1000, slot_id=1, resolution="1m")["slots"][1]
+    assert [point["ts"] for point in points] == [(T0 + minute * 60) * 1000 for minute in (2, 3, 4)]
+    assert all(point["samples"] == 2 and point["occupancy"] == 0.5 for point in points)
+    assert all(point["status"] == 0 for point in points)
+
+
+def test_window_query_uses_binary_search_bounds(tmp_path):
+    history = make_history(tmp_path, raw_capacity=100)
+    for index in range(50):
+        history.record(1, 1, ts=T0 + index)
+
+    points = history.query((T0 + 10) * 1000, (T0 + 20) * 1000, slot_id=1, resolution="raw")["slots"][1]
+    assert [point["ts"] // 1000 - T0 for point in points] == list(range(10, 20))
+
+
+def test_persist_and_reload_buckets(tmp_path):
+    history = make_history(tmp_path, minute_capacity=10)
+    for minute in range(4):
+        history.record(1, 1, distance=12, ts=T0 + minute * 60)
+        history.record(2, 0, ts=T0 + minute * 60)
+    assert history.persist()
+
+    reloaded = make_history(tmp_path, minute_capacity=10)
+    window = (T0 * 1000, (T0 + 600) * 1000)
+    before = history.query(*window, resolution="1m")
+    after = reloaded.query(*window, resolution="1m")
+    assert after["slots"] == before["slots"]
+    assert after["slots"][1][0]["distance_avg"] == 12.0
+
+    # Mẫu thô không được lưu: sau restart auto phải chọn bucket, không trả raw rỗng
+    assert reloaded.query(*window, resolution="raw")["slots"][1] == []
+    reloaded.record(1, 1, ts=T0 + 300)
+    assert reloaded.query(*window, slot_id=1)["resolution"] == "1m"
+
+
+def test_auto_resolution_uses_raw_when_it_covers_window(tmp_path):
+    history = make_history(tmp_path, raw_capacity=100)
+    for index in range(30):
+        history.record(1, 1, ts=T0 + index)
+    assert history.query((T0 + 5) * 1000, (T0 + 25) * 1000)["resolution"] == "raw"
+
+
+def _park_every_three_hours(history: SlotHistoryService, interval: int):
+    """Xe đỗ 1 giờ mỗi 3 giờ trong 1 ngày, lấy mẫu mỗi `interval` giây"""
+    for offset in range(0, 86400, interval):
+        history.record(1, 1 if offset % 10800 < 3600 else 0, ts=T0 + offset)
+
+
+def test_aggregate_independent_of_sampling_and_resolution(tmp_path):
+    results = []
+    for minute_capacity in (100000, 10):  # đủ / không đủ bucket 1m -> tính trên bucket 1h
+        for interval in (30, 120):
+            history = make_history(tmp_path, raw_capacity=10, minute_capacity=minute_capacity, hour_capacity=48)
+            _park_every_three_hours(history, interval)
+            result = history.aggregate(T0, T0 + 86400)
+            results.append((result["resolution"], result["slots"][1], result["peak_at"]))
+
+    assert {resolution for resolution, _, _ in results} == {"1m", "1h"}
+    for _, slot, peak_at in results:
+        assert slot["observed_seconds"] == 86400
+        assert slot["occupied_seconds"] == 8 * 3600
+        assert slot["arrivals"] == 7
+        assert peak_at == T0
+
+
+def test_aggregate_carries_status_across_empty_buckets(tmp_path):
+    history = make_history(tmp_path, minute_capacity=1000)
+    # Chỉ 2 mẫu: có xe lúc 00:10, trống lúc 00:40 -> có xe 30 phút trong cửa sổ 1 giờ
+    history.record(1, 0, ts=T0)
+    history.record(1, 1, ts=T0 + 600)
+    history.record(1, 0, ts=T0 + 2400)
+
+    slot = history.aggregate(T0, T0 + 3600)["slots"][1]
+    assert slot["occupied_seconds"] == 1800
+    assert slot["observed_seconds"] == 3600
+    assert slot["arrivals"] == 1
+
+
+def test_aggregate_peak_at_aligned_to_bucket(tmp_path):
+    history = make_history(tmp_path, minute_capacity=1000)
+    history.record(1, 1, ts=T0 + 125)
+    history.record(2, 1, ts=T0 + 130)
+
+    result = history.aggregate(T0 + 95, T0 + 300)
+    assert result["peak_occupied"] == 2
+    assert result["peak_at"] == T0 + 120
@@ -15,6 +15,8 @@ from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import shutil
 
+from utils.latency import file_io_latency
+
 logger = logging.getLogger(__name__)
 
 class FileManager:
@@ -90,20 +92,22 @@ class FileManager:
             
             # Create backup if file exists and backup is requested
             if create_backup and os.path.exists(file_path):
-                backup_success, backup_msg = FileManager._create_backup(file_path)
-                if not backup_success:
-                    logger.warning(f"Backup creation failed: {backup_msg}")
-                else:
-                    # Clean up old backups after creating new one
-                    cleanup_success, cleanup_msg = FileManager.cleanup_backups(file_path, max_backups)
-                    if cleanup_success:
-                        logger.debug(f"Backup cleanup: {cleanup_msg}")
+                with file_io_latency.span(f"backup:{os.path.basename(file_path)}"):
+                    backup_success, backup_msg = FileManager._create_backup(file_path)
+                    if not backup_success:
+                        logger.warning(f"Backup creation failed: {backup_msg}")
                     else:
-                        logger.warning(f"Backup cleanup failed: {cleanup_msg}")
+                        # Clean up old backups after creating new one
+                        cleanup_success, cleanup_msg = FileManager.cleanup_backups(file_path, max_backups)
+                        if cleanup_success:
+                            logger.debug(f"Backup cleanup: {cleanup_msg}")
+                        else:
+                            logger.warning(f"Backup cleanup failed: {cleanup_msg}")
             
             # Write data to file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with file_io_latency.span(f"write:{os.path.basename(file_path)}"):
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
             
             logger.debug(f"Successfully wrote JSON file: {file_path}")
             return True, f"File written successfully: {file_path}"
@@ -0,0 +1,223 @@
+"""
+HTTP Client - requests.Session dùng chung cho thiết bị phần cứng (ESP32)
+
+Chức năng chính:
+- Keep-alive + connection pool (HTTPAdapter): không mở TCP mới cho mỗi lần poll / health check
+- Retry có giới hạn cho lỗi kết nối, timeout và HTTP 502/503/504, backoff lũy thừa có jitter
+- Circuit breaker: sau N lần lỗi liên tiếp thì fail fast (không chờ timeout) trong reset_timeout giây,
+  sau đó cho 1 request thử (half-open) để kiểm tra thiết bị đã sống lại chưa
+- Thống kê requests / retries / failures / short_circuited cho monitoring
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Circuit breaker đang mở - request bị từ chối ngay, không gửi tới thiết bị"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker 3 trạng thái: closed -> open -> half_open -> closed/open
+
+    Attributes:
+        failure_threshold: Số lần lỗi liên tiếp để mở breaker
+        reset_timeout: Giây giữ trạng thái open trước khi cho request thử
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 15.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened_count = 0
+        self.last_failure: Optional[str] = None
+        self.last_state_change: Optional[str] = None
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.info(f"Circuit breaker: {self._state} -> {state}")
+            self._state = state
+            self.last_state_change = datetime.now(timezone.utc).isoformat()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """True nếu được gửi request (half-open chỉ cho 1 request thử tại 1 thời điểm)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, reason: str = ''):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            self.last_failure = reason
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def get_status(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 2)
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout,
+                "retry_in_seconds": retry_in,
+                "opened_count": self.opened_count,
+                "last_failure": self.last_failure,
+                "last_state_change": self.last_state_change
+            }
+
+
+class ResilientHTTPClient:
+    """
+    Session dùng chung cho 1 thiết bị (pool + retry + circuit breaker)
+
+    Dùng như requests: client.get(url, timeout=...) / client.post(url, ...), trả về requests.Response.
+    Lỗi sau khi hết retry được raise lại nguyên bản (ConnectionError, Timeout, ...);
+    breaker mở thì raise CircuitOpenError ngay.
+    """
+
+    def __init__(self, name: str, pool_size: int = 4, retries: int = 2, backoff: float = 0.2,
+                 connect_timeout: Optional[float] = None, failure_threshold: int = 3,
+                 reset_timeout: float = 15.0):
+        self.name = name
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "short_circuited": 0
+        }
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _timeout(self, timeout):
+        """(connect, read) timeout: connect ngắn để thiết bị tắt máy không giữ caller cả read timeout"""
+        if self.connect_timeout is None or timeout is None or isinstance(timeout, tuple):
+            return timeout
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def _sleep_backoff(self, attempt: int):
+        # Full jitter: ngẫu nhiên trong [0, backoff * 2^attempt] để nhiều caller không retry cùng lúc
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Gửi request qua session dùng chung
+
+        Args:
+            method: HTTP method
+            url: URL đầy đủ
+            retries: Số lần retry (mặc định self.retries; nên để 0 cho request không idempotent)
+            **kwargs: Tham số cho requests (timeout, json, ...)
+        """
+        if not self.breaker.allow_request():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name} circuit open - request to {url} rejected")
+
+        self._count("requests")
+        kwargs["timeout"] = self._timeout(kwargs.get("timeout"))
+        max_retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                    response.close()
+                    raise requests.exceptions.HTTPError(f"{response.status_code} from {url}", response=response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.HTTPError) as e:
+                if attempt < max_retries:
+                    attempt += 1
+                    self._count("retries")
+                    self._sleep_backoff(attempt - 1)
+                    continue
+                self._count("failures")
+                self.breaker.record_failure(type(e).__name__)
+                raise
+            except Exception as e:
+                # Lỗi khác (ChunkedEncodingError, ContentDecodingError, InvalidURL...) không retry
+                # nhưng vẫn phải ghi nhận để trả lại lượt probe half-open
+                self._count("failures")
+                self.breaker.record_failure(type(e).__name__)
+                raise
+
+            if response.status_code >= 500:
+                self._count("failures")
+                self.breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                self.breaker.record_success()
+            return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            "retry_limit": self.retries,
+            "backoff_seconds": self.backoff,
+            "connect_timeout": self.connect_timeout,
+            "circuit_breaker": self.breaker.get_status()
+        })
+        return stats
@@ -0,0 +1,154 @@
+"""
+Latency Recorder - Đo thời gian từng giai đoạn xử lý (span/timer) và histogram in-memory
+
+Chức năng chính:
+- Span nhẹ (context manager dùng perf_counter_ns), overhead vài µs
+- Histogram log-linear cho mỗi stage: bộ nhớ cố định, sai số tương đối <= 12.5%
+- Tính p50/p95/p99, min/max/mean cho từng stage
+- Thread-safe (Flask chạy nhiều thread)
+"""
+import threading
+from time import perf_counter_ns
+from typing import Dict, Any, Optional
+
+# Mỗi "octave" (2^k .. 2^(k+1)) chia thành 8 sub-bucket
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_BUCKETS = 64 * SUB_BUCKETS
+
+
+def _bucket_index(value_ns: int) -> int:
+    """Index bucket cho 1 giá trị (ns)"""
+    if value_ns < 2 * SUB_BUCKETS:
+        return value_ns
+    shift = value_ns.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value_ns >> shift)
+
+
+def _bucket_upper_bound(index: int) -> int:
+    """Giá trị lớn nhất (ns) thuộc bucket index"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index - shift * SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Histogram thời gian cho 1 stage"""
+
+    __slots__ = ("counts", "count", "total_ns", "min_ns", "max_ns", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * MAX_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self._lock = threading.Lock()
+
+    def record(self, value_ns: int):
+        """Ghi nhận 1 giá trị (ns)"""
+        index = _bucket_index(value_ns)
+        if index >= MAX_BUCKETS:
+            index = MAX_BUCKETS - 1
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ns += value_ns
+            if value_ns > self.max_ns:
+                self.max_ns = value_ns
+            if self.min_ns is None or value_ns < self.min_ns:
+                self.min_ns = value_ns
+
+    def percentile(self, percent: float) -> Optional[int]:
+        """Giá trị (ns) tại percentile (cận trên của bucket, không vượt quá max)"""
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = max(1, int(self.count * percent / 100.0 + 0.999999))
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= rank:
+                    return min(_bucket_upper_bound(index), self.max_ns)
+            return self.max_ns
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Thống kê dạng dict, đơn vị mili giây"""
+        to_ms = lambda value: round(value / 1_000_000, 3) if value is not None else None
+        return {
+            "count": self.count,
+            "mean_ms": to_ms(self.total_ns / self.count) if self.count else None,
+            "min_ms": to_ms(self.min_ns),
+            "max_ms": to_ms(self.max_ns) if self.count else None,
+            "p50_ms": to_ms(self.percentile(50)),
+            "p95_ms": to_ms(self.percentile(95)),
+            "p99_ms": to_ms(self.percentile(99))
+        }
+
+
+class _Span:
+    """Context manager đo 1 stage; dùng __slots__ để giữ overhead thấp"""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: LatencyHistogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.record(perf_counter_ns() - self._start)
+        return False
+
+
+class LatencyRecorder:
+    """
+    Tập hợp histogram theo tên stage
+
+    Cách dùng:
+        with scan_latency.span("get_card"):
+            card_service.get_card(uid)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def span(self, stage: str) -> _Span:
+        """Tạo span đo thời gian cho stage"""
+        return _Span(self._histogram(stage))
+
+    def record(self, stage: str, value_ns: int):
+        """Ghi trực tiếp 1 giá trị (ns) cho stage"""
+        self._histogram(stage).record(value_ns)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Thống kê của tất cả stage"""
+        return {stage: histogram.snapshot() for stage, histogram in list(self._histograms.items())}
+
+    def reset(self):
+        """Xóa toàn bộ số liệu"""
+        with self._lock:
+            self._histograms = {}
+
+
+# Recorder cho luồng quẹt thẻ (POST /api/cards/scan)
+scan_latency = LatencyRecorder("card_scan")
+
+# Recorder cho ghi file JSON (FileManager.write_json): backup và write theo tên file
+file_io_latency = LatencyRecorder("file_io")
+
+# Recorder cho đăng nhập (POST /api/auth/login, services/password_verifier.py)
+auth_latency = LatencyRecorder("auth")
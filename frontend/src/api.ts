@@ -105,6 +105,115 @@ api.interceptors.response.use(
   }
 );
 
+/**
+ * Event nhận từ /api/events/stream (data = payload JSON của event backend)
+ */
+export interface StreamEvent {
+  type: string;
+  data: any;
+}
+
+/**
+ * Tùy chọn cho subscribeEvents
+ * - resync: tải lại toàn bộ dữ liệu qua REST (event "reset", polling dự phòng)
+ * - fallbackPollMs: chu kỳ polling khi SSE chưa mở / bị lỗi; 0 = không polling
+ * - openResyncMs: chu kỳ resync thưa khi SSE đang mở (dữ liệu đổi qua API không phát event); 0 = tắt
+ * - debounceMs: thời gian gom event
+ */
+export interface EventSubscriptionOptions {
+  resync: () => void;
+  fallbackPollMs?: number;
+  openResyncMs?: number;
+  debounceMs?: number;
+}
+
+/**
+ * Đăng ký nhận event real-time qua Server-Sent Events (/api/events/stream)
+ * - 1 kết nối cho mỗi tab thay cho setInterval polling: khi EventSource đã mở thì chỉ resync thưa
+ *   (openResyncMs), polling dày (fallbackPollMs) lúc chưa kết nối, sau onerror hoặc trình duyệt không có EventSource
+ * - EventSource tự kết nối lại và gửi Last-Event-ID để nhận nốt event bị lỡ;
+ *   backend từ chối hẳn (503 khi đủ kết nối) -> giữ polling và thử mở lại sau
+ * - Event "reset": backend không resume được -> gọi resync() tải lại toàn bộ dữ liệu
+ * - Gom nhiều event liên tiếp (kèm payload) thành 1 lần gọi onEvents (debounceMs)
+ * @param eventTypes - Tên event: SlotChanged, CardEntered, CardExited, UnknownCardSeen
+ * @param onEvents - Callback nhận danh sách event (áp payload vào state, không cần gọi lại REST)
+ * @param options - resync / fallbackPollMs / openResyncMs / debounceMs
+ * @returns Hàm hủy đăng ký (gọi trong cleanup của useEffect)
+ */
+export const subscribeEvents = (
+  eventTypes: string[],
+  onEvents: (events: StreamEvent[]) => void,
+  { resync, fallbackPollMs = 0, openResyncMs = 0, debounceMs = 300 }: EventSubscriptionOptions
+): (() => void) => {
+  let pollTimer: ReturnType<typeof setInterval> | null = null;
+  let pollMs = 0;
+  let flushTimer: ReturnType<typeof setTimeout> | null = null;
+  let reopenTimer: ReturnType<typeof setTimeout> | null = null;
+  let source: EventSource | null = null;
+  let pending: StreamEvent[] = [];
+  let closed = false;
+
+  const setPolling = (intervalMs: number) => {
+    if (pollTimer && pollMs === intervalMs) return;
+    if (pollTimer) clearInterval(pollTimer);
+    pollTimer = intervalMs > 0 ? setInterval(resync, intervalMs) : null;
+    pollMs = intervalMs;
+  };
+  const startPolling = () => setPolling(fallbackPollMs);
+
+  const flush = () => {
+    flushTimer = null;
+    const events = pending;
+    pending = [];
+    if (events.length > 0) onEvents(events);
+  };
+  const handler = (e: MessageEvent) => {
+    let data: any = null;
+    try {
+      data = JSON.parse(e.data);
+    } catch {
+      return;
+    }
+    pending.push({ type: e.type, data });
+    if (!flushTimer) flushTimer = setTimeout(flush, debounceMs);
+  };
+  const onReset = () => {
+    // Event đang gom có thể đã lỗi thời - bỏ và tải lại toàn bộ
+    pending = [];
+    resync();
+  };
+
+  const open = () => {
+    if (closed) return;
+    source = new EventSource(`${API_BASE_URL}/api/events/stream`);
+    source.onopen = () => setPolling(openResyncMs);
+    source.onerror = () => {
+      startPolling();
+      if (source && source.readyState === EventSource.CLOSED) {
+        // Trình duyệt không tự kết nối lại sau lỗi HTTP -> thử mở lại sau 1 chu kỳ polling
+        source = null;
+        reopenTimer = setTimeout(open, Math.max(fallbackPollMs, 30000));
+      }
+    };
+    eventTypes.forEach(type => source!.addEventListener(type, handler as EventListener));
+    source.addEventListener('reset', onReset);
+  };
+
+  // Polling dự phòng chạy cho đến khi EventSource mở được
+  startPolling();
+  if (typeof EventSource !== 'undefined') {
+    open(); // Trình duyệt cũ: chỉ dùng polling
+  }
+
+  return () => {
+    closed = true;
+    setPolling(0);
+    if (flushTimer) clearTimeout(flushTimer);
+    if (reopenTimer) clearTimeout(reopenTimer);
+    if (source) source.close();
+  };
+};
+
 /**
  * API Client Object - Tập hợp tất cả methods để giao tiếp với backend
  * Mỗi method tương ứng với 1 endpoint và có error handling
@@ -6,10 +6,11 @@
  * - Tỷ lệ sử dụng bãi xe với thanh progress bar
  * - Danh sách hoạt động gần đây (10 log mới nhất)
  * - Các thao tác nhanh: backup dữ liệu, sửa lỗi dữ liệu
- * - Tự động refresh mỗi 30 giây
+ * - Cập nhật real-time qua SSE; polling 30 giây khi mất kết nối SSE, resync 2 phút khi đang kết nối
  */
 
 import React, { useState, useEffect } from 'react';
+import { subscribeEvents, StreamEvent } from '../api';
 
 /**
  * Interface định nghĩa cấu trúc dữ liệu thống kê dashboard
@@ -104,20 +105,65 @@ const Dashboard: React.FC = () => {
     }
   };
 
+  /**
+   * Hàm chỉ tải lại 10 log gần đây (event SSE đã đủ để cập nhật thống kê)
+   */
+  const fetchRecentLogs = async () => {
+    try {
+      const response = await fetch(`${getApiBaseUrl()}/api/cards/logs?limit=10`);
+      if (response.ok) {
+        setRecentLogs(await response.json());
+      }
+    } catch (err) {
+      console.error('Error fetching recent logs:', err);
+    }
+  };
+
+  /**
+   * Áp payload event SSE vào state
+   * - CardEntered / CardExited chỉ phát khi thẻ thực sự đổi trạng thái -> cộng/trừ số xe trong/ngoài bãi
+   * - Danh sách log cần id / details từ backend -> tải lại riêng 10 log (1 request cho cả lô event)
+   */
+  const applyEvents = (events: StreamEvent[]) => {
+    const delta = events.reduce((sum, e) => {
+      if (e.type === 'CardEntered') return sum + 1;
+      if (e.type === 'CardExited') return sum - 1;
+      return sum;
+    }, 0);
+
+    if (delta !== 0) {
+      setStats(prev => {
+        if (!prev) return prev;
+        const inside = Math.min(prev.total_cards, Math.max(0, prev.inside_parking + delta));
+        return {
+          ...prev,
+          inside_parking: inside,
+          outside_parking: prev.total_cards - inside,
+          occupancy_rate: prev.total_cards > 0 ? (inside / prev.total_cards) * 100 : 0
+        };
+      });
+    }
+    setLastUpdate(new Date());
+    fetchRecentLogs();
+  };
+
   /**
    * useEffect Hook - Xử lý lifecycle component
    * - Fetch dữ liệu lần đầu khi component mount
-   * - Thiết lập auto-refresh mỗi 30 giây
-   * - Cleanup interval khi component unmount
+   * - Real-time qua SSE: xe vào/ra hoặc thẻ lạ -> áp event vào state, không gọi lại /statistics
+   * - Polling 30 giây khi SSE chưa mở / mất kết nối; event "reset" -> tải lại toàn bộ
+   * - Khi SSE đang mở vẫn resync toàn bộ mỗi 2 phút: thêm / sửa / xóa thẻ, restore, fix-data
+   *   qua API không phát event nên thống kê tính từ event có thể lệch
+   * - Cleanup kết nối SSE và interval khi component unmount
    */
   useEffect(() => {
     fetchStats(); // Fetch dữ liệu ngay khi component được render
-    
-    // Thiết lập auto refresh mỗi 30 giây để cập nhật real-time
-    const interval = setInterval(fetchStats, 30000);
-    
-    // Cleanup function - xóa interval khi component unmount
-    return () => clearInterval(interval);
+
+    return subscribeEvents(['CardEntered', 'CardExited', 'UnknownCardSeen'], applyEvents, {
+      resync: fetchStats,
+      fallbackPollMs: 30000,
+      openResyncMs: 120000
+    });
   }, []); // Empty dependency array - chỉ chạy 1 lần khi mount
 
   /**
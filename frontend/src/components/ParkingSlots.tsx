@@ -1,10 +1,10 @@
 /**
  * ParkingSlots.tsx - Component quản lý và hiển thị trạng thái vị trí đỗ xe
- * Chức năng: Monitoring real-time từ ESP32, hiển thị sơ đồ bãi đỗ, auto refresh/reset
+ * Chức năng: Monitoring real-time từ ESP32 (SSE), hiển thị sơ đồ bãi đỗ, auto refresh/reset
  */
 
-import React, { useState, useEffect } from 'react';
-import { parkingApi } from '../api';
+import React, { useState, useEffect, useRef } from 'react';
+import { parkingApi, subscribeEvents, StreamEvent } from '../api';
 
 /**
  * Interface định nghĩa cấu trúc dữ liệu từ ESP32 parking slots API
@@ -61,6 +61,10 @@ const ParkingSlots: React.FC<ParkingSlotsProps> = ({ onBack }) => {
   /** Bật/tắt auto reset cảm biến khi refresh */
   const [autoResetEnabled, setAutoResetEnabled] = useState(false); // FIXED: Tắt auto reset mặc định
 
+  /** Số slot của snapshot đang hiển thị (callback SSE đăng ký 1 lần, không đọc được state mới) */
+  const slotCountRef = useRef(0);
+  slotCountRef.current = slotsData?.esp32_data?.data?.length ?? 0;
+
   // ================== API FUNCTIONS ==================
   
   /**
@@ -135,16 +139,65 @@ const ParkingSlots: React.FC<ParkingSlotsProps> = ({ onBack }) => {
   // ================== EFFECTS ==================
   
   /**
-   * Auto refresh effect với reset tùy chọn
-   * Chạy định kỳ theo autoRefreshInterval
-   * Có thể kèm auto reset nếu autoResetEnabled = true
+   * Áp event SlotChanged vào sơ đồ hiện tại (slot_id toàn cục, bắt đầu từ 1) và tính lại summary
+   * Slot nằm ngoài snapshot đang hiển thị (board khác / chưa có dữ liệu) -> đọc lại snapshot qua REST
+   */
+  const applySlotEvents = (events: StreamEvent[]) => {
+    const slotCount = slotCountRef.current;
+    const updates = events.map(({ data }) => ({
+      index: Number(data?.slot_id) - 1,
+      status: data?.new_status === 1 ? 1 : 0
+    }));
+    if (slotCount === 0 || updates.some(({ index }) => !Number.isInteger(index) || index < 0 || index >= slotCount)) {
+      fetchParkingSlots(false);
+      return;
+    }
+
+    setSlotsData(prev => {
+      if (!prev?.esp32_data?.data) return prev;
+      const slots = [...prev.esp32_data.data];
+      updates.forEach(({ index, status }) => {
+        if (index < slots.length) slots[index] = status;
+      });
+      const occupied = slots.filter(status => status === 1).length;
+      return {
+        ...prev,
+        esp32_data: { ...prev.esp32_data, data: slots },
+        summary: {
+          total_slots: slots.length,
+          occupied,
+          available: slots.length - occupied,
+          occupancy_rate: slots.length > 0 ? Math.round((occupied / slots.length) * 1000) / 10 : 0
+        },
+        last_updated: new Date().toISOString()
+      };
+    });
+  };
+
+  /**
+   * Real-time qua SSE: slot đổi trạng thái -> áp payload event, không gọi lại REST
+   * Polling theo autoRefreshInterval chỉ chạy khi SSE chưa mở / mất kết nối; event "reset" -> đọc lại snapshot
+   */
+  useEffect(() => {
+    if (!autoRefresh) {
+      return;
+    }
+    fetchParkingSlots(false); // Lần đầu không reset
+    return subscribeEvents(['SlotChanged'], applySlotEvents, {
+      resync: () => fetchParkingSlots(false),
+      fallbackPollMs: autoRefreshInterval * 60 * 1000 // Convert phút sang ms
+    });
+  }, [autoRefresh, autoRefreshInterval]);
+
+  /**
+   * Auto reset cảm biến định kỳ (tùy chọn) - là thao tác trên ESP32 nên vẫn chạy theo interval
+   * kể cả khi SSE đang kết nối
    */
   useEffect(() => {
-    if (autoRefresh) {
-      fetchParkingSlots(false); // Lần đầu không reset
+    if (autoRefresh && autoResetEnabled) {
       const interval = setInterval(() => {
-        fetchParkingSlots(autoResetEnabled); // Theo cài đặt auto reset
-      }, autoRefreshInterval * 60 * 1000); // Convert phút sang ms
+        fetchParkingSlots(true);
+      }, autoRefreshInterval * 60 * 1000);
       return () => clearInterval(interval);
     }
   }, [autoRefresh, autoRefreshInterval, autoResetEnabled]);
@@ -326,7 +379,7 @@ const ParkingSlots: React.FC<ParkingSlotsProps> = ({ onBack }) => {
                     {autoRefresh && autoResetEnabled 
                       ? `Tự động làm mới + reset cảm biến mỗi ${autoRefreshInterval} phút`
                       : autoRefresh 
-                        ? `Tự động làm mới (không reset) mỗi ${autoRefreshInterval} phút`
+                        ? `Real-time qua SSE, làm mới mỗi ${autoRefreshInterval} phút khi mất kết nối`
                         : 'Chỉ làm mới thủ công'
                     }
                   </div>
@@ -197,6 +197,16 @@ void handleGetData() {
     }
   }
   
+  // Khoảng cách thô (cm) - backend tự ngưỡng hóa với hysteresis + debounce; lỗi = null
+  JsonArray distancesArray = doc.createNestedArray("distances");
+  for (int i = 0; i < 6; i++) {
+    if (currentDistances[i] == -1) {
+      distancesArray.add(serialized("null"));
+    } else {
+      distancesArray.add(currentDistances[i]);
+    }
+  }
+  
   // WiFi info as bonus (không làm ảnh hưởng server)
   doc["wifi_connected"] = (WiFi.status() == WL_CONNECTED);
   doc["wifi_rssi"] = WiFi.RSSI();
@@ -49,6 +49,9 @@ uint16_t serverPort = 5000;
 // String serverIP = "192.168.1.50";      // // IP backend trên local WiFi
 // uint16_t serverPort = 5000;
 
+// Endpoint quẹt thẻ: 1 = /api/cards/scan/lite (plain text "OPEN 0"), 0 = /api/cards/scan (JSON)
+#define USE_LITE_SCAN 1
+
 // WEB SERVER cho health check
 WiFiServer webServer(80);
 
@@ -553,16 +556,26 @@ void sendRFIDToServer(const String &uid, const String &direction)
 
   if (client.connect(serverIP.c_str(), serverPort))
   {
+#if USE_LITE_SCAN
+    // Body rút gọn: "<UID> <DIRECTION>"
+    String requestBody = uid + " " + direction;
+
+    // Tạo HTTP POST request tới /api/cards/scan/lite
+    String httpRequest = "POST /api/cards/scan/lite HTTP/1.1\r\n";
+    httpRequest += "Host: " + serverIP + "\r\n";
+    httpRequest += "Content-Type: text/plain\r\n";
+#else
     // Tạo JSON body theo format backend expect
-    String jsonBody = "{\"card_id\":\"" + uid + "\",\"direction\":\"" + direction + "\",\"timestamp\":\"\"}";
+    String requestBody = "{\"card_id\":\"" + uid + "\",\"direction\":\"" + direction + "\",\"timestamp\":\"\"}";
 
     // Tạo HTTP POST request tới /api/cards/scan
     String httpRequest = "POST /api/cards/scan HTTP/1.1\r\n";
     httpRequest += "Host: " + serverIP + "\r\n";
     httpRequest += "Content-Type: application/json\r\n";
-    httpRequest += "Content-Length: " + String(jsonBody.length()) + "\r\n";
+#endif
+    httpRequest += "Content-Length: " + String(requestBody.length()) + "\r\n";
     httpRequest += "Connection: close\r\n\r\n";
-    httpRequest += jsonBody;
+    httpRequest += requestBody;
 
     client.print(httpRequest);
 
@@ -596,9 +609,21 @@ void sendRFIDToServer(const String &uid, const String &direction)
         body = response; // Fallback nếu không tìm được header
       }
 
+#if USE_LITE_SCAN
+      // Response /api/cards/scan/lite: "OPEN 0", "DENY P", "UNKNOWN U", "ERROR E"
+      bool scanAccepted = body.startsWith("OPEN");
+      bool scanRejected = body.startsWith("DENY") || body.startsWith("UNKNOWN");
+      if (!scanAccepted && body.length() > 0)
+      {
+        Serial.println("Scan result: " + body);
+      }
+#else
       // LOGIC KIỂM TRA JSON RESPONSE từ /api/cards/scan
       // Ưu tiên kiểm tra JSON success thay vì HTTP status
-      if (body.indexOf("\"success\":true") >= 0 || body.indexOf("\"success\": true") >= 0)
+      bool scanAccepted = body.indexOf("\"success\":true") >= 0 || body.indexOf("\"success\": true") >= 0;
+      bool scanRejected = body.indexOf("\"success\":false") >= 0 || body.indexOf("\"success\": false") >= 0;
+#endif
+      if (scanAccepted)
       {
         Serial.println("API response: Success");
 
@@ -614,7 +639,7 @@ void sendRFIDToServer(const String &uid, const String &direction)
           openBarrier(barrierOut);
         }
       }
-      else if (body.indexOf("\"success\":false") >= 0 || body.indexOf("\"success\": false") >= 0)
+      else if (scanRejected)
       {
         Serial.println("API response: Failed");
       }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+allowlist_bloom_decoder.py - Reference decoder cho GET /api/cards/allowlist.bloom
+
+Cài đặt tham chiếu (không phụ thuộc backend) để port sang firmware reader:
+  - đọc header + bit array
+  - kiểm tra UID: h1 = FNV-1a 32-bit(uid), h2 = FNV-1a 32-bit(uid, basis 0x9747B28C) | 1,
+    bit thứ i = (h1 + i * h2) mod 2^32 mod m, uid viết hoa, bỏ khoảng trắng
+  - tải lại khi có version mới (If-None-Match -> 304 nếu không đổi)
+
+Format (big-endian):
+  magic "BLM1" | version uint32 | m uint32 | k uint8 | count uint32 | bits ceil(m/8) byte
+  bit i = byte[i >> 3] & (1 << (i & 7))
+
+Usage:
+  python allowlist_bloom_decoder.py <UID> [<UID> ...]              # tải từ backend
+  python allowlist_bloom_decoder.py --file allowlist.bin <UID>     # đọc từ file đã lưu
+  python allowlist_bloom_decoder.py --save allowlist.bin           # tải và lưu file
+
+Kết quả: "MAYBE" = có thể đã đăng ký (cho qua, báo backend sau), "NO" = chắc chắn chưa đăng ký.
+"""
+
+import argparse
+import struct
+import sys
+
+import requests
+
+# Backend API URL
+BACKEND_URL = "http://localhost:5000"
+
+MAGIC = b"BLM1"
+HEADER = struct.Struct(">4sIIBI")
+FNV_OFFSET_BASIS = 0x811C9DC5
+FNV_PRIME = 0x01000193
+SEED2 = 0x9747B28C
+
+
+def fnv1a_32(data, basis=FNV_OFFSET_BASIS):
+    value = basis
+    for byte in data:
+        value = ((value ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return value
+
+
+class AllowlistBloom:
+    """Bloom filter đã decode"""
+
+    def __init__(self, payload):
+        if len(payload) < HEADER.size:
+            raise ValueError("Payload quá ngắn")
+        magic, self.version, self.m, self.k, self.count = HEADER.unpack_from(payload)
+        if magic != MAGIC:
+            raise ValueError(f"Sai magic: {magic!r}")
+        self.bits = payload[HEADER.size:]
+        if self.m == 0 or len(self.bits) * 8 < self.m:
+            raise ValueError("Bit array không khớp với m")
+
+    def might_contain(self, uid):
+        data = uid.replace(" ", "").upper().encode("ascii", errors="ignore")
+        h1 = fnv1a_32(data)
+        h2 = fnv1a_32(data, SEED2) | 1
+        for i in range(self.k):
+            position = ((h1 + i * h2) & 0xFFFFFFFF) % self.m
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+def fetch(url, known_version=None, timeout=5):
+    """
+    Tải filter từ backend
+
+    Returns:
+        bytes payload, hoặc None nếu version không đổi (304)
+    """
+    headers = {}
+    if known_version is not None:
+        headers["If-None-Match"] = f'"{known_version}"'
+    response = requests.get(f"{url}/api/cards/allowlist.bloom", headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    return response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference decoder cho allowlist bloom filter")
+    parser.add_argument("uids", nargs="*", help="UID cần kiểm tra")
+    parser.add_argument("--url", default=BACKEND_URL, help="Backend URL")
+    parser.add_argument("--file", help="Đọc filter từ file thay vì backend")
+    parser.add_argument("--save", help="Lưu filter tải về ra file")
+    args = parser.parse_args()
+
+    try:
+        if args.file:
+            with open(args.file, "rb") as f:
+                payload = f.read()
+        else:
+            payload = fetch(args.url.rstrip("/"))
+    except (OSError, requests.exceptions.RequestException) as e:
+        print(f"❌ Không tải được filter: {e}")
+        sys.exit(1)
+
+    if args.save:
+        with open(args.save, "wb") as f:
+            f.write(payload)
+
+    try:
+        bloom = AllowlistBloom(payload)
+    except ValueError as e:
+        print(f"❌ Filter không hợp lệ: {e}")
+        sys.exit(1)
+
+    print(f"version={bloom.version} m={bloom.m} k={bloom.k} count={bloom.count} size={len(payload)} bytes")
+    for uid in args.uids:
+        print(f"{uid}: {'MAYBE' if bloom.might_contain(uid) else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
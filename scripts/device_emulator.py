@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+device_emulator.py - Giả lập board cảm biến ESP32 và cổng RFID UNO R4 trên 1 máy Linux
+
+Thay cho phần cứng khi benchmark / CI poller, circuit breaker và pipeline slot:
+  1. N board ESP32 ảo, mỗi board 1 port (http://host:base_port+i), phục vụ đúng API của esp32_main.ino:
+     GET /data, POST /detect -> {"success", "soIC", "totalSensors", "timestamp", "data", "distances", ...}
+  2. Cảm biến có động học: xe đến theo Poisson (--arrivals-per-hour), đỗ trung bình --dwell-minutes,
+     khoảng cách có nhiễu (--noise-cm), mẫu nhiễu lọt vào vùng hysteresis (--flap-rate), cảm biến lỗi (-1 / null)
+     --speed tăng tốc thời gian (60 = 1 giờ mô phỏng trong 1 phút)
+  3. Lỗi tiêm vào theo xác suất mỗi request: latency + jitter, treo quá timeout (--timeout-rate),
+     HTTP 500/503 (--error-rate), payload hỏng (--malformed-rate), cắt kết nối (--drop-rate),
+     và mất kết nối theo chu kỳ (--outage-every / --outage-duration) để thử circuit breaker
+  4. Board có thể đẩy reading lên backend (--push-interval -> POST /api/parking-slots/batch, distance_cm)
+  5. Cổng RFID ảo (--gates): quẹt thẻ IN/OUT xen kẽ đúng format UNO R4 vào /api/cards/scan
+     (hoặc /api/cards/scan/lite với --lite), kèm thẻ lạ (--unknown-rate)
+  6. Control API (--control-port): GET /emulator/status, POST /emulator/boards/<id> đổi lỗi lúc đang chạy,
+     POST /emulator/boards/<id>/slots/<slot> {"occupied": true} ép trạng thái 1 slot
+
+Usage:
+  python device_emulator.py --boards 4 --sensors 6 --print-controllers     # in ESP32_CONTROLLERS cho backend
+  ESP32_CONTROLLERS='<json đã in>' python -m backend.run                    # backend đọc các board ảo
+  python device_emulator.py --boards 2 --latency-ms 50 --jitter-ms 30 --timeout-rate 0.05
+  python device_emulator.py --outage-every 60 --outage-duration 20         # thử circuit breaker
+  python device_emulator.py --gates 2 --gate-rate 30 --cards 20 --seed-cards -d 120 --json
+
+Lưu ý: --gates / --push-interval / --seed-cards gửi request thật tới backend (--url).
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Backend API URL
+BACKEND_URL = "http://localhost:5000"
+
+# Ngưỡng ngưỡng hóa trong firmware (esp32_main.ino: currentDistances[i] <= 15)
+FIRMWARE_THRESHOLD_CM = 15
+
+FAULT_FIELDS = ("latency_ms", "jitter_ms", "timeout_rate", "hang_seconds", "error_rate",
+                "malformed_rate", "drop_rate", "sensor_error_rate")
+
+
+def percentile(values, percent):
+    """Percentile theo nearest-rank"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Clock:
+    """Thời gian mô phỏng (tăng tốc theo speed)"""
+
+    def __init__(self, speed):
+        self.speed = max(speed, 0.001)
+        self.started = time.monotonic()
+
+    def now(self):
+        return (time.monotonic() - self.started) * self.speed
+
+
+class VirtualSensor:
+    """1 cảm biến siêu âm trên 1 slot"""
+
+    def __init__(self, rng, clock, arrivals_per_hour, dwell_minutes, noise_cm, flap_rate):
+        self.rng = rng
+        self.clock = clock
+        self.arrival_rate = arrivals_per_hour / 3600.0
+        self.dwell_seconds = dwell_minutes * 60.0
+        self.noise_cm = noise_cm
+        self.flap_rate = flap_rate
+        self.vacant_distance = rng.uniform(60, 200)  # khoảng cách tới sàn khi trống
+        self.occupied_distance = rng.uniform(3, 9)   # khoảng cách tới nóc xe
+        self.occupied = rng.random() < 0.3
+        self.forced = False
+        self.next_change = self._schedule(self.clock.now())
+
+    def _schedule(self, now):
+        if self.occupied:
+            return now + self.rng.expovariate(1.0 / self.dwell_seconds) if self.dwell_seconds > 0 else math.inf
+        return now + self.rng.expovariate(self.arrival_rate) if self.arrival_rate > 0 else math.inf
+
+    def force(self, occupied):
+        """Ép trạng thái (control API); slot bị ép không tự đổi nữa"""
+        self.occupied = occupied
+        self.forced = True
+
+    def read(self, sensor_error_rate):
+        """Khoảng cách cm (int), -1 = cảm biến không phản hồi (giống firmware)"""
+        now = self.clock.now()
+        while not self.forced and now >= self.next_change:
+            self.occupied = not self.occupied
+            self.next_change = self._schedule(self.next_change)
+        if self.rng.random() < sensor_error_rate:
+            return -1
+        if self.rng.random() < self.flap_rate:
+            # Mẫu nhiễu quanh ngưỡng: backend phải lọc bằng hysteresis + debounce
+            return int(self.rng.uniform(FIRMWARE_THRESHOLD_CM - 6, FIRMWARE_THRESHOLD_CM + 6))
+        base = self.occupied_distance if self.occupied else self.vacant_distance
+        return max(2, int(round(self.rng.gauss(base, self.noise_cm))))
+
+
+class VirtualBoard:
+    """1 board ESP32 ảo: cảm biến + lỗi tiêm vào + thống kê"""
+
+    def __init__(self, board_id, port, sensors, faults, dynamics, outage, rng, clock):
+        self.id = board_id
+        self.port = port
+        self.rng = rng
+        self.clock = clock
+        self.faults = dict(faults)
+        self.outage_every, self.outage_duration = outage
+        self.forced_down = False
+        self.started = time.monotonic()
+        self.sensors = [VirtualSensor(rng, clock, **dynamics) for _ in range(sensors)]
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "timeouts": 0, "errors": 0, "malformed": 0,
+                      "dropped": 0, "refused_offline": 0, "detects": 0, "pushes": 0, "push_failures": 0}
+        self.server = None
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def is_down(self):
+        if self.forced_down:
+            return True
+        if not self.outage_every:
+            return False
+        return (time.monotonic() - self.started) % self.outage_every < self.outage_duration
+
+    def read_distances(self):
+        with self.lock:
+            return [sensor.read(self.faults["sensor_error_rate"]) for sensor in self.sensors]
+
+    def payload(self, message=None):
+        """JSON giống handleGetData() / handleDetect() của esp32_main.ino"""
+        distances = self.read_distances()
+        body = {
+            "success": True,
+            "soIC": max(1, math.ceil(len(self.sensors) / 8)),
+            "totalSensors": len(self.sensors),
+            "timestamp": int((time.monotonic() - self.started) * 1000),
+            "data": [0 if distance == -1 else (1 if distance <= FIRMWARE_THRESHOLD_CM else 0)
+                     for distance in distances],
+            "distances": [None if distance == -1 else distance for distance in distances],
+            "wifi_connected": True,
+            "wifi_rssi": self.rng.randint(-80, -40)
+        }
+        if message:
+            body["message"] = message
+        return body
+
+    def malformed_body(self):
+        """Các kiểu payload hỏng firmware / WiFi có thể gửi"""
+        good = json.dumps(self.payload())
+        kind = self.rng.choice(["truncated", "missing_data", "wrong_types", "wrong_length", "html", "empty"])
+        if kind == "truncated":
+            return good[:self.rng.randint(1, len(good) - 1)].encode(), "application/json"
+        if kind == "missing_data":
+            body = self.payload()
+            del body["data"]
+            return json.dumps(body).encode(), "application/json"
+        if kind == "wrong_types":
+            body = self.payload()
+            body["data"] = [str(value) for value in body["data"]]
+            return json.dumps(body).encode(), "application/json"
+        if kind == "wrong_length":
+            body = self.payload()
+            body["data"] = body["data"][:max(0, len(body["data"]) - 2)]
+            return json.dumps(body).encode(), "application/json"
+        if kind == "html":
+            return b"<html><body>Captive portal</body></html>", "text/html"
+        return b"", "application/json"
+
+    def update(self, changes):
+        """Đổi cấu hình lỗi lúc đang chạy (control API)"""
+        with self.lock:
+            for name, value in changes.items():
+                if name in FAULT_FIELDS:
+                    self.faults[name] = float(value)
+                elif name == "down":
+                    self.forced_down = bool(value)
+                else:
+                    raise ValueError(f"Unknown setting: {name}")
+
+    def get_status(self):
+        with self.lock:
+            return {
+                "port": self.port,
+                "sensors": len(self.sensors),
+                "occupied": sum(1 for sensor in self.sensors if sensor.occupied),
+                "offline": self.is_down(),
+                "faults": dict(self.faults),
+                **self.stats
+            }
+
+
+class BoardRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler của 1 board (board gắn vào server.board)"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive như ESP32 WebServer + pool của backend
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drop(self):
+        """Cắt kết nối không trả response (board reset / WiFi rớt)"""
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _handle(self, detect):
+        board = self.server.board
+        board._count("requests")
+        faults = board.faults
+        rng = board.rng
+
+        if board.is_down():
+            board._count("refused_offline")
+            return self._drop()
+        if rng.random() < faults["drop_rate"]:
+            board._count("dropped")
+            return self._drop()
+
+        delay = max(0.0, faults["latency_ms"] + rng.uniform(-faults["jitter_ms"], faults["jitter_ms"])) / 1000
+        if rng.random() < faults["timeout_rate"]:
+            board._count("timeouts")
+            delay += faults["hang_seconds"]
+        if delay:
+            time.sleep(delay)
+
+        if rng.random() < faults["error_rate"]:
+            board._count("errors")
+            status = rng.choice([500, 503])
+            return self._send(status, json.dumps({"success": False, "error": f"HTTP {status}"}).encode())
+        if rng.random() < faults["malformed_rate"]:
+            board._count("malformed")
+            body, content_type = board.malformed_body()
+            return self._send(200, body, content_type)
+
+        if detect:
+            board._count("detects")
+            body = board.payload(f"Đã detect lại {len(board.sensors)} cảm biến")
+        else:
+            body = board.payload()
+        board._count("ok")
+        self._send(200, json.dumps(body).encode())
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/data":
+            return self._handle(detect=False)
+        self._send(404, b'{"error": "Not found"}')
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path.split("?")[0] == "/detect":
+            return self._handle(detect=True)
+        self._send(404, b'{"error": "Not found"}')
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class VirtualGate:
+    """Cổng RFID UNO R4 ảo: quẹt thẻ IN/OUT xen kẽ theo tốc độ cố định"""
+
+    def __init__(self, gate_id, cards, rate_per_minute, unknown_rate, lite, timeout, rng):
+        self.id = gate_id
+        self.cards = cards
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else None
+        self.unknown_rate = unknown_rate
+        self.lite = lite
+        self.timeout = timeout
+        self.rng = rng
+        self.session = requests.Session()
+        self.latencies_ms = []
+        self.outcomes = {}
+
+    def scan(self, uid, direction):
+        started = time.perf_counter()
+        try:
+            if self.lite:
+                response = self.session.post(f"{BACKEND_URL}/api/cards/scan/lite", data=f"{uid} {direction}",
+                                             headers={"Content-Type": "text/plain"}, timeout=self.timeout)
+                outcome = response.text.split(" ")[0] if response.text else f"HTTP {response.status_code}"
+            else:
+                response = self.session.post(f"{BACKEND_URL}/api/cards/scan",
+                                             json={"card_id": uid, "direction": direction, "timestamp": ""},
+                                             timeout=self.timeout)
+                outcome = "OPEN" if response.status_code == 200 and response.json().get("success") else \
+                    f"HTTP {response.status_code}"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            outcome = type(e).__name__
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def run(self, stop, card_states, states_lock):
+        next_at = time.monotonic()
+        while self.interval and not stop.is_set():
+            if stop.wait(max(0.0, next_at - time.monotonic())):
+                break
+            next_at += self.interval
+            if self.rng.random() < self.unknown_rate:
+                self.scan(f"FF{self.rng.randrange(16 ** 6):06X}", "IN")
+                continue
+            uid = self.rng.choice(self.cards)
+            with states_lock:
+                direction = "OUT" if card_states.get(uid) else "IN"
+                card_states[uid] = not card_states.get(uid)
+            self.scan(uid, direction)
+
+    def get_status(self):
+        return {
+            "scans": len(self.latencies_ms),
+            "outcomes": dict(self.outcomes),
+            "latency_ms": {
+                "p50": round(percentile(self.latencies_ms, 50), 2) if self.latencies_ms else None,
+                "p95": round(percentile(self.latencies_ms, 95), 2) if self.latencies_ms else None,
+                "p99": round(percentile(self.latencies_ms, 99), 2) if self.latencies_ms else None
+            }
+        }
+
+
+class DeviceEmulator:
+    """Toàn bộ board + cổng ảo; dùng được từ test / benchmark (start() / stop())"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.clock = Clock(args.speed)
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.control_server = None
+        overrides = {}
+        if args.config:
+            with open(args.config, encoding="utf-8") as file:
+                overrides = {entry["id"]: entry for entry in json.load(file)}
+
+        faults = {name: float(getattr(args, name)) for name in FAULT_FIELDS}
+        dynamics = {"arrivals_per_hour": args.arrivals_per_hour, "dwell_minutes": args.dwell_minutes,
+                    "noise_cm": args.noise_cm, "flap_rate": args.flap_rate}
+        self.boards = {}
+        for index in range(args.boards):
+            board_id = f"esp32-{index + 1}"
+            override = overrides.get(board_id, {})
+            self.boards[board_id] = VirtualBoard(
+                board_id,
+                port=int(override.get("port", args.base_port + index)),
+                sensors=int(override.get("sensors", args.sensors)),
+                faults={name: float(override.get(name, value)) for name, value in faults.items()},
+                dynamics=dynamics,
+                outage=(float(override.get("outage_every", args.outage_every)),
+                        float(override.get("outage_duration", args.outage_duration))),
+                rng=random.Random(self.rng.random()),
+                clock=self.clock
+            )
+
+        self.card_uids = [f"{args.card_prefix}{index:06X}" for index in range(args.cards)]
+        self.card_states = {}
+        self.states_lock = threading.Lock()
+        self.gates = [VirtualGate(f"gate-{index + 1}", self.card_uids, args.gate_rate, args.unknown_rate,
+                                  args.lite, args.timeout, random.Random(self.rng.random()))
+                      for index in range(args.gates)]
+
+    def controllers(self):
+        """ESP32_CONTROLLERS cho backend (slot_offset nối tiếp nhau)"""
+        entries, offset = [], 0
+        for board in self.boards.values():
+            entries.append({"id": board.id, "ip": self.args.host, "port": board.port,
+                            "slot_offset": offset, "slot_count": len(board.sensors)})
+            offset += len(board.sensors)
+        return entries
+
+    def _spawn(self, target, name, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def start(self):
+        for board in self.boards.values():
+            board.server = ThreadingHTTPServer((self.args.host, board.port), BoardRequestHandler)
+            board.server.daemon_threads = True
+            board.server.board = board
+            self._spawn(board.server.serve_forever, f"board-{board.id}")
+            if self.args.push_interval:
+                self._spawn(self._push_loop, f"push-{board.id}", board)
+        if self.gates:
+            if self.args.seed_cards:
+                self.seed_cards()
+            for gate in self.gates:
+                self._spawn(gate.run, gate.id, self.stop_event, self.card_states, self.states_lock)
+        if self.args.control_port:
+            self.control_server = ThreadingHTTPServer((self.args.host, self.args.control_port), ControlRequestHandler)
+            self.control_server.daemon_threads = True
+            self.control_server.emulator = self
+            self._spawn(self.control_server.serve_forever, "emulator-control")
+
+    def stop(self):
+        self.stop_event.set()
+        for board in self.boards.values():
+            if board.server:
+                board.server.shutdown()
+                board.server.server_close()
+        if self.control_server:
+            self.control_server.shutdown()
+            self.control_server.server_close()
+
+    def seed_cards(self):
+        """Tạo thẻ trên backend (thẻ đã có thì đọc trạng thái hiện tại)"""
+        session = requests.Session()
+        for uid in self.card_uids:
+            response = session.post(f"{BACKEND_URL}/api/cards/",
+                                    json={"id": uid, "name": f"Emulator {uid}", "status": "outside"},
+                                    timeout=self.args.timeout)
+            if response.status_code == 201:
+                self.card_states[uid] = False
+                continue
+            response = session.get(f"{BACKEND_URL}/api/cards/{uid}", timeout=self.args.timeout)
+            if response.status_code == 200:
+                self.card_states[uid] = response.json().get("card", {}).get("status") == 1
+
+    def _push_loop(self, board):
+        """Board đẩy khoảng cách thô lên backend theo chu kỳ (POST /api/parking-slots/batch)"""
+        session = requests.Session()
+        while not self.stop_event.wait(self.args.push_interval):
+            if board.is_down():
+                continue
+            readings = [{"slot_id": index + 1, "distance_cm": distance}
+                        for index, distance in enumerate(board.read_distances()) if distance != -1]
+            try:
+                response = session.post(f"{BACKEND_URL}/api/parking-slots/batch",
+                                        json={"controller_id": board.id, "readings": readings},
+                                        timeout=self.args.timeout)
+                board._count("pushes" if response.status_code == 200 else "push_failures")
+            except requests.exceptions.RequestException:
+                board._count("push_failures")
+
+    def get_status(self):
+        return {
+            "simulated_seconds": round(self.clock.now(), 1),
+            "boards": {board_id: board.get_status() for board_id, board in self.boards.items()},
+            "gates": {gate.id: gate.get_status() for gate in self.gates}
+        }
+
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    """Control API: đọc thống kê, đổi lỗi / ép trạng thái slot lúc đang chạy"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        emulator = self.server.emulator
+        if self.path == "/emulator/status":
+            return self._send(200, emulator.get_status())
+        if self.path == "/emulator/controllers":
+            return self._send(200, emulator.controllers())
+        self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        emulator = self.server.emulator
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": "Invalid JSON"})
+
+        match = re.fullmatch(r"/emulator/boards/([\w-]+)(?:/slots/(\d+))?", self.path)
+        board = emulator.boards.get(match.group(1)) if match else None
+        if board is None:
+            return self._send(404, {"error": "Unknown board"})
+        try:
+            if match.group(2):
+                slot = int(match.group(2))
+                if not 1 <= slot <= len(board.sensors):
+                    return self._send(400, {"error": f"slot must be 1-{len(board.sensors)}"})
+                with board.lock:
+                    board.sensors[slot - 1].force(bool(data.get("occupied")))
+            else:
+                board.update(data)
+        except (TypeError, ValueError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(200, board.get_status())
+
+
+def print_summary(status):
+    print(f"\n📊 Emulator sau {status['simulated_seconds']}s mô phỏng")
+    for board_id, board in status["boards"].items():
+        print(f"   {board_id} :{board['port']}  {board['occupied']}/{board['sensors']} có xe  "
+              f"requests={board['requests']} ok={board['ok']} timeouts={board['timeouts']} "
+              f"errors={board['errors']} malformed={board['malformed']} dropped={board['dropped']} "
+              f"offline={board['refused_offline']} pushes={board['pushes']}")
+    for gate_id, gate in status["gates"].items():
+        print(f"   {gate_id}  scans={gate['scans']} outcomes={gate['outcomes']} latency={gate['latency_ms']}")
+
+
+def main():
+    global BACKEND_URL
+
+    parser = argparse.ArgumentParser(description="Giả lập board ESP32 và cổng RFID UNO R4")
+    parser.add_argument("--boards", type=int, default=1, help="Số board ESP32 ảo")
+    parser.add_argument("--sensors", type=int, default=6, help="Số cảm biến mỗi board")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe")
+    parser.add_argument("--base-port", type=int, default=8081, help="Port board đầu tiên (board i = base + i)")
+    parser.add_argument("--config", help="File JSON ghi đè theo board: [{\"id\": \"esp32-2\", \"latency_ms\": 800}]")
+    parser.add_argument("--latency-ms", dest="latency_ms", type=float, default=20.0, help="Độ trễ mỗi request (ms)")
+    parser.add_argument("--jitter-ms", dest="jitter_ms", type=float, default=10.0, help="Jitter ± (ms)")
+    parser.add_argument("--timeout-rate", dest="timeout_rate", type=float, default=0.0,
+                        help="Xác suất treo thêm --hang-seconds (quá ESP32_TIMEOUT)")
+    parser.add_argument("--hang-seconds", dest="hang_seconds", type=float, default=15.0, help="Thời gian treo (giây)")
+    parser.add_argument("--error-rate", dest="error_rate", type=float, default=0.0, help="Xác suất HTTP 500/503")
+    parser.add_argument("--malformed-rate", dest="malformed_rate", type=float, default=0.0,
+                        help="Xác suất payload hỏng")
+    parser.add_argument("--drop-rate", dest="drop_rate", type=float, default=0.0,
+                        help="Xác suất cắt kết nối không trả lời")
+    parser.add_argument("--sensor-error-rate", dest="sensor_error_rate", type=float, default=0.01,
+                        help="Xác suất 1 cảm biến không phản hồi (-1)")
+    parser.add_argument("--outage-every", type=float, default=0.0, help="Chu kỳ mất kết nối (giây, 0 = tắt)")
+    parser.add_argument("--outage-duration", type=float, default=10.0, help="Thời gian mất kết nối mỗi chu kỳ")
+    parser.add_argument("--arrivals-per-hour", type=float, default=2.0, help="Lượt xe đến mỗi slot mỗi giờ")
+    parser.add_argument("--dwell-minutes", type=float, default=45.0, help="Thời gian đỗ trung bình (phút)")
+    parser.add_argument("--noise-cm", type=float, default=1.5, help="Độ lệch chuẩn nhiễu khoảng cách (cm)")
+    parser.add_argument("--flap-rate", type=float, default=0.02, help="Xác suất mẫu nhiễu quanh ngưỡng")
+    parser.add_argument("--speed", type=float, default=1.0, help="Hệ số tăng tốc thời gian mô phỏng")
+    parser.add_argument("--push-interval", type=float, default=0.0,
+                        help="Giây giữa 2 lần board đẩy batch lên backend (0 = chỉ phục vụ /data)")
+    parser.add_argument("--gates", type=int, default=0, help="Số cổng RFID ảo")
+    parser.add_argument("--gate-rate", type=float, default=10.0, help="Lượt quẹt mỗi cổng mỗi phút")
+    parser.add_argument("--cards", type=int, default=20, help="Số thẻ dùng cho cổng ảo")
+    parser.add_argument("--card-prefix", default="EM", help="Tiền tố UID thẻ (UID = prefix + 6 hex)")
+    parser.add_argument("--seed-cards", action="store_true", help="Tạo thẻ trên backend trước khi quẹt")
+    parser.add_argument("--unknown-rate", type=float, default=0.05, help="Tỉ lệ lượt quẹt thẻ lạ")
+    parser.add_argument("--lite", action="store_true", help="Quẹt qua /api/cards/scan/lite (plain text)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Timeout request tới backend (giây)")
+    parser.add_argument("--url", default=BACKEND_URL, help="Backend URL")
+    parser.add_argument("--control-port", type=int, default=8080, help="Port control API (0 = tắt)")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    parser.add_argument("-d", "--duration", type=float, default=0.0, help="Chạy N giây rồi in thống kê (0 = chạy mãi)")
+    parser.add_argument("--print-controllers", action="store_true", help="In ESP32_CONTROLLERS rồi thoát")
+    parser.add_argument("--json", action="store_true", help="In thống kê dạng JSON")
+    args = parser.parse_args()
+
+    BACKEND_URL = args.url.rstrip("/")
+    emulator = DeviceEmulator(args)
+    if args.print_controllers:
+        print(json.dumps(emulator.controllers()))
+        return
+
+    try:
+        emulator.start()
+    except OSError as e:
+        print(f"❌ Không mở được port: {e}")
+        sys.exit(1)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Seed thẻ thất bại: {e}")
+        print("   Hãy khởi động backend: python -m backend.run")
+        sys.exit(1)
+
+    if not args.json:
+        print(f"🚀 {len(emulator.boards)} board ESP32 ảo, {len(emulator.gates)} cổng RFID ảo")
+        print(f"   ESP32_CONTROLLERS='{json.dumps(emulator.controllers())}'")
+        if args.control_port:
+            print(f"   Control API: http://{args.host}:{args.control_port}/emulator/status")
+
+    signal.signal(signal.SIGTERM, lambda *_: emulator.stop_event.set())
+    try:
+        emulator.stop_event.wait(args.duration or None)
+    except KeyboardInterrupt:
+        pass
+    status = emulator.get_status()
+    emulator.stop()
+
+    if args.json:
+        print(json.dumps(status, indent=2, ensure_ascii=False))
+    else:
+        print_summary(status)
+
+
+if __name__ == "__main__":
+    main()
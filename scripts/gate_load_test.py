@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+gate_load_test.py - Load test cổng quẹt thẻ: nhiều lượt IN/OUT đồng thời vào /api/cards/scan
+
+Mở rộng từ simulate_uno_card_scan.py (1 lượt quẹt) thành tải đồng thời:
+  1. Seed N thẻ (POST /api/cards/), thẻ đã tồn tại thì đọc lại trạng thái hiện tại
+  2. Gửi lượt quẹt đúng format UNO R4 {"card_id", "direction", "timestamp"}
+     - closed-loop: W worker, mỗi worker gửi lượt tiếp theo ngay khi nhận response
+     - open-loop:   lượt quẹt đến theo tốc độ cố định (--rate/s), không chờ response;
+                    latency tính từ thời điểm lẽ ra phải gửi (không bị coordinated omission)
+  3. Mỗi thẻ chỉ có 1 lượt quẹt đang chạy tại 1 thời điểm, direction luôn ngược trạng thái
+     hiện tại nên mọi lượt quẹt đều phải được mở cổng
+  4. Cuối lượt chạy: so sánh trạng thái thẻ trên server với trạng thái mong đợi
+     (lost update = server bị mất 1 lần cập nhật do ghi đè cards.json đồng thời)
+
+Usage:
+  python gate_load_test.py [-n 50] [-c 8] [-d 30]                 # closed-loop, 8 worker, 30 giây
+  python gate_load_test.py --mode open --rate 40 -d 30            # open-loop 40 lượt/giây
+  python gate_load_test.py --json --output result_<commit>.json   # lưu kết quả để so sánh giữa các commit
+
+Lưu ý: lượt quẹt là thật (đổi trạng thái thẻ, ghi log). Dùng --cleanup để xóa thẻ đã seed.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from queue import Queue, Empty
+
+import requests
+
+# Backend API URL
+BACKEND_URL = "http://localhost:5000"
+
+
+def percentile(values, percent):
+    """Percentile theo nearest-rank"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class GateLoadTest:
+    """Trạng thái 1 lượt chạy load test"""
+
+    def __init__(self, card_count, prefix, timeout):
+        self.card_uids = [f"{prefix}{index:06X}" for index in range(card_count)]
+        self.timeout = timeout
+        # Trạng thái mong đợi của từng thẻ (0 = ngoài bãi, 1 = trong bãi)
+        self.expected = {}
+        # Thẻ rảnh (không có lượt quẹt đang chạy)
+        self.idle_cards = Queue()
+        self.lock = threading.Lock()
+        self.latencies_ms = []
+        self.outcomes = {}
+        self.error_classes = {}
+        self.skipped = 0
+        self._local = threading.local()
+
+    def session(self):
+        """Mỗi thread 1 requests.Session (giữ kết nối keep-alive)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    # ------------------------------------------------------------------
+    # Seed / kiểm tra
+    # ------------------------------------------------------------------
+    def seed(self):
+        """Tạo thẻ; thẻ đã có thì lấy trạng thái hiện tại"""
+        created = 0
+        for uid in self.card_uids:
+            response = self.session().post(
+                f"{BACKEND_URL}/api/cards/",
+                json={"id": uid, "name": f"Load test {uid}", "status": "outside"},
+                timeout=self.timeout
+            )
+            if response.status_code == 201:
+                self.expected[uid] = 0
+                created += 1
+            else:
+                status = self.fetch_status(uid)
+                if status is None:
+                    raise RuntimeError(f"Không seed được thẻ {uid}: {response.status_code} {response.text[:200]}")
+                self.expected[uid] = status
+            self.idle_cards.put(uid)
+        return created
+
+    def fetch_status(self, uid):
+        response = self.session().get(f"{BACKEND_URL}/api/cards/{uid}", timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        return response.json().get("card", {}).get("status")
+
+    def check_lost_updates(self):
+        """So sánh trạng thái server với trạng thái mong đợi sau khi chạy"""
+        response = self.session().get(f"{BACKEND_URL}/api/cards/", timeout=max(self.timeout, 30))
+        response.raise_for_status()
+        server_status = {card["uid"]: card.get("status") for card in response.json().get("cards", [])}
+
+        mismatched = [
+            {"uid": uid, "expected": expected, "server": server_status.get(uid)}
+            for uid, expected in self.expected.items()
+            if server_status.get(uid) != expected
+        ]
+        return mismatched
+
+    def cleanup(self):
+        deleted = 0
+        for uid in self.card_uids:
+            response = self.session().delete(f"{BACKEND_URL}/api/cards/{uid}", timeout=self.timeout)
+            if response.status_code == 200:
+                deleted += 1
+        return deleted
+
+    # ------------------------------------------------------------------
+    # 1 lượt quẹt
+    # ------------------------------------------------------------------
+    def _record(self, latency_ms, outcome, error_class=None):
+        with self.lock:
+            self.latencies_ms.append(latency_ms)
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if error_class:
+                self.error_classes[error_class] = self.error_classes.get(error_class, 0) + 1
+
+    def scan(self, uid, reader, scheduled_at=None):
+        """
+        Gửi 1 lượt quẹt cho thẻ uid (thẻ đang được giữ bởi caller)
+
+        Args:
+            scheduled_at: perf_counter lúc lượt quẹt lẽ ra được gửi (open-loop)
+        """
+        direction = "OUT" if self.expected[uid] == 1 else "IN"
+        payload = {"card_id": uid, "direction": direction, "timestamp": "", "reader": reader}
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            response = self.session().post(f"{BACKEND_URL}/api/cards/scan", json=payload, timeout=self.timeout)
+            latency_ms = (time.perf_counter() - started) * 1000
+
+            if response.status_code == 200:
+                self.expected[uid] = 1 - self.expected[uid]
+                self._record(latency_ms, "open")
+                return
+
+            try:
+                error = response.json().get("error") or "unknown"
+            except ValueError:
+                error = "non-json response"
+            outcome = "deny" if response.status_code in (400, 403) else "error"
+            self._record(latency_ms, outcome, f"HTTP {response.status_code}: {error}")
+
+            # Lượt bị từ chối -> đọc lại trạng thái thật để lượt sau đúng direction
+            status = self.fetch_status(uid)
+            if status is not None:
+                self.expected[uid] = status
+
+        except requests.exceptions.RequestException as e:
+            self._record((time.perf_counter() - started) * 1000, "error", type(e).__name__)
+        finally:
+            self.idle_cards.put(uid)
+
+    # ------------------------------------------------------------------
+    # Chế độ chạy
+    # ------------------------------------------------------------------
+    def run_closed_loop(self, workers, duration):
+        deadline = time.perf_counter() + duration
+
+        def worker(index):
+            reader = f"loadgen-{index}"
+            while time.perf_counter() < deadline:
+                try:
+                    uid = self.idle_cards.get(timeout=0.5)
+                except Empty:
+                    continue
+                self.scan(uid, reader)
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open_loop(self, rate, duration, max_in_flight):
+        interval = 1.0 / rate
+        started = time.perf_counter()
+        total = int(rate * duration)
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for sequence in range(total):
+                scheduled_at = started + sequence * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    uid = self.idle_cards.get_nowait()
+                except Empty:
+                    # Mọi thẻ đều đang có lượt quẹt chạy -> backend không theo kịp tốc độ đến
+                    with self.lock:
+                        self.skipped += 1
+                    continue
+                executor.submit(self.scan, uid, f"loadgen-{sequence % max_in_flight}", scheduled_at)
+
+    # ------------------------------------------------------------------
+    # Báo cáo
+    # ------------------------------------------------------------------
+    def report(self, args, elapsed, created, lost_updates):
+        latencies = self.latencies_ms
+        total = len(latencies)
+        round_ms = lambda value: round(value, 3) if value is not None else None
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "backend": BACKEND_URL,
+            "mode": args.mode,
+            "cards": len(self.card_uids),
+            "cards_created": created,
+            "workers": args.concurrency if args.mode == "closed" else None,
+            "target_rate": args.rate if args.mode == "open" else None,
+            "duration_s": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else None,
+            "skipped": self.skipped,
+            "latency_ms": {
+                "mean": round_ms(statistics.mean(latencies)) if latencies else None,
+                "p50": round_ms(percentile(latencies, 50)),
+                "p95": round_ms(percentile(latencies, 95)),
+                "p99": round_ms(percentile(latencies, 99)),
+                "max": round_ms(max(latencies)) if latencies else None
+            },
+            "outcomes": self.outcomes,
+            "error_classes": self.error_classes,
+            "lost_updates": len(lost_updates),
+            "lost_update_sample": lost_updates[:20]
+        }
+
+
+def print_report(report):
+    latency = report["latency_ms"]
+    print("=" * 60)
+    print(f"🚦 GATE LOAD TEST ({report['mode']}-loop)")
+    print("=" * 60)
+    print(f"Thẻ:           {report['cards']} (tạo mới {report['cards_created']})")
+    print(f"Thời gian:     {report['duration_s']} s")
+    print(f"Số lượt quẹt:  {report['requests']}  (bỏ qua: {report['skipped']})")
+    print(f"Throughput:    {report['throughput_rps']} req/s")
+    print(f"Latency (ms):  mean {latency['mean']}  p50 {latency['p50']}  p95 {latency['p95']}  "
+          f"p99 {latency['p99']}  max {latency['max']}")
+    print(f"Kết quả:       {report['outcomes']}")
+    if report["error_classes"]:
+        print("Lỗi:")
+        for error_class, count in sorted(report["error_classes"].items(), key=lambda item: -item[1]):
+            print(f"   {count:>6}  {error_class}")
+    if report["lost_updates"]:
+        print(f"❌ Lost updates: {report['lost_updates']} thẻ lệch trạng thái")
+        for item in report["lost_update_sample"]:
+            print(f"   {item['uid']}: mong đợi {item['expected']}, server {item['server']}")
+    else:
+        print("✅ Lost updates: 0")
+    print("=" * 60)
+
+
+def main():
+    global BACKEND_URL
+
+    parser = argparse.ArgumentParser(description="Load test quẹt thẻ đồng thời vào /api/cards/scan")
+    parser.add_argument("-n", "--cards", type=int, default=50, help="Số thẻ seed")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed = W worker gửi liên tục, open = tốc độ đến cố định")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Số worker (closed-loop)")
+    parser.add_argument("-r", "--rate", type=float, default=20.0, help="Lượt quẹt/giây (open-loop)")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Số request đồng thời tối đa (open-loop)")
+    parser.add_argument("-d", "--duration", type=float, default=30.0, help="Thời gian chạy (giây)")
+    parser.add_argument("--prefix", default="LT", help="Tiền tố UID thẻ seed (UID = prefix + 6 hex)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Timeout mỗi request (giây)")
+    parser.add_argument("--url", default=BACKEND_URL, help="Backend URL")
+    parser.add_argument("--seed", type=int, help="Random seed (thứ tự thẻ ban đầu)")
+    parser.add_argument("--cleanup", action="store_true", help="Xóa thẻ đã seed sau khi chạy")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file")
+    args = parser.parse_args()
+
+    BACKEND_URL = args.url.rstrip("/")
+    if not 4 <= len(args.prefix) + 6 <= 16 or not args.prefix.isalnum():
+        print("❌ --prefix phải là chữ/số, UID tổng cộng 4-16 ký tự")
+        sys.exit(1)
+
+    test = GateLoadTest(args.cards, args.prefix.upper(), args.timeout)
+    try:
+        created = test.seed()
+    except (requests.exceptions.RequestException, RuntimeError) as e:
+        print(f"❌ Seed thẻ thất bại: {e}")
+        print("   Hãy khởi động backend: python -m backend.run")
+        sys.exit(1)
+
+    # Xáo thứ tự thẻ để các lượt quẹt không đi theo thứ tự seed
+    rng = random.Random(args.seed)
+    idle = []
+    while not test.idle_cards.empty():
+        idle.append(test.idle_cards.get_nowait())
+    rng.shuffle(idle)
+    for uid in idle:
+        test.idle_cards.put(uid)
+
+    started = time.perf_counter()
+    if args.mode == "closed":
+        test.run_closed_loop(args.concurrency, args.duration)
+    else:
+        test.run_open_loop(args.rate, args.duration, args.max_in_flight)
+    elapsed = time.perf_counter() - started
+
+    lost_updates = test.check_lost_updates()
+    report = test.report(args, elapsed, created, lost_updates)
+
+    if args.cleanup:
+        report["cards_deleted"] = test.cleanup()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+    sys.exit(1 if report["lost_updates"] or report["outcomes"].get("error") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+scan_ingest_latency.py - Đo round-trip latency quẹt thẻ: TCP/UDP ingest vs HTTP
+
+So sánh các đường đi:
+  tcp        - 1 kết nối TCP giữ nguyên, mỗi lượt quẹt 1 dòng "<UID> <DIR>\\n"
+  udp        - mỗi lượt quẹt 1 datagram
+  http-lite  - POST /api/cards/scan/lite, mỗi lượt 1 kết nối mới (Connection: close như UNO R4)
+  http-json  - POST /api/cards/scan, mỗi lượt 1 kết nối mới
+
+Backend cần chạy với ingest bật, ví dụ:
+  SCAN_INGEST_ENABLED=true SCAN_INGEST_PROTOCOL=both python backend/run.py
+
+Usage:
+  python scan_ingest_latency.py <card_id> [-n 200] [--paths tcp,udp,http-lite,http-json]
+
+Lưu ý: mỗi lượt quẹt là thật (đổi trạng thái thẻ, ghi log). Thẻ được quẹt luân phiên
+IN/OUT nên trạng thái cuối cùng giữ nguyên nếu số lượt là chẵn.
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import statistics
+import sys
+import time
+
+BACKEND_HOST = "localhost"
+BACKEND_PORT = 5000
+INGEST_PORT = 5001
+
+
+def percentile(values, percent):
+    """Percentile theo nearest-rank"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure_tcp(card_id, count):
+    """1 kết nối TCP, gửi count dòng tuần tự"""
+    samples, replies = [], {}
+    with socket.create_connection((BACKEND_HOST, INGEST_PORT), timeout=5) as sock:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = sock.makefile('rb')
+        for i in range(count):
+            direction = "IN" if i % 2 == 0 else "OUT"
+            started = time.perf_counter()
+            sock.sendall(f"{card_id} {direction}\n".encode('ascii'))
+            reply = stream.readline().decode('ascii').strip()
+            samples.append((time.perf_counter() - started) * 1000)
+            replies[reply] = replies.get(reply, 0) + 1
+    return samples, replies
+
+
+def measure_udp(card_id, count):
+    """Mỗi lượt 1 datagram, chờ datagram trả lời"""
+    samples, replies = [], {}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        for i in range(count):
+            direction = "IN" if i % 2 == 0 else "OUT"
+            started = time.perf_counter()
+            sock.sendto(f"{card_id} {direction}\n".encode('ascii'), (BACKEND_HOST, INGEST_PORT))
+            reply = sock.recvfrom(256)[0].decode('ascii').strip()
+            samples.append((time.perf_counter() - started) * 1000)
+            replies[reply] = replies.get(reply, 0) + 1
+    return samples, replies
+
+
+def measure_http(card_id, count, lite):
+    """Mỗi lượt mở kết nối HTTP mới và đóng sau khi nhận response (giống firmware)"""
+    samples, replies = [], {}
+    for i in range(count):
+        direction = "IN" if i % 2 == 0 else "OUT"
+        if lite:
+            path, body, content_type = "/api/cards/scan/lite", f"{card_id} {direction}", "text/plain"
+        else:
+            path = "/api/cards/scan"
+            body = json.dumps({"card_id": card_id, "direction": direction, "timestamp": ""})
+            content_type = "application/json"
+
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection(BACKEND_HOST, BACKEND_PORT, timeout=5)
+        conn.request("POST", path, body=body, headers={"Content-Type": content_type, "Connection": "close"})
+        response = conn.getresponse()
+        payload = response.read()
+        conn.close()
+        samples.append((time.perf_counter() - started) * 1000)
+
+        key = payload.decode('utf-8').strip() if lite else str(response.status)
+        replies[key] = replies.get(key, 0) + 1
+    return samples, replies
+
+
+def summarize(name, samples, replies):
+    """Thống kê latency (ms)"""
+    return {
+        "path": name,
+        "count": len(samples),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3),
+        "replies": replies
+    }
+
+
+def main():
+    global BACKEND_HOST, BACKEND_PORT, INGEST_PORT
+
+    parser = argparse.ArgumentParser(description="Đo round-trip latency quẹt thẻ: TCP/UDP ingest vs HTTP")
+    parser.add_argument("card_id", help="UID thẻ đã đăng ký")
+    parser.add_argument("-n", "--count", type=int, default=200, help="Số lượt quẹt mỗi đường đi (nên chẵn)")
+    parser.add_argument("--paths", default="tcp,http-lite,http-json",
+                        help="Danh sách: tcp, udp, http-lite, http-json")
+    parser.add_argument("--host", default=BACKEND_HOST)
+    parser.add_argument("--http-port", type=int, default=BACKEND_PORT)
+    parser.add_argument("--ingest-port", type=int, default=INGEST_PORT)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args()
+
+    BACKEND_HOST, BACKEND_PORT, INGEST_PORT = args.host, args.http_port, args.ingest_port
+
+    runners = {
+        "tcp": lambda: measure_tcp(args.card_id, args.count),
+        "udp": lambda: measure_udp(args.card_id, args.count),
+        "http-lite": lambda: measure_http(args.card_id, args.count, lite=True),
+        "http-json": lambda: measure_http(args.card_id, args.count, lite=False),
+    }
+
+    results = []
+    for name in [p.strip() for p in args.paths.split(",") if p.strip()]:
+        if name not in runners:
+            print(f"❌ Đường đi không hợp lệ: {name}")
+            sys.exit(1)
+        try:
+            results.append(summarize(name, *runners[name]()))
+        except (OSError, socket.timeout) as e:
+            results.append({"path": name, "error": str(e)})
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'path':<10} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  replies")
+    for result in results:
+        if "error" in result:
+            print(f"{result['path']:<10} ❌ {result['error']}")
+            continue
+        print(f"{result['path']:<10} {result['count']:>6} {result['mean_ms']:>9} {result['p50_ms']:>9} "
+              f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['max_ms']:>9}  {result['replies']}")
+
+
+if __name__ == "__main__":
+    main()